@@ -49,8 +49,16 @@ All calculations match the JavaScript implementation in analysis.html.
 Usage:
     python analyze_jetlag_data.py --trips trips.json --output analysis_report.txt
 
+    # After a delta sync: summary figures updated from the changed trips only
+    python analyze_jetlag_data.py --trips trips.json --output summary.txt --incremental
+
+    # Add the OLS models of analyze_jetlag_r.R (robust SEs; needs numpy)
+    python analyze_jetlag_data.py --trips trips.json --regression
+
 Requirements:
-    - Python 3.6+ (no external dependencies - uses only standard library)
+    - Python 3.7+ (the report uses only the standard library)
+    - For --bootstrap and --permutations: Python 3.8+ and numpy 1.20+
+    - For --regression: numpy 1.20+ (see trip_numpy.py)
 
 Author: Steven Schram PhD, DC, LAc
 License: MIT
@@ -58,11 +66,32 @@ Repository: https://github.com/SBSchram/jetlagpro-website
 """
 
 import json
+import os
 import sys
-import re
-from datetime import datetime
-from typing import Dict, List, Tuple
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 import argparse
+from collections import Counter
+from functools import lru_cache
+from itertools import compress
+
+# Snapshot reader shared with the download scripts (same directory)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from firestore_snapshot import iter_changes, iter_documents, load_sync_state, snapshot_profile
+from firestore_values import DECODER_VERSION, lazy_document
+from trip_ids import parse_trip_id
+from trip_numpy import optional_numpy
+from trip_rules import Rule, RuleEngine, prefix_matcher
+from trip_stats import GroupedStats
+from trip_table import (
+    CACHE_SUFFIX, EPOCH_SUFFIX, MISSING_INT, POINT_MASK, TABLE_VERSION, TripRow, TripTable, cache_key,
+    load_table, parse_epoch, save_table,
+)
+
+# Field projection this script needs from tripCompletions. Download with:
+#   python download_firestore.py tripCompletions trips.json --profile analysis
+FIRESTORE_PROFILE = 'analysis'
 
 # Developer device IDs - single source of truth
 # Matches TripValidator.DEVELOPER_DEVICE_IDS in assets/js/trip-validator.js
@@ -75,50 +104,87 @@ DEVELOPER_DEVICE_IDS = [
 ]
 
 
-def load_trips(trips_path: str) -> List[Dict]:
-    """Load trip records from JSON file."""
+def load_trips(trips_path: str) -> Iterator[Dict]:
+    """
+    Yield trip records from a snapshot file.
+    
+    Accepts every format written by download_firestore.py (NDJSON, optionally
+    gzip/zstd-compressed, or {"documents": [...]} JSON) as well as plain JSON
+    lists of already-decoded trips. The file is parsed one document at a time,
+    so memory use does not depend on the size of the export. Trips are
+    dict-like LazyTrip views: each field is decoded the first time it is
+    read. Use list(load_trips(path)) to keep every trip.
+    """
     print(f"Loading trips from: {trips_path}")
+    warn_if_projected(trips_path)
     
-    with open(trips_path, 'r') as f:
-        data = json.load(f)
-    
-    # Handle Firestore REST API format
-    if 'documents' in data:
-        trips = []
-        for doc in data['documents']:
-            trip = {}
-            if 'fields' in doc:
-                # Extract fields from Firestore format
-                for key, value in doc['fields'].items():
-                    if 'stringValue' in value:
-                        trip[key] = value['stringValue']
-                    elif 'integerValue' in value:
-                        trip[key] = int(value['integerValue'])
-                    elif 'doubleValue' in value:
-                        trip[key] = float(value['doubleValue'])
-                    elif 'booleanValue' in value:
-                        trip[key] = value['booleanValue']
-                    elif 'timestampValue' in value:
-                        trip[key] = value['timestampValue']
-                    elif 'arrayValue' in value:
-                        # Handle array fields (like stimulatedPoints)
-                        trip[key] = []
-                        if 'values' in value['arrayValue']:
-                            for item in value['arrayValue']['values']:
-                                if 'stringValue' in item:
-                                    trip[key].append(item['stringValue'])
-                                elif 'integerValue' in item:
-                                    trip[key].append(int(item['integerValue']))
-                                elif 'doubleValue' in item:
-                                    trip[key].append(float(item['doubleValue']))
-            trips.append(trip)
-    elif isinstance(data, list):
-        trips = data
-    else:
-        trips = [data]
+    count = 0
+    for doc in iter_documents(trips_path):
+        yield lazy_document(doc)
+        count += 1
+    
+    print(f"  Loaded {count} trip records")
+
+
+def warn_if_projected(trips_path: str):
+    """Warn when a snapshot lacks the fields the analysis needs."""
+    # A snapshot downloaded for signature checks only carries tripId
+    profile = snapshot_profile(trips_path)
+    if profile not in ('full', FIRESTORE_PROFILE):
+        print(f"  Warning: snapshot was downloaded with the '{profile}' field projection;")
+        print(f"  fields used by the analysis are missing. Re-download with --profile {FIRESTORE_PROFILE}.")
+
+
+def load_trip_table(trips_path: str, use_cache: bool = True) -> TripTable:
+    """
+    Load every trip in a snapshot as a TripTable.
+    
+    The decoded table is cached next to the export (<export>.tripcache),
+    keyed by the export's content hash and the decoder version. An unchanged
+    export is loaded from the memory-mapped cache without parsing any JSON;
+    a changed export (or a new decoder) rebuilds the cache automatically.
+    """
+    cache_path = trips_path + CACHE_SUFFIX
+    key = cache_key(trips_path) if use_cache else None
+    if use_cache:
+        table = load_table(cache_path, key)
+        if table is not None:
+            print(f"Loading trips from: {trips_path}")
+            warn_if_projected(trips_path)
+            print(f"  Loaded {len(table)} trip records (decoded cache: {cache_path})")
+            return table
+    
+    table = TripTable.from_trips(load_trips(trips_path))
+    if use_cache:
+        try:
+            save_table(table, cache_path, key)
+        except (OSError, ValueError) as e:
+            print(f"  Note: decoded-trip cache not written: {e}")
+    return table
+
+
+class TripTally:
+    """
+    Counts kept while trips stream past, for report figures over ALL trips.
+    
+    The validation breakdown needs the total number of trips and how many
+    carry an HMAC signature. Tallying them on the way into
+    filter_valid_trips() means the invalid trips never have to be kept.
+    """
     
-    print(f"  Loaded {len(trips)} trip records")
-    return trips
+    def __init__(self, trips: Iterable[Dict] = ()):
+        self.total = 0
+        self.hmac_signed = 0
+        for _ in self.count(trips):
+            pass
+    
+    def count(self, trips: Iterable[Dict]) -> Iterator[Dict]:
+        """Pass trips through unchanged, counting them."""
+        for trip in trips:
+            self.total += 1
+            if trip.get('hmacSignature'):
+                self.hmac_signed += 1
+            yield trip
 
 
 def get_origin_timezone(trip: Dict):
@@ -126,9 +192,132 @@ def get_origin_timezone(trip: Dict):
     return trip.get('originTimezone') or trip.get('originTimeZone')
 
 
-def filter_valid_trips(trips: List[Dict]) -> List[Dict]:
+# Timezone fields were added Oct 24, 2025 - trips before this are legacy
+# even if they have timezone fields (may be incorrect/retrofitted via late surveys)
+TIMEZONE_FEATURE_DATE = datetime(2025, 10, 24, tzinfo=datetime.now().astimezone().tzinfo)
+TIMEZONE_FEATURE_EPOCH = TIMEZONE_FEATURE_DATE.timestamp()
+
+
+def trip_epoch(trip, field: str = 'startDate') -> float:
+    """
+    A timestamp field as seconds since the epoch (NaN if missing/invalid).
+    
+    TripTable rows carry the value pre-parsed in <field>Epoch; plain trip
+    dicts are parsed here.
+    """
+    epoch = trip.get(field + EPOCH_SUFFIX)
+    if epoch is not None:
+        return epoch
+    return parse_epoch(trip.get(field))
+
+
+def is_date_based_legacy(start_epoch: float) -> bool:
+    """True if a trip's startDate (epoch) predates the timezone feature (Oct 24, 2025)."""
+    # NaN (missing or invalid date) compares False: continue with other checks
+    return start_epoch < TIMEZONE_FEATURE_EPOCH
+
+
+def is_same_timezone_test(start_epoch, arrival_tz, origin_tz, completion_method) -> bool:
     """
-    Filter trips for analysis.
+    Timezone validation: same origin and arrival timezone without survey fallback.
+    
+    Rule 2: Date-based legacy (trip before Oct 24, 2025) - valid, ignore timezone fields
+    Rule 3: Field-based legacy (no arrivalTimeZone but timezonesCount > 0) - valid
+    Rule 4: Real travel (different timezones AND timezonesCount > 0) - valid
+    Rule 5: Survey fallback (same timezone but survey completion) - valid
+    Invalid: Same timezone without survey fallback = test data
+    """
+    if not arrival_tz or is_date_based_legacy(start_epoch):
+        return False  # Legacy data with actual travel - valid
+    return bool(origin_tz) and arrival_tz == origin_tz and '_survey' not in (completion_method or '')
+
+
+# Developer device IDs to exclude (test sessions), compiled to set lookups
+# Matches TripValidator.DEVELOPER_DEVICE_IDS in assets/js/trip-validator.js
+is_developer_trip = prefix_matcher(DEVELOPER_DEVICE_IDS)
+
+
+def _developer_column(table):
+    trip_ids = table.column('tripId')
+    return lambda i: bool(trip_ids[i]) and is_developer_trip(trip_ids[i])
+
+
+def _same_timezone_column(table):
+    start_epochs = table.column('startDateEpoch')
+    arrival = table.values('arrivalTimeZone')
+    origin = table.values('originTimezone')
+    method = table.values('completionMethod')
+    return lambda i: is_same_timezone_test(start_epochs[i], arrival[i], origin[i], method[i])
+
+
+def _column_in(field, excluded_when):
+    """
+    Column predicate: excluded when the stored value is in excluded_when.
+    
+    Boolean columns store 1/0 and -1 for missing - isTest and
+    surveyCompleted by truthiness, as the row rules test them, the other
+    flags 1 only when exactly True; integer columns store MISSING_INT for
+    missing (see trip_table.py).
+    """
+    def compile_column(table):
+        column = table.column(field)
+        return lambda i: column[i] in excluded_when
+    return compile_column
+
+
+def _missing_trip_id_column(table):
+    trip_ids = table.column('tripId')
+    return lambda i: not trip_ids[i]
+
+
+# Exclusion rules, in the order they are documented. The RuleEngine reorders
+# them by measured selectivity; a trip is valid only if no rule excludes it.
+EXCLUSION_RULES = [
+    Rule('is_test', 'Explicit isTest flag',
+         lambda trip: bool(trip.get('isTest', False)),
+         _column_in('isTest', (1,))),
+    Rule('developer_device', 'Developer test session (DEVELOPER_DEVICE_IDS)',
+         lambda trip: is_developer_trip(trip.get('tripId', '') or ''),
+         _developer_column),
+    # Rule 1: Test trip if timezonesCount === 0 - ALWAYS invalid (local test, no travel)
+    # A null count is treated like a missing one, as the table column stores both alike
+    Rule('zero_time_zones', 'timezonesCount = 0',
+         lambda trip: (trip.get('timezonesCount') or 0) == 0,
+         _column_in('timezonesCount', (0, MISSING_INT))),
+    Rule('same_time_zone', 'Same origin/arrival timezone without survey fallback',
+         lambda trip: is_same_timezone_test(
+             trip_epoch(trip), trip.get('arrivalTimeZone'),
+             get_origin_timezone(trip), trip.get('completionMethod', '')),
+         _same_timezone_column),
+    # Match live dashboard logic: survey.surveyCompleted === true
+    Rule('no_survey', 'Survey not completed',
+         lambda trip: not trip.get('surveyCompleted', False),
+         _column_in('surveyCompleted', (0, -1))),
+    # Study analysis: Share-gated research consent (excludes Phase A pre-consent beta)
+    Rule('no_consent', 'researchConsentGranted is not true',
+         lambda trip: trip.get('researchConsentGranted') is not True,
+         _column_in('researchConsentGranted', (0, -1))),
+    # Data integrity issue
+    Rule('missing_trip_id', 'No tripId',
+         lambda trip: not trip.get('tripId', ''),
+         _missing_trip_id_column),
+    # Note: Field is 'pointsCompleted' in Firestore
+    Rule('missing_points', 'No pointsCompleted count',
+         lambda trip: trip.get('pointsCompleted') is None,
+         _column_in('pointsCompleted', (MISSING_INT,))),
+]
+
+
+def _print_filter_summary(engine: RuleEngine):
+    print(f"  Filtered to {engine.valid} valid trips for analysis")
+    print(f"  Excluded: {engine.seen - engine.valid} test/invalid trips")
+    for line in engine.summary_lines():
+        print(f"  {line}")
+
+
+def iter_valid_trips(trips: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Filter trips for analysis, yielding each valid trip as it is read.
     
     EXCLUDED:
     - Developer test sessions: Device IDs defined in DEVELOPER_DEVICE_IDS constant
@@ -143,98 +332,28 @@ def filter_valid_trips(trips: List[Dict]) -> List[Dict]:
     3. Different timezones + timezonesCount > 0: Verified travel
     4. Same timezone + survey completion: Survey verified
     
-    Returns list of valid trips.
+    The rules are declared in EXCLUSION_RULES and applied by a compiled
+    RuleEngine (trip_rules.py), which prints per-rule exclusion counts and
+    timings. Accepts any iterable of trips (e.g. the load_trips() generator),
+    so a whole export can be filtered without holding it in memory. Use
+    filter_valid_trips() for a list, or valid_trip_indices() for a TripTable.
     """
-    valid_trips = []
-    
-    # Developer device IDs to exclude (test sessions)
-    # Matches TripValidator.DEVELOPER_DEVICE_IDS in assets/js/trip-validator.js
-    developer_device_ids = DEVELOPER_DEVICE_IDS
-    
-    for trip in trips:
-        trip_id = trip.get('tripId', '')
-        
-        # Skip test trips (explicit flag)
-        if trip.get('isTest', False):
-            continue
-        
-        # Skip developer test sessions (device ID filtering)
-        if any(trip_id.startswith(dev_id) for dev_id in developer_device_ids):
-            continue
-        
-        # Skip test trips (timezone validation)
-        # Rule 1: Test trip if timezonesCount === 0 - ALWAYS invalid (local test, no travel)
-        # Rule 2: Date-based legacy (trip before Oct 24, 2025) - valid, ignore timezone fields
-        # Rule 3: Field-based legacy (no arrivalTimeZone but timezonesCount > 0) - valid
-        # Rule 4: Real travel (different timezones AND timezonesCount > 0) - valid
-        # Rule 5: Survey fallback (same timezone but survey completion) - valid
-        # Invalid: Same timezone without survey fallback = test data
-        arrival_tz = trip.get('arrivalTimeZone')
-        origin_tz = get_origin_timezone(trip)
-        timezones_count = trip.get('timezonesCount', 0)
-        completion_method = trip.get('completionMethod', '')
-        
-        # Rule 1: Test trip if timezonesCount === 0 (definitive test indicator)
-        # This is ALWAYS a test trip, regardless of timezone fields
-        if timezones_count == 0:
-            continue
-        
-        # Rule 2: Date-based legacy detection
-        # Timezone fields were added Oct 24, 2025 - trips before this are legacy
-        # even if they have timezone fields (may be incorrect/retrofitted via late surveys)
-        from datetime import datetime
-        TIMEZONE_FEATURE_DATE = datetime(2025, 10, 24, tzinfo=datetime.now().astimezone().tzinfo)
-        start_date_str = trip.get('startDate')
-        is_date_based_legacy = False
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                if start_date < TIMEZONE_FEATURE_DATE:
-                    # Trip predates timezone feature - treat as legacy
-                    is_date_based_legacy = True
-            except (ValueError, AttributeError):
-                pass  # Invalid date, continue with other checks
-        
-        # Rule 3: Field-based legacy data (no arrivalTimeZone but timezonesCount > 0) - valid
-        # These are early trips before we added timezone fields
-        if is_date_based_legacy or not arrival_tz:
-            # Legacy data with actual travel - valid, continue to next checks
-            pass
-        else:
-            # Has timezone data - apply modern validation rules
-            
-            # Rule 4/5: Check if same timezone
-            if arrival_tz and origin_tz:
-                # Has timezone data - check if same timezone
-                if arrival_tz == origin_tz:
-                    # Same timezone - only valid if survey fallback
-                    if '_survey' not in completion_method:
-                        # Test data (same timezone, no survey fallback)
-                        continue
-        
-        # Skip if survey not completed
-        # Match live dashboard logic: survey.surveyCompleted === true
-        if not trip.get('surveyCompleted', False):
-            continue
+    engine = RuleEngine(EXCLUSION_RULES)
+    yield from engine.filter(trips)
+    _print_filter_summary(engine)
+
+
+def valid_trip_indices(table: TripTable) -> List[int]:
+    """Filter a TripTable for analysis (same rules as iter_valid_trips); returns row indices."""
+    engine = RuleEngine(EXCLUSION_RULES)
+    indices = engine.filter_table(table)
+    _print_filter_summary(engine)
+    return indices
 
-        # Study analysis: Share-gated research consent (excludes Phase A pre-consent beta)
-        if trip.get('researchConsentGranted') is not True:
-            continue
-        
-        # Skip if missing trip ID (data integrity issue)
-        if not trip_id:
-            continue
-        
-        # Must have points completed count
-        # Note: Field is 'pointsCompleted' in Firestore, not 'pointsCompleted'
-        if trip.get('pointsCompleted') is None:
-            continue
-        
-        valid_trips.append(trip)
-    
-    print(f"  Filtered to {len(valid_trips)} valid trips for analysis")
-    print(f"  Excluded: {len(trips) - len(valid_trips)} test/invalid trips")
-    return valid_trips
+
+def filter_valid_trips(trips: Iterable[Dict]) -> List[Dict]:
+    """Filter trips for analysis (see iter_valid_trips). Returns list of valid trips."""
+    return list(iter_valid_trips(trips))
 
 
 def calculate_aggregate_severity(trip: Dict) -> float:
@@ -264,9 +383,15 @@ def calculate_aggregate_severity(trip: Dict) -> float:
     - Filters to only valid (non-null) symptoms
     - Averages ALL available symptoms (not just 5)
     
+    Rows of a TripTable return the score computed for the whole table at
+    once (TripTable.composite('severity')), which uses the same arithmetic.
+    
     Returns:
         float: Mean severity (1-5 scale) or None if no valid symptoms
     """
+    if isinstance(trip, TripRow):
+        return trip.composite('severity')
+    
     # Matches charts.js line 88
     # Note: JavaScript transforms Firestore field names (analytics.js line 255-260)
     # but we read raw Firestore data, so use actual field names
@@ -374,7 +499,11 @@ def get_anticipated_severity(trip: Dict) -> float:
     
     Matches analytics.js renderDoseResponseDataTable() line 822-849.
     Uses generalAnticipated if available, otherwise averages individual anticipated symptoms.
+    Rows of a TripTable return the precomputed TripTable.composite('anticipated').
     """
+    if isinstance(trip, TripRow):
+        return trip.composite('anticipated')
+    
     # Try generalAnticipated first
     general_anticipated = trip.get('generalAnticipated')
     if general_anticipated is not None and general_anticipated != '':
@@ -400,61 +529,26 @@ def get_anticipated_severity(trip: Dict) -> float:
     return None
 
 
-def calculate_validation_breakdown(all_trips: List[Dict], valid_trips: List[Dict]) -> Dict:
+def calculate_validation_breakdown(all_trips: Union[List[Dict], TripTally],
+                                   valid_trips: Union[List[Dict], TripTable]) -> Dict:
     """
     Calculate validation breakdown (verified/legacy/test).
     
-    Simplified version matching dashboard display format.
+    Simplified version matching dashboard display format. all_trips may be
+    the full trip list or a TripTally collected while streaming; valid_trips
+    may be a list or a TripTable.
     """
-    from datetime import datetime
-    
-    total = len(all_trips)
-    valid_count = len(valid_trips)
+    tally = all_trips if isinstance(all_trips, TripTally) else TripTally(all_trips)
+    table = TripTable.from_trips(valid_trips)
+    total = tally.total
+    valid_count = len(table)
     invalid_count = total - valid_count
     
-    # Timezone feature launch date
-    TIMEZONE_FEATURE_DATE = datetime(2025, 10, 24, tzinfo=datetime.now().astimezone().tzinfo)
-    
-    # Helper function to check if trip is date-based legacy
-    def is_date_based_legacy(trip):
-        start_date_str = trip.get('startDate')
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                return start_date < TIMEZONE_FEATURE_DATE
-            except (ValueError, AttributeError):
-                pass
-        return False
-    
-    # Count legacy trips (date-based OR no arrivalTimeZone field)
-    legacy_count = sum(1 for trip in valid_trips 
-                      if is_date_based_legacy(trip) or not trip.get('arrivalTimeZone'))
-    
-    # Count verified trips (have timezone data and different timezones, or survey fallback)
-    # BUT exclude date-based legacy trips from verified count
-    verified_count = 0
-    tz_verified = 0
-    survey_verified = 0
-    
-    for trip in valid_trips:
-        # Skip if this is a legacy trip (date-based or field-based)
-        if is_date_based_legacy(trip) or not trip.get('arrivalTimeZone'):
-            continue
-            
-        arrival_tz = trip.get('arrivalTimeZone')
-        origin_tz = get_origin_timezone(trip)
-        completion_method = trip.get('completionMethod', '')
-        
-        if arrival_tz and origin_tz:
-            if arrival_tz != origin_tz:
-                tz_verified += 1
-                verified_count += 1
-            elif '_survey' in completion_method:
-                survey_verified += 1
-                verified_count += 1
+    legacy_count, tz_verified, survey_verified = verification_counts(table)
+    verified_count = tz_verified + survey_verified
     
     # Count HMAC signatures
-    hmac_authenticated = sum(1 for trip in all_trips if trip.get('hmacSignature'))
+    hmac_authenticated = tally.hmac_signed
     hmac_legacy = total - hmac_authenticated
     
     return {
@@ -470,10 +564,79 @@ def calculate_validation_breakdown(all_trips: List[Dict], valid_trips: List[Dict
     }
 
 
-def basic_statistics(trips: List[Dict]) -> Dict:
-    """Calculate basic trip statistics."""
+def verification_counts(table: TripTable) -> Tuple[int, int, int]:
+    """
+    (legacy, TZ verified, survey verified) counts over valid trips.
+    
+    Legacy trips are date-based OR have no arrivalTimeZone field; verified
+    trips have timezone data and different timezones, or the survey
+    fallback. Date-based legacy trips are never counted as verified.
+    """
+    np = optional_numpy()
+    if np is not None and len(table):
+        return _verification_counts_numpy(np, table)
+    
+    legacy_count = 0
+    tz_verified = 0
+    survey_verified = 0
+    
+    columns = zip(
+        table.column('startDateEpoch'),
+        table.values('arrivalTimeZone'),
+        table.values('originTimezone'),
+        table.values('completionMethod'),
+    )
+    for start_epoch, arrival_tz, origin_tz, completion_method in columns:
+        # Skip if this is a legacy trip (date-based or field-based)
+        if is_date_based_legacy(start_epoch) or not arrival_tz:
+            legacy_count += 1
+            continue
+        
+        completion_method = completion_method or ''
+        if arrival_tz and origin_tz:
+            if arrival_tz != origin_tz:
+                tz_verified += 1
+            elif '_survey' in completion_method:
+                survey_verified += 1
+    
+    return legacy_count, tz_verified, survey_verified
+
+
+def _verification_counts_numpy(np, table: TripTable) -> Tuple[int, int, int]:
+    """verification_counts() as whole-column NumPy operations."""
+    # Shared ids, so arrival and origin time zones compare across columns
+    ids = {}
+    arrival_id = table.map_categories('arrivalTimeZone', lambda tz: ids.setdefault(tz, len(ids)), -1)
+    origin_id = table.map_categories('originTimezone', lambda tz: ids.setdefault(tz, len(ids)), -1)
+    has_arrival = table.map_categories('arrivalTimeZone', bool, False).astype(bool)
+    has_origin = table.map_categories('originTimezone', bool, False).astype(bool)
+    survey = table.map_categories('completionMethod', lambda method: '_survey' in method, False).astype(bool)
+    
+    # NaN start dates compare False, as in is_date_based_legacy()
+    legacy = (table.to_numpy('startDateEpoch') < TIMEZONE_FEATURE_EPOCH) | ~has_arrival
+    checked = ~legacy & has_origin
+    tz_verified = checked & (arrival_id != origin_id)
+    survey_verified = checked & (arrival_id == origin_id) & survey
+    return int(legacy.sum()), int(tz_verified.sum()), int(survey_verified.sum())
+
+
+def _category_counts(np, values, categorize) -> Dict:
+    """{categorize(value): count} over an integer array, in order of first occurrence."""
+    distinct, first, counts = np.unique(values, return_index=True, return_counts=True)
+    totals = {}
+    firsts = {}
+    for value, index, count in zip(distinct.tolist(), first.tolist(), counts.tolist()):
+        category = categorize(value)
+        totals[category] = totals.get(category, 0) + count
+        firsts[category] = min(firsts.get(category, index), index)
+    return {category: totals[category] for category in sorted(totals, key=firsts.get)}
+
+
+def basic_statistics(trips: Union[List[Dict], TripTable]) -> Dict:
+    """Calculate basic trip statistics (trips may be a list or a TripTable)."""
+    table = TripTable.from_trips(trips)
     stats = {
-        'total_trips': len(trips),
+        'total_trips': len(table),
         'trips_with_signatures': 0,
         'legacy_trips': 0,
         'test_trips_filtered': 0,
@@ -483,33 +646,41 @@ def basic_statistics(trips: List[Dict]) -> Dict:
         'stimulation_distribution': {}
     }
     
-    points_list = []
-    severity_list = []
-    
-    for trip in trips:
-        # Count signatures
-        if trip.get('hmacSignature'):
-            stats['trips_with_signatures'] += 1
-        else:
-            stats['legacy_trips'] += 1
-        
-        # Points completed
-        points = trip.get('pointsCompleted', 0)
-        points_list.append(points)
-        
-        # Severity (already filtered for surveyCompleted, so all should have data)
-        severity = calculate_aggregate_severity(trip)
-        if severity is not None:  # Only include if valid severity calculated
-            severity_list.append(severity)
-        
+    # Count signatures
+    stats['trips_with_signatures'] = sum(1 for signature in table.column('hmacSignature') if signature)
+    stats['legacy_trips'] = len(table) - stats['trips_with_signatures']
+    
+    np = optional_numpy()
+    if np is not None and len(table):
+        # Whole-column path: distributions from the distinct values' counts
+        points = table.to_numpy('pointsCompleted')
+        points = np.where(points == MISSING_INT, 0, points)
+        tz_counts = table.to_numpy('timezonesCount')
+        tz_counts = np.abs(np.where(tz_counts == MISSING_INT, 0, tz_counts))
+        severity = table.to_numpy('severity')
+        severity_list = severity[severity == severity].tolist()
+        stats['time_zone_distribution'] = _category_counts(np, tz_counts, categorize_time_zones)
+        stats['stimulation_distribution'] = _category_counts(np, points, categorize_stimulation_dose_response)
+        stats['avg_points_stimulated'] = int(points.sum()) / len(points)
+        stats['avg_severity'] = sum(severity_list) / len(severity_list) if severity_list else 0
+        return stats
+    
+    # Points completed
+    points_list = table.filled('pointsCompleted', 0)
+    
+    # Severity (already filtered for surveyCompleted, so all should have data)
+    severity_list = [s for s in table.severity() if s == s]  # Only valid severities (not NaN)
+    
+    tz_distribution = stats['time_zone_distribution']
+    stim_distribution = stats['stimulation_distribution']
+    for points, tz_count in zip(points_list, table.filled('timezonesCount', 0)):
         # Time zone distribution (using efficacy categorization)
-        tz_diff = calculate_time_zone_difference(trip)
-        tz_cat = categorize_time_zones(tz_diff)
-        stats['time_zone_distribution'][tz_cat] = stats['time_zone_distribution'].get(tz_cat, 0) + 1
+        tz_cat = categorize_time_zones(abs(tz_count))
+        tz_distribution[tz_cat] = tz_distribution.get(tz_cat, 0) + 1
         
         # Stimulation distribution (using dose-response categorization for basic stats)
         stim_cat = categorize_stimulation_dose_response(points)
-        stats['stimulation_distribution'][stim_cat] = stats['stimulation_distribution'].get(stim_cat, 0) + 1
+        stim_distribution[stim_cat] = stim_distribution.get(stim_cat, 0) + 1
     
     stats['avg_points_stimulated'] = sum(points_list) / len(points_list) if points_list else 0
     stats['avg_severity'] = sum(severity_list) / len(severity_list) if severity_list else 0
@@ -517,7 +688,7 @@ def basic_statistics(trips: List[Dict]) -> Dict:
     return stats
 
 
-def dose_response_analysis(trips: List[Dict]) -> Dict:
+def dose_response_analysis(trips: Union[List[Dict], TripTable]) -> Dict:
     """
     Analyze dose-response relationship between intervention level and symptom severity.
     
@@ -539,67 +710,135 @@ def dose_response_analysis(trips: List[Dict]) -> Dict:
     - Groups by individual time zones (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12+)
     - Calculates aggregate severity for each group
     
+    trips may be a list of trip dicts or a TripTable; one pass over the
+    points, time zone and severity columns updates a Welford accumulator
+    per group (trip_stats.GroupedStats), so no per-group lists are kept.
+    
     Returns:
         Dict: Nested dictionary with severity statistics for each group
     """
-    # Group by stimulation level (matches charts.js dose-response lines)
-    usage_groups = {
-        '2-4 points': [],
-        '5-7 points': [],
-        '8-12 points': []
-    }
-    
-    for trip in trips:
-        points = trip.get('pointsCompleted', 0)
-        if points < 2:
+    # One pass: each trip updates the running n/mean/variance of its
+    # (group, time zone) cell (matches charts.js line 81-105)
+    groups = GroupedStats.from_pairs(dose_response_cells(TripTable.from_trips(trips)))
+
+    # Severity for each group and time zone, in chart order (matches charts.js line 78-117)
+    results = {}
+    for group_name, tz in dose_response_cell_order():
+        stats = groups.get((group_name, tz))
+        if stats is not None:
+            results[f"{group_name}_{tz}_tz"] = stats.as_dict()
+
+    return results
+
+
+def dose_response_cells(table: TripTable) -> Iterator[Tuple[Tuple, float]]:
+    """
+    ((stimulation level, time zone bucket), aggregate severity) per trip with
+    ≥2 points and a valid severity, in trip order.
+    """
+    columns = zip(table.filled('pointsCompleted', 0), table.filled('timezonesCount', 0), table.severity())
+    for points, tz_count, severity in columns:
+        if points < 2 or severity != severity:  # ≥2 points with a valid severity
             continue
         if points <= 4:
-            usage_groups['2-4 points'].append(trip)
+            group_name = '2-4 points'
         elif points <= 7:
-            usage_groups['5-7 points'].append(trip)
+            group_name = '5-7 points'
         else:
-            usage_groups['8-12 points'].append(trip)
+            group_name = '8-12 points'
+        yield (group_name, '12+' if tz_count >= 12 else tz_count), severity
+
+
+def dose_response_cell_order() -> Iterator[Tuple[str, object]]:
+    """(stimulation level, time zone bucket) cells in chart order."""
+    # Stimulation levels (matches charts.js dose-response lines)
+    usage_groups = ['2-4 points', '5-7 points', '8-12 points']
     
     # Time zone ranges (matches charts.js line 47)
     time_zone_ranges = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, '12+']
     
-    # Calculate severity for each group and time zone (matches charts.js line 78-117)
-    results = {}
-    for group_name, group_trips in usage_groups.items():
+    for group_name in usage_groups:
         for tz in time_zone_ranges:
-            # Filter trips for this specific time zone (matches charts.js line 81-83)
-            if tz == '12+':
-                tz_trips = [t for t in group_trips if t.get('timezonesCount', 0) >= 12]
-            else:
-                tz_trips = [t for t in group_trips if t.get('timezonesCount', 0) == tz]
-            
-            if len(tz_trips) > 0:
-                # Calculate aggregate severities (matches charts.js line 87-95)
-                aggregate_severities = []
-                for trip in tz_trips:
-                    severity = calculate_aggregate_severity(trip)
-                    if severity is not None:
-                        aggregate_severities.append(severity)
-                
-                if len(aggregate_severities) > 0:
-                    key = f"{group_name}_{tz}_tz"
-                    results[key] = {
-                        'n': len(aggregate_severities),
-                        'mean': sum(aggregate_severities) / len(aggregate_severities),
-                        'std': 0,  # Will calculate below
-                        'sem': 0   # Will calculate below
-                    }
-                    
-                    # Calculate std and sem (matches charts.js line 101-105)
-                    mean = results[key]['mean']
-                    variance = sum((x - mean) ** 2 for x in aggregate_severities) / len(aggregate_severities)
-                    results[key]['std'] = variance ** 0.5
-                    results[key]['sem'] = results[key]['std'] / (len(aggregate_severities) ** 0.5)
+            yield group_name, tz
+
+
+# Ordinal scores of the stimulation levels for trend tests
+DOSE_RESPONSE_BAND_SCORES = {'2-4 points': 1, '5-7 points': 2, '8-12 points': 3}
+
+
+def dose_response_trend_data(trips: Union[List[Dict], TripTable]) -> Tuple[List, List, List]:
+    """
+    (band scores, severities, time zone buckets) of the trips in the
+    dose-response chart cells, the inputs of
+    trip_permutation.stratified_trend_test().
+    """
+    chart_cells = set(dose_response_cell_order())
+    scores, severities, strata = [], [], []
+    for (group_name, tz), severity in dose_response_cells(TripTable.from_trips(trips)):
+        if (group_name, tz) not in chart_cells:
+            continue  # Only the time zone buckets shown on the chart
+        scores.append(DOSE_RESPONSE_BAND_SCORES[group_name])
+        severities.append(severity)
+        strata.append(tz)
+    return scores, severities, strata
+
+
+def dose_response_samples(trips: Union[List[Dict], TripTable]) -> Dict[str, List[float]]:
+    """
+    Aggregate severities per dose-response cell, keyed and ordered like
+    dose_response_analysis() (for resampling; empty cells are left out).
+    """
+    samples = {}
+    for cell, severity in dose_response_cells(TripTable.from_trips(trips)):
+        samples.setdefault(cell, []).append(severity)
+    return {
+        f"{group_name}_{tz}_tz": samples[(group_name, tz)]
+        for group_name, tz in dose_response_cell_order()
+        if (group_name, tz) in samples
+    }
+
+
+# Point mapping (matches analytics.js line 821-834). Point id n is bit n-1
+# of the table's pointMask column.
+POINT_MAPPING = [
+    {'id': 1, 'name': 'LU-8', 'field': 'point1Completed'},
+    {'id': 2, 'name': 'LI-1', 'field': 'point2Completed'},
+    {'id': 3, 'name': 'ST-36', 'field': 'point3Completed'},
+    {'id': 4, 'name': 'SP-3', 'field': 'point4Completed'},
+    {'id': 5, 'name': 'HT-8', 'field': 'point5Completed'},
+    {'id': 6, 'name': 'SI-5', 'field': 'point6Completed'},
+    {'id': 7, 'name': 'BL-66', 'field': 'point7Completed'},
+    {'id': 8, 'name': 'KI-3', 'field': 'point8Completed'},
+    {'id': 9, 'name': 'PC-8', 'field': 'point9Completed'},
+    {'id': 10, 'name': 'SJ-6', 'field': 'point10Completed'},
+    {'id': 11, 'name': 'GB-34', 'field': 'point11Completed'},
+    {'id': 12, 'name': 'LIV-3', 'field': 'point12Completed'}
+]
+
+
+def point_mask_histogram(trips: Union[List[Dict], TripTable]) -> Counter:
+    """
+    Number of survey-completed trips per point bitmask, in one pass.
     
-    return results
+    There are at most 4096 distinct masks, so every per-point and per-pair
+    count can be read off this histogram instead of re-scanning the trips.
+    """
+    table = TripTable.from_trips(trips)
+    surveyed = (survey == 1 for survey in table.column('surveyCompleted'))
+    return Counter(compress(table.column(POINT_MASK), surveyed))
 
 
-def point_usage_analysis(trips: List[Dict]) -> Dict:
+def mask_point_ids(mask: int) -> List[int]:
+    """Point ids (1-12) whose bits are set in mask, lowest first."""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length())
+        mask ^= low
+    return ids
+
+
+def point_usage_analysis(trips: Union[List[Dict], TripTable]) -> Dict:
     """
     Analyze which acupuncture points were most commonly stimulated.
     
@@ -607,37 +846,296 @@ def point_usage_analysis(trips: List[Dict]) -> Dict:
     - Uses point1Completed, point2Completed, etc. boolean fields
     - Maps to point names: LU-8, LI-1, ST-36, etc.
     - Counts only trips with surveyCompleted === true
+    
+    Per-point counts are summed from the bitmask histogram (one pass over
+    the trips) rather than one pass per point field.
+    """
+    return point_usage_from_histogram(point_mask_histogram(trips))
+
+
+def point_usage_from_histogram(histogram: Dict[int, int]) -> Dict:
+    """Per-point stimulation counts from a point_mask_histogram()."""
+    # Calculate stimulation counts (matches analytics.js line 841-848)
+    counts = [0] * len(POINT_MAPPING)
+    for mask, trip_count in histogram.items():
+        for point_id in mask_point_ids(mask):
+            counts[point_id - 1] += trip_count
+    
+    return {point['name']: counts[point['id'] - 1] for point in POINT_MAPPING}
+
+
+def point_combination_analysis(trips: Union[List[Dict], TripTable], top: int = 10) -> Dict:
     """
-    # Point mapping (matches analytics.js line 821-834)
-    point_mapping = [
-        {'id': 1, 'name': 'LU-8', 'field': 'point1Completed'},
-        {'id': 2, 'name': 'LI-1', 'field': 'point2Completed'},
-        {'id': 3, 'name': 'ST-36', 'field': 'point3Completed'},
-        {'id': 4, 'name': 'SP-3', 'field': 'point4Completed'},
-        {'id': 5, 'name': 'HT-8', 'field': 'point5Completed'},
-        {'id': 6, 'name': 'SI-5', 'field': 'point6Completed'},
-        {'id': 7, 'name': 'BL-66', 'field': 'point7Completed'},
-        {'id': 8, 'name': 'KI-3', 'field': 'point8Completed'},
-        {'id': 9, 'name': 'PC-8', 'field': 'point9Completed'},
-        {'id': 10, 'name': 'SJ-6', 'field': 'point10Completed'},
-        {'id': 11, 'name': 'GB-34', 'field': 'point11Completed'},
-        {'id': 12, 'name': 'LIV-3', 'field': 'point12Completed'}
+    Which points are stimulated together (Python report only; not on the dashboard).
+    
+    Counts survey-completed trips, like point_usage_analysis(). Both results
+    come from the bitmask histogram, so the cost after the single pass over
+    the trips depends only on the number of distinct masks (at most 4096).
+    
+    Returns:
+        Dict with
+        - 'cooccurrence': {point: {point: trips with both}}; the diagonal is
+          the per-point count
+        - 'combinations': the top most common exact point sets, as
+          [{'points': [names], 'count': trips}], ties in point order
+        - 'trips': survey-completed trips with at least one point
+    """
+    return point_combinations_from_histogram(point_mask_histogram(trips), top)
+
+
+def point_combinations_from_histogram(histogram: Dict[int, int], top: int = 10) -> Dict:
+    """point_combination_analysis() results from a point_mask_histogram()."""
+    names = [point['name'] for point in POINT_MAPPING]
+    matrix = [[0] * len(names) for _ in names]
+    for mask, trip_count in histogram.items():
+        ids = mask_point_ids(mask)
+        for a in ids:
+            row = matrix[a - 1]
+            for b in ids:
+                row[b - 1] += trip_count
+    
+    stimulated = [(mask, n) for mask, n in histogram.items() if mask]
+    # Most trips first; ties by the points' order (lowest bits first)
+    stimulated.sort(key=lambda item: (-item[1], mask_point_ids(item[0])))
+    combinations = [
+        {'points': [names[i - 1] for i in mask_point_ids(mask)], 'count': n}
+        for mask, n in stimulated[:top]
     ]
     
-    point_counts = {}
+    return {
+        'cooccurrence': {names[a]: dict(zip(names, matrix[a])) for a in range(len(names))},
+        'combinations': combinations,
+        'trips': sum(n for _, n in stimulated),
+    }
+
+
+# Mergeable aggregate state, stored next to the snapshot. Bump
+# AGGREGATE_VERSION when the exclusion rules or the aggregates change, so
+# stored states are rebuilt.
+AGGREGATE_SUFFIX = '.aggstate.json'
+AGGREGATE_VERSION = 1
+
+
+def _bump(counter: Dict, key, delta: int):
+    """Add delta to counter[key], dropping the key when it reaches zero."""
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class TripAggregates:
+    """
+    Mergeable state behind the report's summary figures.
+    
+    Holds counts, sums and per-cell Welford accumulators instead of trips:
+    the validation breakdown, basic_statistics(), the dose-response cells
+    and the point-mask histogram (point usage and combinations). Each trip
+    contributes independently, so add() a table of new trips and remove()
+    the old versions of changed or deleted ones, and the results equal a
+    recomputation over the updated history (up to floating-point rounding
+    in the severity means).
+    """
     
-    # Calculate stimulation counts (matches analytics.js line 841-848)
-    for point in point_mapping:
-        stimulation_count = 0
-        for trip in trips:
-            # Only count if survey completed and point field exists (matches line 842)
-            if trip.get('surveyCompleted') and trip.get(point['field']) is not None:
-                if trip.get(point['field']) is True:  # matches line 844
-                    stimulation_count += 1
+    def __init__(self):
+        self.total = 0
+        self.hmac_signed = 0
+        self.valid = 0
+        self.legacy = 0
+        self.tz_verified = 0
+        self.survey_verified = 0
+        self.valid_signed = 0
+        self.with_surveys = 0
+        self.points_sum = 0
+        self.severity_sum = 0.0
+        self.severity_count = 0
+        self.time_zone_distribution = {}
+        self.stimulation_distribution = {}
+        self.directions = {}
+        self.dose_cells = GroupedStats()
+        self.point_masks = {}
+    
+    def add(self, table: TripTable, sign: int = 1):
+        """Fold a table of trips (all trips, valid or not) into the state."""
+        self.total += sign * len(table)
+        self.hmac_signed += sign * sum(1 for signature in table.column('hmacSignature') if signature)
         
-        point_counts[point['name']] = stimulation_count
+        valid = table.take(RuleEngine(EXCLUSION_RULES).filter_table(table))
+        self.valid += sign * len(valid)
+        legacy, tz_verified, survey_verified = verification_counts(valid)
+        self.legacy += sign * legacy
+        self.tz_verified += sign * tz_verified
+        self.survey_verified += sign * survey_verified
+        self.valid_signed += sign * sum(1 for signature in valid.column('hmacSignature') if signature)
+        self.with_surveys += sign * sum(1 for survey in valid.column('surveyCompleted') if survey == 1)
+        
+        points_list = valid.filled('pointsCompleted', 0)
+        self.points_sum += sign * sum(points_list)
+        for severity in valid.severity():
+            if severity == severity:
+                self.severity_sum += sign * severity
+                self.severity_count += sign
+        for points, tz_count in zip(points_list, valid.filled('timezonesCount', 0)):
+            _bump(self.time_zone_distribution, categorize_time_zones(abs(tz_count)), sign)
+            _bump(self.stimulation_distribution, categorize_stimulation_dose_response(points), sign)
+        for direction in valid.values('travelDirection'):
+            if direction:
+                _bump(self.directions, direction, sign)
+        
+        for (group_name, tz), severity in dose_response_cells(valid):
+            key = f"{group_name}_{tz}_tz"
+            if sign > 0:
+                self.dose_cells.add(key, severity)
+            else:
+                self.dose_cells.remove(key, severity)
+        for mask, count in point_mask_histogram(valid).items():
+            _bump(self.point_masks, mask, sign * count)
+    
+    def remove(self, table: TripTable):
+        """Undo add() for trips that were added earlier (old versions)."""
+        self.add(table, -1)
+    
+    # Results, in the shape of the corresponding analysis functions
+    
+    def validation_breakdown(self) -> Dict:
+        return {
+            'total': self.total,
+            'valid': self.valid,
+            'invalid': self.total - self.valid,
+            'verified': self.tz_verified + self.survey_verified,
+            'tz_verified': self.tz_verified,
+            'survey_verified': self.survey_verified,
+            'legacy': self.legacy,
+            'hmac_authenticated': self.hmac_signed,
+            'hmac_legacy': self.total - self.hmac_signed,
+        }
+    
+    def basic_statistics(self) -> Dict:
+        return {
+            'total_trips': self.valid,
+            'trips_with_signatures': self.valid_signed,
+            'legacy_trips': self.valid - self.valid_signed,
+            'test_trips_filtered': 0,
+            'avg_points_stimulated': self.points_sum / self.valid if self.valid else 0,
+            'avg_severity': self.severity_sum / self.severity_count if self.severity_count else 0,
+            'time_zone_distribution': dict(self.time_zone_distribution),
+            'stimulation_distribution': dict(self.stimulation_distribution),
+        }
+    
+    def dose_response(self) -> Dict:
+        results = {}
+        for group_name, tz in dose_response_cell_order():
+            key = f"{group_name}_{tz}_tz"
+            stats = self.dose_cells.get(key)
+            if stats is not None:
+                results[key] = stats.as_dict()
+        return results
+    
+    def point_usage(self) -> Dict:
+        return point_usage_from_histogram(self.point_masks)
+    
+    def point_combinations(self, top: int = 10) -> Dict:
+        return point_combinations_from_histogram(self.point_masks, top)
+    
+    # JSON state
+    
+    _COUNTS = ('total', 'hmac_signed', 'valid', 'legacy', 'tz_verified', 'survey_verified',
+               'valid_signed', 'with_surveys', 'points_sum', 'severity_sum', 'severity_count')
+    
+    def to_dict(self) -> Dict:
+        state = {name: getattr(self, name) for name in self._COUNTS}
+        state['time_zone_distribution'] = self.time_zone_distribution
+        state['stimulation_distribution'] = self.stimulation_distribution
+        state['directions'] = self.directions
+        state['dose_cells'] = self.dose_cells.to_state()
+        state['point_masks'] = {str(mask): count for mask, count in self.point_masks.items()}
+        return state
+    
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'TripAggregates':
+        aggregates = cls()
+        for name in cls._COUNTS:
+            setattr(aggregates, name, state[name])
+        aggregates.time_zone_distribution = dict(state['time_zone_distribution'])
+        aggregates.stimulation_distribution = dict(state['stimulation_distribution'])
+        aggregates.directions = dict(state['directions'])
+        aggregates.dose_cells = GroupedStats.from_state(state['dose_cells'])
+        aggregates.point_masks = {int(mask): count for mask, count in state['point_masks'].items()}
+        return aggregates
+
+
+def _aggregate_key() -> str:
+    return f'a{AGGREGATE_VERSION}-d{DECODER_VERSION}-t{TABLE_VERSION}'
+
+
+def update_aggregates(trips_path: str, use_cache: bool = True) -> TripAggregates:
+    """
+    Bring the aggregate state stored next to a snapshot up to date.
+    
+    The state (<snapshot>.aggstate.json) records the sync watermark it
+    reflects and the last change-journal record it applied. After a delta
+    sync (download_firestore.py --delta), only the journal's records past
+    that point are applied: the old versions of changed or deleted trips
+    are removed and the new versions added, so the cost scales with the
+    number of changed trips. Anything else - no state, a different
+    AGGREGATE_VERSION, a full re-download, a snapshot without sync state -
+    rebuilds the state from the whole snapshot.
+    """
+    state_path = trips_path + AGGREGATE_SUFFIX
+    sync = load_sync_state(trips_path)
+    watermark = sync.get('watermark') if sync else None
+    changes = list(iter_changes(trips_path))
     
-    return point_counts
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        state = None
+    
+    aggregates = None
+    if state and state.get('key') == _aggregate_key() and watermark is not None:
+        # Journal records not yet applied; None when the journal was reset
+        # by a full download since the state was saved
+        applied = state.get('journal')
+        ids = [record.get('id') for record in changes]
+        if applied in ids:
+            pending = changes[ids.index(applied) + 1:]
+        else:
+            pending = changes if applied is None else None
+        
+        if pending == [] and state.get('watermark') == watermark:
+            aggregates = TripAggregates.from_dict(state['aggregates'])
+            print(f"Aggregate state is up to date ({state_path})")
+        elif (pending and pending[0]['from'] == state.get('watermark')
+              and pending[-1]['to'] == watermark):
+            aggregates = TripAggregates.from_dict(state['aggregates'])
+            removed = added = 0
+            for record in pending:
+                old = TripTable.from_trips(lazy_document(doc) for doc in record['removed'])
+                new = TripTable.from_trips(lazy_document(doc) for doc in record['added'])
+                aggregates.remove(old)
+                aggregates.add(new)
+                removed += len(old)
+                added += len(new)
+            print(f"Aggregate state updated from {len(pending)} sync(s): "
+                  f"{added} trips added, {removed} removed")
+    
+    if aggregates is None:
+        print("Building aggregate state from the full snapshot")
+        aggregates = TripAggregates()
+        aggregates.add(load_trip_table(trips_path, use_cache=use_cache))
+    
+    state = {
+        'key': _aggregate_key(),
+        'watermark': watermark,
+        'journal': changes[-1].get('id') if changes else None,
+        'aggregates': aggregates.to_dict(),
+    }
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(state_path + '.tmp', state_path)
+    return aggregates
 
 
 def load_airport_mapping() -> Dict[str, str]:
@@ -711,6 +1209,24 @@ def get_city_name(airport_code: str, airport_mapping: Dict[str, str]) -> str:
     return airport_mapping.get(code, code)  # Return city name if found, otherwise code
 
 
+@lru_cache(maxsize=None)
+def format_display_date(date: str) -> str:
+    """
+    Format the date part of a startDate string as "Nov 5, 2025".
+
+    Like analytics.js, this shows the literal YYYY-MM-DD before the 'T' (or
+    space), whatever the offset, and is cached per distinct string.
+    """
+    date_part = date.split('T')[0] if 'T' in date else date.split(' ')[0]
+    try:
+        # Parse just the date part (no time, no timezone)
+        dt = datetime.fromisoformat(date_part)
+    except ValueError:
+        return date
+    # No leading zero on day
+    return dt.strftime('%b %-d, %Y') if sys.platform != 'win32' else dt.strftime('%b %d, %Y').replace(' 0', ' ')
+
+
 def format_trip_record(trip: Dict, airport_mapping: Dict[str, str]) -> Dict:
     """
     Format a trip record for the dose-response data table.
@@ -719,36 +1235,16 @@ def format_trip_record(trip: Dict, airport_mapping: Dict[str, str]) -> Dict:
     Uses startDate (trip start date) as the significant date for display.
     """
     # Date - use trip start date (when the trip started)
-    # CONSISTENCY: Both script and dashboard use the UTC date component for consistency.
+    # CONSISTENCY: Both script and dashboard use the date component for consistency.
     # This ensures the same date is displayed regardless of timezone.
-    # The date component (YYYY-MM-DD) is extracted from the ISO string and formatted.
+    # The date component (YYYY-MM-DD) is extracted from the ISO string and formatted
+    # once per distinct string.
     date = trip.get('startDate')
-    if date:
-        try:
-            # Extract date component (YYYY-MM-DD) from ISO string
-            # This uses the UTC date, ensuring consistency across all timezones
-            if isinstance(date, str):
-                date_part = date.split('T')[0] if 'T' in date else date.split(' ')[0]
-            else:
-                date_str_full = str(date)
-                date_part = date_str_full.split('T')[0] if 'T' in date_str_full else date_str_full.split(' ')[0]
-            
-            # Parse just the date part (no time, no timezone)
-            dt = datetime.fromisoformat(date_part)
-            
-            # Format: "Nov 5, 2025" (no leading zero on day)
-            date_str = dt.strftime('%b %-d, %Y') if sys.platform != 'win32' else dt.strftime('%b %d, %Y').replace(' 0', ' ')
-        except:
-            date_str = str(date)
-    else:
-        date_str = 'N/A'
+    date_str = format_display_date(str(date)) if date else 'N/A'
     
-    # Device ID (extract from tripId)
-    trip_id = trip.get('tripId', '')
-    device_id = 'N/A'
-    if trip_id:
-        parts = re.split(r'[-_]', trip_id) if '/' not in trip_id else trip_id.split('/')
-        device_id = parts[0] if parts else 'N/A'
+    # Device ID (from the tripId, parsed once per table row)
+    parsed = trip.trip_id() if isinstance(trip, TripRow) else parse_trip_id(trip.get('tripId', ''))
+    device_id = parsed.device_id if parsed.trip_id else 'N/A'
     
     # Origin
     origin = get_origin_timezone(trip) or trip.get('originCode') or 'N/A'
@@ -824,8 +1320,95 @@ def format_trip_record(trip: Dict, airport_mapping: Dict[str, str]) -> Dict:
     }
 
 
-def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage: Dict, 
-                    output_path: str, total_raw_trips: int = 0, filtered_count: int = 0):
+def trip_stats_lines(breakdown: Dict, with_surveys: int, directions: Dict[str, int]) -> List[str]:
+    """TRIP STATS report section (validation breakdown, surveys, direction, HMAC)."""
+    without_surveys = breakdown['valid'] - with_surveys
+    lines = []
+    
+    # Trip Stats (matches dashboard renderTripStats)
+    lines.append("TRIP STATS")
+    lines.append("-"*70)
+    lines.append(f"{breakdown['total']} Trips")
+    verified_text = f"{breakdown['verified']} Verified"
+    if breakdown['tz_verified'] or breakdown['survey_verified']:
+        verified_text += f" (TZ {breakdown['tz_verified']}, Survey {breakdown['survey_verified']})"
+    lines.append(f"  {verified_text}")
+    lines.append(f"  {breakdown['legacy']} Legacy")
+    lines.append(f"  {breakdown['invalid']} Test")
+    lines.append("")
+    
+    lines.append(f"{breakdown['valid']} Confirmed Trips")
+    with_surveys_pct = int((with_surveys / breakdown['valid'] * 100)) if breakdown['valid'] > 0 else 0
+    without_surveys_pct = int((without_surveys / breakdown['valid'] * 100)) if breakdown['valid'] > 0 else 0
+    lines.append(f"  {with_surveys} with surveys ({with_surveys_pct}%)")
+    lines.append(f"  {without_surveys} without surveys ({without_surveys_pct}%)")
+    lines.append("")
+    
+    # Travel Direction
+    lines.append("Travel Direction")
+    if directions:
+        direction_entries = sorted(directions.items(), key=lambda x: x[1], reverse=True)
+        for direction, count in direction_entries:
+            pct = (count / breakdown['valid'] * 100) if breakdown['valid'] > 0 else 0
+            direction_label = direction.capitalize() if direction else 'N/A'
+            lines.append(f"  {count} {direction_label} ({pct:.1f}%)")
+    else:
+        lines.append("  N/A")
+    lines.append("")
+    
+    # Cryptographic Status
+    lines.append("Cryptographic Status")
+    lines.append(f"  Authenticated: {breakdown['hmac_authenticated']}")
+    lines.append(f"  Legacy (no signature): {breakdown['hmac_legacy']}")
+    lines.append("")
+    return lines
+
+
+def point_usage_lines(point_usage: Dict, valid_count: int, point_combinations: Dict = None) -> List[str]:
+    """POINT USAGE report section, plus co-occurrence and combinations if given."""
+    lines = []
+    
+    # Point Usage (matches dashboard renderPointStimulationAnalysis)
+    lines.append("POINT USAGE")
+    lines.append("-"*70)
+    lines.append(f"Point stimulation counts from {valid_count} valid trips")
+    lines.append("")
+    
+    # Sort points by count (descending)
+    sorted_points = sorted(point_usage.items(), key=lambda x: x[1], reverse=True)
+    for point, count in sorted_points:
+        lines.append(f"  {point}: {count} times")
+    lines.append("")
+    
+    # Point co-occurrence (Python report only; see point_combination_analysis)
+    if point_combinations:
+        cooccurrence = point_combinations['cooccurrence']
+        names = list(cooccurrence)
+        lines.append("POINT CO-OCCURRENCE")
+        lines.append("-"*70)
+        lines.append("Trips stimulating both points (diagonal: the point itself)")
+        lines.append("")
+        lines.append(f"{'':<6}" + "".join(f"{name:>6}" for name in names))
+        for name in names:
+            lines.append(f"{name:<6}" + "".join(f"{cooccurrence[name][other]:>6}" for other in names))
+        lines.append("")
+        
+        lines.append("MOST COMMON POINT COMBINATIONS")
+        lines.append("-"*70)
+        lines.append(f"Exact point sets among {point_combinations['trips']} trips with points stimulated")
+        lines.append("")
+        for combination in point_combinations['combinations']:
+            points = ", ".join(combination['points'])
+            lines.append(f"  {combination['count']:>5}  ({len(combination['points'])} pts) {points}")
+        lines.append("")
+    return lines
+
+
+def generate_report(all_trips: Union[List[Dict], TripTally], valid_trips: Union[List[Dict], TripTable],
+                    point_usage: Dict, 
+                    output_path: str, total_raw_trips: int = 0, filtered_count: int = 0,
+                    point_combinations: Dict = None, dose_response_ci: Dict = None,
+                    dose_response_trend: Dict = None, regression: Dict = None):
     """
     Generate human-readable analysis report matching dashboard format.
     
@@ -841,19 +1424,20 @@ def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage:
     # Load airport mapping for city name conversion
     airport_mapping = load_airport_mapping()
     
+    table = TripTable.from_trips(valid_trips)
+    
     # Calculate validation breakdown
-    breakdown = calculate_validation_breakdown(all_trips, valid_trips)
+    breakdown = calculate_validation_breakdown(all_trips, table)
     
     # Calculate travel direction distribution
     directions = {}
-    for trip in valid_trips:
-        direction = trip.get('travelDirection')
+    for direction in table.values('travelDirection'):
         if direction:
             directions[direction] = directions.get(direction, 0) + 1
     
     # Calculate confirmed trips (with/without surveys)
-    valid_with_surveys = [t for t in valid_trips if t.get('surveyCompleted', False)]
-    valid_without_surveys = [t for t in valid_trips if not t.get('surveyCompleted', False)]
+    survey_completed = table.column('surveyCompleted')
+    valid_with_surveys = [table.row(i) for i in range(len(table)) if survey_completed[i] == 1]
     
     lines = []
     lines.append("="*70)
@@ -900,42 +1484,7 @@ def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage:
     lines.append("  survey-validated trip data.")
     lines.append("")
     
-    # Trip Stats (matches dashboard renderTripStats)
-    lines.append("TRIP STATS")
-    lines.append("-"*70)
-    lines.append(f"{breakdown['total']} Trips")
-    verified_text = f"{breakdown['verified']} Verified"
-    if breakdown['tz_verified'] or breakdown['survey_verified']:
-        verified_text += f" (TZ {breakdown['tz_verified']}, Survey {breakdown['survey_verified']})"
-    lines.append(f"  {verified_text}")
-    lines.append(f"  {breakdown['legacy']} Legacy")
-    lines.append(f"  {breakdown['invalid']} Test")
-    lines.append("")
-    
-    lines.append(f"{breakdown['valid']} Confirmed Trips")
-    with_surveys_pct = int((len(valid_with_surveys) / breakdown['valid'] * 100)) if breakdown['valid'] > 0 else 0
-    without_surveys_pct = int((len(valid_without_surveys) / breakdown['valid'] * 100)) if breakdown['valid'] > 0 else 0
-    lines.append(f"  {len(valid_with_surveys)} with surveys ({with_surveys_pct}%)")
-    lines.append(f"  {len(valid_without_surveys)} without surveys ({without_surveys_pct}%)")
-    lines.append("")
-    
-    # Travel Direction
-    lines.append("Travel Direction")
-    if directions:
-        direction_entries = sorted(directions.items(), key=lambda x: x[1], reverse=True)
-        for direction, count in direction_entries:
-            pct = (count / breakdown['valid'] * 100) if breakdown['valid'] > 0 else 0
-            direction_label = direction.capitalize() if direction else 'N/A'
-            lines.append(f"  {count} {direction_label} ({pct:.1f}%)")
-    else:
-        lines.append("  N/A")
-    lines.append("")
-    
-    # Cryptographic Status
-    lines.append("Cryptographic Status")
-    lines.append(f"  Authenticated: {breakdown['hmac_authenticated']}")
-    lines.append(f"  Legacy (no signature): {breakdown['hmac_legacy']}")
-    lines.append("")
+    lines.extend(trip_stats_lines(breakdown, len(valid_with_surveys), directions))
     
     # Dose-Response Data Table (matches dashboard renderDoseResponseDataTable)
     lines.append("DOSE-RESPONSE DATA TABLE")
@@ -946,21 +1495,9 @@ def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage:
     # Sort trips by date (most recent first)
     # Uses startDate (trip start date) as the significant date for sorting
     def get_sort_date(trip):
-        """Get date for sorting - uses trip start date."""
-        date = trip.get('startDate')
-        if not date:
-            return ''
-        # Convert to sortable format (ISO string sorts correctly)
-        if isinstance(date, str):
-            # Handle ISO format
-            try:
-                if date.endswith('Z'):
-                    date = date[:-1] + '+00:00'
-                dt = datetime.fromisoformat(date.replace('Z', '+00:00'))
-                return dt.isoformat()
-            except:
-                return str(date)
-        return str(date)
+        """Get date for sorting - uses trip start date (epoch, undated last)."""
+        start_epoch = trip_epoch(trip)
+        return start_epoch if start_epoch == start_epoch else float('-inf')
     
     sorted_trips = sorted(valid_with_surveys, key=get_sort_date, reverse=True)
     
@@ -978,17 +1515,46 @@ def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage:
                     f"{record['actual']:<8} {record['improvement_expected']:<12} {record['improvement_anticipated']:<12}")
     lines.append("")
     
-    # Point Usage (matches dashboard renderPointStimulationAnalysis)
-    lines.append("POINT USAGE")
-    lines.append("-"*70)
-    lines.append(f"Point stimulation counts from {breakdown['valid']} valid trips")
-    lines.append("")
-    
-    # Sort points by count (descending)
-    sorted_points = sorted(point_usage.items(), key=lambda x: x[1], reverse=True)
-    for point, count in sorted_points:
-        lines.append(f"  {point}: {count} times")
-    lines.append("")
+    lines.extend(point_usage_lines(point_usage, breakdown['valid'], point_combinations))
+    
+    # Bootstrap intervals (only with --bootstrap; see trip_bootstrap.py)
+    if dose_response_ci:
+        lines.append("DOSE-RESPONSE BOOTSTRAP CONFIDENCE INTERVALS")
+        lines.append("-"*70)
+        lines.append("Mean aggregate severity per stimulation level and time zones crossed,")
+        lines.append("with bootstrap percentile and BCa intervals for the mean")
+        lines.append("")
+        lines.append(f"{'Cell':<22} {'n':>4} {'Mean':>6} {'SEM':>6} {'Percentile CI':>15} {'BCa CI':>15}")
+        for key, interval in dose_response_ci.items():
+            group_name, tz, _ = key.split('_')
+            sem = interval.get('sem')
+            sem_str = f"{sem:.2f}" if sem is not None else 'N/A'
+            percentile = "{:.2f}-{:.2f}".format(*interval['percentile'])
+            bca = "{:.2f}-{:.2f}".format(*interval['bca'])
+            lines.append(f"{group_name + ', ' + tz + ' TZ':<22} {interval['n']:>4} {interval['mean']:>6.2f} "
+                         f"{sem_str:>6} {percentile:>15} {bca:>15}")
+        lines.append("")
+    
+    # Permutation trend test (only with --permutations; see trip_permutation.py)
+    if dose_response_trend:
+        trend = dose_response_trend
+        low, high = trend['p_interval']
+        lines.append("DOSE-RESPONSE TREND (PERMUTATION TEST)")
+        lines.append("-"*70)
+        lines.append("Does severity fall as stimulation rises (2-4 -> 5-7 -> 8-12 points)?")
+        lines.append("Band labels permuted within time zone buckets (stratified trend test)")
+        lines.append("")
+        lines.append(f"  Trips: {trend['n']} in {trend['strata']} time zone buckets")
+        lines.append(f"  Trend statistic: {trend['statistic']:.3f} (negative = severity falls with more points)")
+        lines.append(f"  Alternative: {trend['alternative']}")
+        lines.append(f"  p-value: {trend['p_value']:.4f} (99.9% interval {low:.4f}-{high:.4f})")
+        stopped = ", stopped early" if trend['stopped_early'] else ""
+        lines.append(f"  Permutations: {trend['permutations']}{stopped}")
+        lines.append("")
+    
+    # Regression models (only with --regression; see trip_regression.py)
+    if regression:
+        lines.extend(regression_lines(regression))
     
     lines.append("="*70)
     lines.append(f"Report generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -1005,6 +1571,102 @@ def generate_report(all_trips: List[Dict], valid_trips: List[Dict], point_usage:
     print("\n" + report_text)
 
 
+def generate_summary_report(aggregates: TripAggregates, output_path: str):
+    """
+    Summary report from the aggregate state (--incremental).
+    
+    Same TRIP STATS and POINT USAGE sections as generate_report(), plus the
+    basic statistics and dose-response cells; the per-trip data table needs
+    every trip and is only in the full report.
+    """
+    breakdown = aggregates.validation_breakdown()
+    stats = aggregates.basic_statistics()
+    
+    lines = []
+    lines.append("="*70)
+    lines.append("JETLAGPRO DATA ANALYSIS SUMMARY (INCREMENTAL)")
+    lines.append("="*70)
+    lines.append("")
+    lines.append("Aggregates updated from the snapshot's change journal; run without")
+    lines.append("--incremental for the full report with the per-trip data table.")
+    lines.append("")
+    
+    lines.extend(trip_stats_lines(breakdown, aggregates.with_surveys, aggregates.directions))
+    
+    lines.append("BASIC STATISTICS")
+    lines.append("-"*70)
+    lines.append(f"  Average points stimulated: {stats['avg_points_stimulated']:.2f}")
+    lines.append(f"  Average aggregate severity: {stats['avg_severity']:.2f}")
+    time_zones = stats['time_zone_distribution']
+    stimulation = stats['stimulation_distribution']
+    lines.append("  Time zones: " + ", ".join(
+        f"{category}: {time_zones[category]}" for category in ('1-3', '4-6', '7-9', '10+')
+        if category in time_zones))
+    lines.append("  Stimulation: " + ", ".join(
+        f"{category}: {stimulation[category]}" for category in ('0-1', '2-4', '5-7', '8-12')
+        if category in stimulation))
+    lines.append("")
+    
+    lines.append("DOSE-RESPONSE CELLS")
+    lines.append("-"*70)
+    lines.append(f"{'Cell':<22} {'n':>4} {'Mean':>6} {'SD':>6} {'SEM':>6}")
+    for key, cell in aggregates.dose_response().items():
+        group_name, tz, _ = key.split('_')
+        lines.append(f"{group_name + ', ' + tz + ' TZ':<22} {cell['n']:>4} {cell['mean']:>6.2f} "
+                     f"{cell['std']:>6.2f} {cell['sem']:>6.2f}")
+    lines.append("")
+    
+    lines.extend(point_usage_lines(aggregates.point_usage(), breakdown['valid'],
+                                   aggregates.point_combinations()))
+    
+    lines.append("="*70)
+    lines.append(f"Report generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append("="*70)
+    
+    report_text = "\n".join(lines)
+    with open(output_path, 'w') as f:
+        f.write(report_text)
+    
+    print(f"\nSummary saved to: {output_path}")
+    print("\n" + report_text)
+
+
+REGRESSION_TITLES = {
+    'dose': 'jetlag_score ~ stimulated_points + time_zones + direction',
+    'primary': 'jetlag_score ~ adherence_cat + time_zones + direction',
+}
+
+
+def regression_lines(regression: Dict) -> List[str]:
+    """Report lines for the trip_regression fits (model name -> fit_model() result)."""
+    lines = []
+    lines.append("REGRESSION MODELS (OLS, ROBUST STANDARD ERRORS)")
+    lines.append("-"*70)
+    lines.append("Same models and sample as analyze_jetlag_r.R (trips with ≥2 points,")
+    lines.append("east/west direction). Estimates with cluster-robust HC1 SEs by device;")
+    lines.append("HC0-HC3 SEs listed for comparison")
+    lines.append("")
+    for model, fit in regression.items():
+        default = fit['default']
+        label = (f"cluster-robust HC1 by device_id ({fit['clusters']} clusters)"
+                 if default == 'cluster' else "robust HC1")
+        lines.append(f"{model.capitalize()} model: {REGRESSION_TITLES[model]}")
+        lines.append(f"  n = {fit['n']}, residual df = {fit['df_residual']}, "
+                     f"R² = {fit['r_squared']:.4f}, SEs: {label}")
+        if fit['dropped']:
+            lines.append(f"  Dropped (collinear): {', '.join(fit['dropped'])}")
+        lines.append(f"  {'Term':<20} {'Estimate':>9} {'SE':>8} {'t':>7} {'p':>8} "
+                     f"{'HC0':>8} {'HC1':>8} {'HC2':>8} {'HC3':>8}")
+        for j, term in enumerate(fit['terms']):
+            p_value = fit['p'][default][j]
+            p_str = "<0.0001" if p_value < 0.0001 else f"{p_value:.4f}"
+            others = " ".join(f"{fit['se'][name][j]:>8.4f}" for name in ('HC0', 'HC1', 'HC2', 'HC3'))
+            lines.append(f"  {term:<20} {fit['coefficients'][j]:>9.4f} {fit['se'][default][j]:>8.4f} "
+                         f"{fit['t'][default][j]:>7.2f} {p_str:>8} {others}")
+        lines.append("")
+    return lines
+
+
 def main():
     """Main analysis workflow."""
     parser = argparse.ArgumentParser(
@@ -1046,14 +1708,65 @@ See function docstrings for detailed methodology and rationale.
         default='analysis_report.txt',
         help='Path to output report file (default: analysis_report.txt)'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Decode the export from scratch instead of using <trips>.tripcache'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Write a summary report from the aggregate state stored next to the '
+             'snapshot (<trips>.aggstate.json), updated from the changes of the '
+             'last delta syncs'
+    )
+    parser.add_argument(
+        '--bootstrap',
+        type=int,
+        default=0,
+        metavar='REPLICATES',
+        help='Add bootstrap CIs for the dose-response cells (e.g. 10000; requires numpy)'
+    )
+    parser.add_argument(
+        '--permutations',
+        type=int,
+        default=0,
+        metavar='MAX',
+        help='Add a stratified permutation test for the dose-response trend, '
+             'drawing at most MAX permutations (e.g. 100000; requires numpy)'
+    )
+    parser.add_argument(
+        '--regression',
+        action='store_true',
+        help='Add the dose-response and primary OLS models with HC0-HC3 and '
+             'device-clustered SEs, as analyze_jetlag_r.R fits them (requires numpy)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes for --bootstrap (default: CPU count)'
+    )
     
     args = parser.parse_args()
     
+    if args.incremental:
+        try:
+            aggregates = update_aggregates(args.trips, use_cache=not args.no_cache)
+        except FileNotFoundError:
+            print(f"ERROR: Trips file not found: {args.trips}")
+            return 1
+        generate_summary_report(aggregates, args.output)
+        return 0
+    
     # Load and filter trips
     try:
-        trips = load_trips(args.trips)
-        total_raw_trips = len(trips)
-        valid_trips = filter_valid_trips(trips)
+        # All trips as typed columns (from the decoded cache when the export
+        # is unchanged); only the valid rows are kept for the analyses
+        all_trips = load_trip_table(args.trips, use_cache=not args.no_cache)
+        tally = TripTally(all_trips.rows())
+        valid_trips = all_trips.take(valid_trip_indices(all_trips))
+        total_raw_trips = tally.total
         filtered_count = total_raw_trips - len(valid_trips)
         
         if len(valid_trips) == 0:
@@ -1077,9 +1790,56 @@ See function docstrings for detailed methodology and rationale.
     point_usage = point_usage_analysis(valid_trips)
     print("✓ Point usage analysis complete")
     
+    point_combinations = point_combination_analysis(valid_trips)
+    print("✓ Point combination analysis complete")
+    
+    dose_response_ci = None
+    if args.bootstrap > 0:
+        try:
+            from trip_bootstrap import bootstrap_cells
+        except ImportError as e:
+            print(f"ERROR: {e}")
+            return 1
+        started = time.perf_counter()
+        dose_response_ci = bootstrap_cells(dose_response_samples(valid_trips), args.bootstrap,
+                                           workers=args.workers)
+        for key, cell in dose_response_analysis(valid_trips).items():
+            dose_response_ci[key]['sem'] = cell['sem']
+        print(f"✓ Bootstrap CIs complete ({args.bootstrap} replicates, "
+              f"{len(dose_response_ci)} cells, {time.perf_counter() - started:.1f}s)")
+    
+    dose_response_trend = None
+    if args.permutations > 0:
+        try:
+            from trip_permutation import stratified_trend_test
+        except ImportError as e:
+            print(f"ERROR: {e}")
+            return 1
+        started = time.perf_counter()
+        dose_response_trend = stratified_trend_test(*dose_response_trend_data(valid_trips),
+                                                    max_permutations=args.permutations)
+        print(f"✓ Trend permutation test complete ({dose_response_trend['permutations']} permutations, "
+              f"{time.perf_counter() - started:.1f}s)")
+    
+    regression = None
+    if args.regression:
+        try:
+            from trip_regression import MODELS, fit_model
+        except ImportError as e:
+            print(f"ERROR: {e}")
+            return 1
+        regression = {}
+        for model in MODELS:
+            try:
+                regression[model] = fit_model(valid_trips, model)
+            except ValueError as e:
+                print(f"WARNING: {model} model skipped: {e}")
+        print("✓ Regression models complete")
+    
     # Generate report (matches dashboard format)
-    generate_report(trips, valid_trips, point_usage, args.output, 
-                   total_raw_trips, filtered_count)
+    generate_report(tally, valid_trips, point_usage, args.output, 
+                   total_raw_trips, filtered_count, point_combinations, dose_response_ci,
+                   dose_response_trend, regression)
     
     print("\n✓ Analysis complete!")
     print("\nCompare this output with the live dashboard:")
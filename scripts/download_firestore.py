@@ -3,48 +3,88 @@
 Download Firestore collection data via REST API with automatic pagination.
 
 Usage:
-    python download_firestore.py [collection] [output_file]
+    python download_firestore.py [collection] [output_file] [--delta] [--profile NAME] [--base-url URL]
 
 Examples:
     python download_firestore.py auditLog firestore-audit.json
     python download_firestore.py tripCompletions firestore-trips.json
+
+    # Compact newline-delimited snapshot, gzip-compressed (.zst needs zstandard)
+    python download_firestore.py tripCompletions firestore-trips.ndjson.gz
+
+    # Re-run later: fetch only documents changed since the last download
+    # (the changes are also appended to <output_file>.changes.ndjson)
+    python download_firestore.py tripCompletions firestore-trips.json --delta
+
+    # Only the fields the analysis scripts read (see PROJECTION_PROFILES)
+    python download_firestore.py tripCompletions firestore-trips.json --profile analysis
+
+    # Against a local stand-in server (see firestore_standin.py) or emulator
+    python download_firestore.py tripCompletions /tmp/trips.json --base-url http://127.0.0.1:8089
+
+Transient errors (429/5xx, dropped connections) are retried with backoff. If a
+download still fails, rerun the same command: it resumes from the last page
+written to <output_file>.partial.
 """
 
-import json
+import argparse
+import os
 import sys
-import urllib.request
 
-def download_collection(collection, output_file):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from firestore_rest import (
+    PROJECTION_PROFILES,
+    download_collection as fetch_collection,
+    sync_collection,
+)
+
+
+def download_collection(collection, output_file, profile='full'):
     """Download all documents from a Firestore collection, handling pagination automatically."""
-    base_url = f'https://firestore.googleapis.com/v1/projects/jetlagpro-research/databases/(default)/documents/{collection}?pageSize=1000'
-    all_docs = []
-    token = None
-    
     print(f'Downloading {collection}...', end='', flush=True)
-    
-    while True:
-        url = base_url + (f'&pageToken={token}' if token else '')
-        response = json.loads(urllib.request.urlopen(url).read())
-        docs = response.get('documents', [])
-        all_docs.extend(docs)
-        print('.', end='', flush=True)
-        
-        token = response.get('nextPageToken')
-        if not token:
-            break
-    
-    with open(output_file, 'w') as f:
-        json.dump({'documents': all_docs}, f, indent=2)
-    
-    print(f'\nDownloaded {len(all_docs)} documents to {output_file}')
+
+    count = fetch_collection(
+        collection, output_file,
+        on_page=lambda _: print('.', end='', flush=True),
+        profile=profile
+    )
+
+    print(f'\nDownloaded {count} documents to {output_file}')
+
+
+def delta_sync_collection(collection, output_file, profile='full'):
+    """Update an existing download with only the documents changed since it was taken."""
+    print(f'Syncing {collection}...', end='', flush=True)
+
+    result = sync_collection(
+        collection, output_file,
+        on_page=lambda _: print('.', end='', flush=True),
+        profile=profile
+    )
+
+    print(f"\n{result['mode'].capitalize()} sync: fetched {result['fetched']}, "
+          f"removed {result['deleted']}, {result['documents']} documents in {output_file}")
 
 if __name__ == '__main__':
-    collection = sys.argv[1] if len(sys.argv) > 1 else 'auditLog'
-    output = sys.argv[2] if len(sys.argv) > 2 else f'firestore-{collection}.json'
-    
+    parser = argparse.ArgumentParser(description='Download a Firestore collection')
+    parser.add_argument('collection', nargs='?', default='auditLog')
+    parser.add_argument('output', nargs='?', help='Output file (default: firestore-<collection>.json)')
+    parser.add_argument('--delta', action='store_true',
+                        help='Only fetch documents changed since the last download to this file')
+    parser.add_argument('--profile', default='full', choices=sorted(PROJECTION_PROFILES),
+                        help='Field projection to download (default: full)')
+    parser.add_argument('--base-url',
+                        help='Firestore API root (default: $FIRESTORE_BASE_URL or https://firestore.googleapis.com)')
+    args = parser.parse_args()
+    output = args.output or f'firestore-{args.collection}.json'
+    if args.base_url:
+        os.environ['FIRESTORE_BASE_URL'] = args.base_url
+
     try:
-        download_collection(collection, output)
+        if args.delta:
+            delta_sync_collection(args.collection, output, args.profile)
+        else:
+            download_collection(args.collection, output, args.profile)
     except Exception as e:
         print(f'\nError: {e}', file=sys.stderr)
         sys.exit(1)
-
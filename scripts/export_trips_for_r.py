@@ -6,6 +6,7 @@ Uses the same validation and composite score logic as analyze_jetlag_data.py.
 Output columns match what analyze_jetlag_r.R expects.
 
 Usage:
+    python download_firestore.py tripCompletions trips.json --profile analysis
     python export_trips_for_r.py --trips trips.json --output firebase_export.csv
 
 Requirements: Python 3.6+ (no extra packages). Run from repo root or scripts/.
@@ -14,24 +15,24 @@ Requirements: Python 3.6+ (no extra packages). Run from repo root or scripts/.
 import csv
 import sys
 import os
-import re
 
 # Import shared logic from analyze_jetlag_data (same directory)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from analyze_jetlag_data import (
     load_trips,
-    filter_valid_trips,
+    iter_valid_trips,
     calculate_aggregate_severity,
 )
+from trip_ids import parse_trip_id
+
+# Field projection needed from tripCompletions (download_firestore.py --profile)
+FIRESTORE_PROFILE = "analysis"
 
 
 def trip_to_row(trip):
     """Build one CSV row from a validated trip (Firestore-style keys)."""
     trip_id = trip.get("tripId", "")
-    device_id = ""
-    if isinstance(trip_id, str) and trip_id:
-        parts = re.split(r"[-_]", trip_id) if "/" not in trip_id else trip_id.split("/")
-        device_id = parts[0] if parts else ""
+    device_id = parse_trip_id(trip_id).device_id
     if not device_id and trip.get("deviceId") is not None:
         device_id = str(trip.get("deviceId")).strip()
 
@@ -78,22 +79,22 @@ def main():
     p.add_argument("--output", default="firebase_export.csv", help="Output CSV path")
     args = p.parse_args()
 
-    trips = load_trips(args.trips)
-    valid = filter_valid_trips(trips)
-    rows = []
-    for t in valid:
-        row = trip_to_row(t)
-        if row is not None:
-            rows.append(row)
-    if not rows:
+    # Trips are streamed from the snapshot to the CSV; none are kept in memory
+    valid = iter_valid_trips(load_trips(args.trips))
+    rows = (row for row in map(trip_to_row, valid) if row is not None)
+    first = next(rows, None)
+    if first is None:
         print("No rows to export (missing composite score or covariates).")
         return 1
-    fieldnames = list(rows[0].keys())
+    count = 1
     with open(args.output, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w = csv.DictWriter(f, fieldnames=list(first.keys()))
         w.writeheader()
-        w.writerows(rows)
-    print(f"Exported {len(rows)} trips to {args.output}")
+        w.writerow(first)
+        for row in rows:
+            w.writerow(row)
+            count += 1
+    print(f"Exported {count} trips to {args.output}")
     return 0
 
 
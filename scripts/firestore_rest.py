@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+"""
+Firestore REST client shared by the download and verification scripts.
+
+Replaces the per-page urllib.request.urlopen loops that used to live in
+download_firestore.py, verify_trip_signatures.py and verify_audit_consistency.py.
+
+What it does differently:
+- Keeps one HTTPS connection open for the whole pull (no TLS handshake per page)
+- Asks Firestore for gzip-compressed responses
+- Fetches page N+1 on a background thread while page N is being decoded.
+  The next page token is read straight from the raw response bytes, so the
+  request for the following page goes out before the JSON is parsed.
+
+Usage:
+    from firestore_rest import FirestoreClient, download_collection, sync_collection
+
+    client = FirestoreClient()
+    for doc in client.iter_documents('tripCompletions'):
+        ...
+
+    download_collection('auditLog', 'firestore-audit.json')
+
+    # Later runs: fetch only documents changed since the stored watermark
+    sync_collection('tripCompletions', 'firestore-trips.json')
+
+    # Only the fields signature verification reads
+    download_collection('tripCompletions', 'trip-ids.json', profile='signatures')
+
+Requirements:
+    - Python 3.6+ (standard library only)
+"""
+
+import gzip
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from firestore_snapshot import (
+    CHANGES_SUFFIX,
+    PARTIAL_SUFFIX,
+    SYNC_STATE_SUFFIX,
+    SnapshotWriter,
+    iter_documents,
+    load_sync_state,
+)
+
+# API root. Override with the FIRESTORE_BASE_URL environment variable (or the
+# base_url argument) to point every script at a local stand-in server or the
+# Firestore emulator, e.g. FIRESTORE_BASE_URL=http://127.0.0.1:8089
+FIRESTORE_BASE_URL = 'https://firestore.googleapis.com'
+FIRESTORE_PROJECT = 'jetlagpro-research'
+
+# Maximum page size accepted by the Firestore list endpoint
+PAGE_SIZE = 1000
+
+# Document names per batchGet request during a delta sync
+BATCH_GET_SIZE = 300
+
+# The sync watermark never passes the time a listing started minus this
+# margin (seconds), which absorbs clock skew between this machine and
+# Firestore. Documents updated inside the margin are fetched again by the
+# next sync; that costs a few batchGet entries and loses nothing.
+WATERMARK_SAFETY_MARGIN = 300
+
+# Field mask used for the delta-sync index pass. It names no real field, so
+# Firestore returns only name/createTime/updateTime for each document.
+INDEX_MASK_FIELD = '_syncIndex'
+
+# Named field projections (sent as mask.fieldPaths). Each script declares the
+# profile it needs, so downloads carry only the fields that will be read.
+# None means no mask: every field is returned.
+PROJECTION_PROFILES = {
+    'full': None,
+    # verify_trip_signatures.py: the signature is embedded in the trip ID
+    'signatures': ['tripId'],
+    # analyze_jetlag_data.py and export_trips_for_r.py
+    'analysis': [
+        'tripId', 'deviceId', 'isTest', 'startDate', 'completionMethod',
+        'surveyCompleted', 'researchConsentGranted', 'hmacSignature',
+        'originTimezone', 'originTimeZone', 'arrivalTimeZone', 'originCode',
+        'destinationCode', 'timezonesCount', 'travelDirection', 'pointsCompleted',
+        'point1Completed', 'point2Completed', 'point3Completed', 'point4Completed',
+        'point5Completed', 'point6Completed', 'point7Completed', 'point8Completed',
+        'point9Completed', 'point10Completed', 'point11Completed', 'point12Completed',
+        'sleepPost', 'fatiguePost', 'concentrationPost', 'irritabilityPost',
+        'motivationPost', 'giPost', 'sleepPre', 'fatiguePre', 'concentrationPre',
+        'irritabilityPre', 'giPre', 'generalAnticipated', 'sleepExpectations',
+        'fatigueExpectations', 'concentrationExpectations',
+        'irritabilityExpectations', 'giExpectations',
+    ],
+}
+
+# Raw pages buffered between the fetch thread and the decoder.
+# Two is enough to keep the connection busy; more only costs memory.
+PREFETCH_PAGES = 2
+
+# Suffix of the file recording the last fully written page of a download
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+# Bounded retry for transient failures: rate limiting, server errors and
+# dropped connections. Delays use "full jitter" exponential backoff
+# (uniform between 0 and base * 2^attempt, capped) so parallel reviewers
+# hitting a 429 do not retry in lockstep.
+MAX_RETRIES = 6
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Network errors after which the connection is reopened and the request
+# retried: a dropped or reset connection (including a server closing an idle
+# keep-alive connection), a truncated body and a timeout. Anything else -
+# connection refused, DNS failure, a wrong --base-url - fails at once.
+_TRANSIENT_ERRORS = (
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    socket.timeout,
+    http.client.RemoteDisconnected,
+    http.client.IncompleteRead,
+)
+
+_NEXT_PAGE_TOKEN = re.compile(rb'"nextPageToken"\s*:\s*"([^"\\]*)"')
+
+_DONE = object()
+
+
+class FirestoreError(Exception):
+    """Non-2xx response from the Firestore REST API."""
+
+    def __init__(self, status: int, reason: str, body: bytes = b'',
+                 retry_after: Optional[float] = None):
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.retry_after = retry_after
+        super().__init__(f'HTTP {status} {reason}')
+
+
+def _peek_next_page_token(body: bytes) -> Optional[str]:
+    """
+    Find nextPageToken in a raw list response without parsing the documents.
+
+    Firestore writes the token after the documents array, so searching from
+    the end is a C-speed scan. Falls back to a full parse if the bytes do not
+    look as expected.
+    """
+    idx = body.rfind(b'"nextPageToken"')
+    if idx < 0:
+        return None
+    match = _NEXT_PAGE_TOKEN.match(body, idx)
+    if match:
+        return match.group(1).decode('ascii')
+    return json.loads(body).get('nextPageToken')
+
+
+class FirestoreClient:
+    """Minimal read-only Firestore REST client with a persistent connection."""
+
+    def __init__(self, project: str = FIRESTORE_PROJECT, base_url: Optional[str] = None,
+                 timeout: float = 60, max_retries: int = MAX_RETRIES):
+        self.project = project
+        self.base_url = (base_url or os.environ.get('FIRESTORE_BASE_URL') or FIRESTORE_BASE_URL).rstrip('/')
+        url = urllib.parse.urlsplit(self.base_url)
+        if url.scheme not in ('http', 'https') or not url.netloc:
+            raise ValueError(f'Invalid Firestore base URL: {self.base_url}')
+        self._scheme = url.scheme
+        self._netloc = url.netloc
+        self._path_prefix = url.path
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retries = 0  # Total retries performed, for progress reporting
+        self._conn = None
+
+    def documents_path(self, collection: str = '') -> str:
+        """URL path of a collection (or of a document, if given 'collection/id')."""
+        return f'{self._path_prefix}/v1/projects/{self.project}/databases/(default)/documents/{collection}'.rstrip('/')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            if self._scheme == 'https':
+                self._conn = http.client.HTTPSConnection(self._netloc, timeout=self.timeout)
+            else:
+                self._conn = http.client.HTTPConnection(self._netloc, timeout=self.timeout)
+        return self._conn
+
+    def _send(self, method: str, path: str, body: Optional[bytes]) -> bytes:
+        headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': 'jetlagpro-scripts',
+        }
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+
+        conn = self._connection()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            data = gzip.decompress(data)
+        if response.will_close:
+            self.close()
+        if response.status >= 400:
+            retry_after = response.getheader('Retry-After')
+            raise FirestoreError(
+                response.status, response.reason, data,
+                float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        return data
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> bytes:
+        """Send a request, retrying transient failures with jittered backoff."""
+        attempt = 0
+        while True:
+            try:
+                return self._send(method, path, body)
+            except FirestoreError as e:
+                if e.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise
+                delay = e.retry_after
+            except _TRANSIENT_ERRORS:
+                self.close()
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+
+            if delay is None:
+                delay = random.uniform(0, RETRY_BASE_DELAY * (2 ** attempt))
+            time.sleep(min(delay, RETRY_MAX_DELAY))
+            attempt += 1
+            self.retries += 1
+
+    def get(self, path: str, params: Optional[Dict] = None) -> bytes:
+        """GET a REST path and return the (decompressed) response body."""
+        if params:
+            path = path + '?' + urllib.parse.urlencode(params, doseq=True)
+        return self._request('GET', path)
+
+    def post(self, path: str, payload: Dict) -> bytes:
+        """POST a JSON payload to a REST path and return the response body."""
+        return self._request('POST', path, json.dumps(payload).encode('utf-8'))
+
+    def iter_raw_pages(self, collection: str, page_size: int = PAGE_SIZE,
+                       field_paths: Optional[List[str]] = None,
+                       page_token: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Yield raw list-response bodies, one per page, fetched sequentially.
+
+        field_paths, if given, is sent as mask.fieldPaths so only those fields
+        are returned (document name and timestamps are always included).
+        page_token starts the listing part-way through (resuming a download).
+        """
+        path = self.documents_path(collection)
+        token = page_token
+        while True:
+            params = {'pageSize': page_size}
+            if field_paths:
+                params['mask.fieldPaths'] = list(field_paths)
+            if token:
+                params['pageToken'] = token
+            body = self.get(path, params)
+            token = _peek_next_page_token(body)
+            yield body
+            if not token:
+                return
+
+    def iter_pages(self, collection: str, page_size: int = PAGE_SIZE,
+                   field_paths: Optional[List[str]] = None,
+                   page_token: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield parsed list-response pages.
+
+        A background thread fetches raw pages into a small bounded queue while
+        the caller parses and processes the previous one.
+        """
+        pages = queue.Queue(maxsize=PREFETCH_PAGES)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch():
+            try:
+                for body in self.iter_raw_pages(collection, page_size, field_paths, page_token):
+                    if not put(body):
+                        return
+            except BaseException as e:
+                put(e)
+                return
+            put(_DONE)
+
+        thread = threading.Thread(target=fetch, name=f'firestore-fetch-{collection}', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield json.loads(item)
+        finally:
+            stop.set()
+            thread.join()
+
+    def iter_documents(self, collection: str, page_size: int = PAGE_SIZE,
+                       field_paths: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield every document in a collection, in Firestore list order."""
+        for page in self.iter_pages(collection, page_size, field_paths):
+            yield from page.get('documents', [])
+
+    def batch_get(self, names: Iterable[str], chunk_size: int = BATCH_GET_SIZE,
+                  field_paths: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Fetch documents by full resource name via documents:batchGet.
+
+        Yields the documents that exist; names reported missing are skipped.
+        """
+        path = self.documents_path() + ':batchGet'
+        names = list(names)
+        for start in range(0, len(names), chunk_size):
+            payload = {'documents': names[start:start + chunk_size]}
+            if field_paths:
+                payload['mask'] = {'fieldPaths': list(field_paths)}
+            results = json.loads(self.post(path, payload))
+            for result in results:
+                if 'found' in result:
+                    yield result['found']
+
+
+def profile_field_paths(profile: str) -> Optional[List[str]]:
+    """Field paths for a named projection profile (None for 'full')."""
+    if profile not in PROJECTION_PROFILES:
+        raise ValueError(f"Unknown projection profile '{profile}' "
+                         f"(choose from: {', '.join(PROJECTION_PROFILES)})")
+    return PROJECTION_PROFILES[profile]
+
+
+def _timestamp_key(timestamp: str) -> str:
+    """
+    Fixed-width sort key for a Firestore RFC 3339 timestamp.
+
+    Firestore trims trailing zeros from the fractional seconds, so raw strings
+    do not compare correctly ("...:11.9Z" vs "...:11.95Z"). Padding the fraction
+    to nanoseconds makes plain string comparison exact.
+    """
+    if not timestamp:
+        return ''
+    base = timestamp.rstrip('Z')
+    seconds, _, fraction = base.partition('.')
+    return f'{seconds}.{fraction:0<9}'
+
+
+def _listing_started() -> str:
+    """Watermark ceiling for a listing starting now (see WATERMARK_SAFETY_MARGIN)."""
+    started = datetime.now(timezone.utc) - timedelta(seconds=WATERMARK_SAFETY_MARGIN)
+    return started.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _capped_watermark(highest: str, started: str) -> str:
+    """
+    Watermark recorded after a listing: the highest updateTime seen, but no
+    later than the listing start.
+
+    A listing is not a point-in-time read. A document on an early page can be
+    updated after that page was fetched while a later page holds a document
+    updated later still; the highest updateTime seen then passes the first
+    update, and a delta sync comparing against it would never fetch it.
+    Every update made after the listing started is later than its start, so
+    capping the watermark there keeps all of them visible to the next sync.
+    """
+    return min(highest, started, key=_timestamp_key)
+
+
+def _save_sync_state(output_file: str, collection: str, profile: str,
+                     count: int, watermark: str):
+    state = {
+        'collection': collection,
+        'profile': profile,
+        'watermark': watermark,
+        'documentCount': count,
+        'syncedAt': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    with open(output_file + SYNC_STATE_SUFFIX, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def _append_changes(output_file: str, since: str, watermark: str,
+                    removed: List[Dict], added: List[Dict]):
+    """Append one sync's changes to the snapshot's change journal."""
+    record = {'id': uuid.uuid4().hex, 'from': since, 'to': watermark, 'removed': removed, 'added': added}
+    with open(output_file + CHANGES_SUFFIX, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def _clear_changes(output_file: str):
+    try:
+        os.remove(output_file + CHANGES_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def _load_checkpoint(output_file: str, collection: str, profile: str) -> Optional[Dict]:
+    """Return a usable checkpoint for this download, or None to start fresh."""
+    try:
+        with open(output_file + CHECKPOINT_SUFFIX, 'r') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    partial = output_file + PARTIAL_SUFFIX
+    if (checkpoint.get('collection') != collection or checkpoint.get('profile') != profile
+            or not os.path.exists(partial) or os.path.getsize(partial) < checkpoint['offset']):
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(output_file: str, checkpoint: Dict):
+    path = output_file + CHECKPOINT_SUFFIX
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+
+def _clear_checkpoint(output_file: str):
+    try:
+        os.remove(output_file + CHECKPOINT_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def download_collection(collection: str, output_file: str,
+                        client: Optional[FirestoreClient] = None,
+                        on_page: Optional[Callable[[int], None]] = None,
+                        profile: str = 'full', resume: bool = True,
+                        on_documents: Optional[Callable[[List[Dict]], None]] = None) -> int:
+    """
+    Download all documents from a collection to a snapshot file.
+
+    profile names a field projection from PROJECTION_PROFILES; Firestore then
+    returns only those fields, cutting the payload at the source.
+
+    Each page is written as it arrives (see firestore_snapshot for the formats
+    selected by the file extension), so memory use does not grow with the
+    collection size.
+
+    RESUMING:
+    After every page the partial file is flushed to disk and a checkpoint
+    (<output>.checkpoint.json) records its byte length, the document count and
+    the nextPageToken. If the download dies (after the client's bounded
+    retries are used up), rerunning the same command truncates the partial
+    file to the last checkpoint and continues from that page token, so at
+    most one page is fetched twice. Pass resume=False to always start over.
+
+    on_page is called after each page with the running document count, so each
+    script can keep its own progress output. on_documents, if given, receives
+    each page's documents once they are written, so a consumer can process
+    the collection while it downloads; it only sees the pages fetched by this
+    call, so pass resume=False with it. Also records the sync watermark, so a
+    later sync_collection() on the same file only fetches changes (see
+    _capped_watermark for why it never passes the time the download started).
+
+    Returns the number of documents written.
+    """
+    field_paths = profile_field_paths(profile)
+    checkpoint = _load_checkpoint(output_file, collection, profile) if resume else None
+    if checkpoint:
+        writer = SnapshotWriter(output_file, resume_offset=checkpoint['offset'],
+                                resume_count=checkpoint['count'], keep_partial=True)
+        token = checkpoint['pageToken']
+        watermark = checkpoint['watermark']
+        # Checkpoints written before the start time was recorded: no safe cap,
+        # so the next sync fetches every document again
+        started = checkpoint.get('startedAt', '')
+    else:
+        _clear_checkpoint(output_file)
+        writer = SnapshotWriter(output_file, keep_partial=True)
+        token = None
+        watermark = ''
+        started = _listing_started()
+
+    owns_client = client is None
+    if owns_client:
+        client = FirestoreClient()
+
+    pages = 0
+    try:
+        with writer:
+            # A checkpoint without a page token was taken after the last page
+            if not checkpoint or token:
+                for page in client.iter_pages(collection, field_paths=field_paths, page_token=token):
+                    pages += 1
+                    for doc in page.get('documents', []):
+                        writer.write(doc)
+                        watermark = max(watermark, doc.get('updateTime', ''), key=_timestamp_key)
+                    _save_checkpoint(output_file, {
+                        'collection': collection,
+                        'profile': profile,
+                        'pageToken': page.get('nextPageToken'),
+                        'offset': writer.checkpoint(),
+                        'count': writer.count,
+                        'watermark': watermark,
+                        'startedAt': started,
+                    })
+                    if on_page:
+                        on_page(writer.count)
+                    if on_documents:
+                        on_documents(page.get('documents', []))
+    except FirestoreError as e:
+        # Page tokens do not live forever; a stale one is rejected with 400
+        if checkpoint and pages == 0 and e.status == 400:
+            return download_collection(collection, output_file, client, on_page, profile, resume=False,
+                                       on_documents=on_documents)
+        raise
+    finally:
+        if owns_client:
+            client.close()
+
+    _clear_checkpoint(output_file)
+    # Earlier changes are folded into the new snapshot; consumers rebuild from it
+    _clear_changes(output_file)
+    _save_sync_state(output_file, collection, profile, writer.count, _capped_watermark(watermark, started))
+
+    return writer.count
+
+
+def sync_collection(collection: str, output_file: str,
+                    client: Optional[FirestoreClient] = None,
+                    on_page: Optional[Callable[[int], None]] = None,
+                    profile: str = 'full') -> Dict:
+    """
+    Bring a local snapshot up to date with Firestore, fetching only changes.
+
+    METHODOLOGY:
+    1. Read the watermark stored next to the snapshot by the previous
+       download or sync: the highest document updateTime seen, capped at the
+       time that listing started (minus WATERMARK_SAFETY_MARGIN).
+    2. List the collection with a field mask that matches no field, so each
+       entry is only name + updateTime (roughly 150 bytes per document).
+    3. Fetch full documents via batchGet only for names that are new or whose
+       updateTime is past the watermark.
+    4. Drop local documents that no longer exist (not listed, or listed but
+       gone by the time batchGet asked for them) and rewrite the snapshot in
+       Firestore list order, so the result equals a fresh full download.
+       The old snapshot is streamed alongside the new one, so memory holds
+       only the name -> updateTime index and the changed documents.
+    5. Append the old versions of changed or deleted documents and the new
+       versions of changed or added ones to <output>.changes.ndjson, so
+       incremental consumers (analyze_jetlag_data.py --incremental) can
+       update their aggregates from the changes alone.
+
+    LIMITATION:
+    "Equals a fresh full download" holds for changes made before the listing
+    started, up to clock skew beyond WATERMARK_SAFETY_MARGIN. Like a full
+    download, the listing is not a point-in-time read: a document updated
+    while the listing runs may be captured before or after that update. The
+    capped watermark makes the next sync fetch it again either way.
+
+    Falls back to a full download when there is no usable snapshot or
+    watermark (first run, or a snapshot of a different collection or taken
+    with a different projection profile).
+
+    Returns a summary dict: mode ('full' or 'delta'), documents, fetched, deleted.
+    """
+    field_paths = profile_field_paths(profile)
+    state = load_sync_state(output_file)
+    if (not state or state.get('collection') != collection
+            or state.get('profile', 'full') != profile or not os.path.exists(output_file)):
+        count = download_collection(collection, output_file, client, on_page, profile)
+        return {'mode': 'full', 'documents': count, 'fetched': count, 'deleted': 0}
+
+    owns_client = client is None
+    if owns_client:
+        client = FirestoreClient()
+
+    try:
+        # Only name -> updateTime is kept in memory; documents stay on disk
+        index = {doc['name']: _timestamp_key(doc.get('updateTime', '')) for doc in iter_documents(output_file)}
+        since = state.get('watermark', '')
+        watermark = _timestamp_key(since)
+        started = _listing_started()
+
+        order = []
+        changed = []
+        for page in client.iter_pages(collection, field_paths=[INDEX_MASK_FIELD]):
+            for entry in page.get('documents', []):
+                name = entry['name']
+                order.append(name)
+                if index.pop(name, None) is None or _timestamp_key(entry.get('updateTime', '')) > watermark:
+                    changed.append(name)
+            if on_page:
+                on_page(len(order))
+        # Local documents that are no longer listed were deleted
+        unlisted = set(index)
+        del index
+
+        fetched = {doc['name']: doc for doc in client.batch_get(changed, field_paths=field_paths)}
+    finally:
+        if owns_client:
+            client.close()
+
+    # Rewrite the snapshot in list order, streaming the old one alongside.
+    # Changed documents come from batchGet; a document listed as changed but
+    # missing from batchGet was deleted in between. Old copies of replaced
+    # and deleted documents go to the change journal.
+    changed_names = set(changed)
+    removed = []
+    deleted = 0
+    old_docs = iter_documents(output_file)
+    # Unchanged old documents read ahead of their place in the list order
+    # (only if the old snapshot was not written in list order)
+    ahead = {}
+
+    def unchanged_old(name: str) -> Optional[Dict]:
+        nonlocal deleted
+        if name in ahead:
+            return ahead.pop(name)
+        for doc in old_docs:
+            old_name = doc['name']
+            if old_name in changed_names or old_name in unlisted:
+                removed.append(doc)
+                if old_name not in fetched:
+                    deleted += 1
+            elif old_name == name:
+                return doc
+            else:
+                ahead[old_name] = doc
+        return None
+
+    watermark = ''
+    with SnapshotWriter(output_file) as writer:
+        for name in order:
+            doc = fetched.get(name)
+            if doc is None and name not in changed_names:
+                doc = unchanged_old(name)
+            if doc is not None:
+                writer.write(doc)
+                watermark = max(watermark, doc.get('updateTime', ''), key=_timestamp_key)
+        unchanged_old('')  # Read the rest of the old snapshot for the journal
+
+    watermark = _capped_watermark(watermark, started)
+    added = list(fetched.values())
+    if removed or added:
+        _append_changes(output_file, since, watermark, removed, added)
+    _save_sync_state(output_file, collection, profile, writer.count, watermark)
+
+    return {'mode': 'delta', 'documents': writer.count, 'fetched': len(changed), 'deleted': deleted}
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Streaming read/write of Firestore collection snapshots.
+
+Downloads used to collect every page in memory and then write one
+pretty-printed {"documents": [...]} file. Snapshots are now written one
+document at a time as pages arrive, and read back as a stream.
+
+FORMATS (chosen by file extension when writing, detected when reading):
+- *.json               {"documents": [ ... ]} with one compact document per line.
+                       Still plain JSON, so json.load() and older tools work.
+- *.ndjson / *.jsonl   One document per line (newline-delimited JSON)
+- *.gz                 Either of the above, gzip-compressed
+- *.zst                Either of the above, zstd-compressed (needs the
+                       optional 'zstandard' package)
+
+Reading also accepts the original pretty-printed {"documents": [...]} files,
+plain JSON lists of records, and single JSON objects.
+
+Usage:
+    from firestore_snapshot import SnapshotWriter, iter_documents
+
+    with SnapshotWriter('firestore-trips.ndjson.gz') as writer:
+        for doc in docs:
+            writer.write(doc)
+
+    for doc in iter_documents('firestore-trips.ndjson.gz'):
+        ...
+
+Requirements:
+    - Python 3.6+ (standard library only; zstandard for .zst files)
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Suffix of the sidecar file that stores a snapshot's sync watermark and
+# projection profile (written by firestore_rest)
+SYNC_STATE_SUFFIX = '.sync.json'
+
+# Suffix of the in-progress file a SnapshotWriter writes before renaming
+PARTIAL_SUFFIX = '.partial'
+
+# Suffix of the change journal a delta sync appends to: one NDJSON record per
+# sync with the documents it removed (old versions) and added (new versions)
+CHANGES_SUFFIX = '.changes.ndjson'
+
+# Read size for incremental JSON parsing
+_CHUNK_SIZE = 1 << 16
+
+_NON_WHITESPACE = re.compile(r'[^ \t\r\n]')
+
+# Rest of the buffer could still continue a number ('12', '0.', '-7e+')
+_NUMBER_TAIL = re.compile(r'[-+.eE0-9]*\Z')
+
+# Compact separators: same content as indent=2, about a third of the size
+_SEPARATORS = (',', ':')
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError('zstd snapshots need the zstandard package: pip install zstandard')
+
+
+def _is_ndjson_path(path: str) -> bool:
+    name = path.lower()
+    for suffix in ('.gz', '.zst'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name.endswith(('.ndjson', '.jsonl'))
+
+
+def _compression_for(path: str) -> Optional[str]:
+    name = path.lower()
+    if name.endswith('.gz'):
+        return 'gzip'
+    if name.endswith('.zst'):
+        _require_zstandard()
+        return 'zstd'
+    return None
+
+
+def open_snapshot(path: str):
+    """Open a snapshot for text reading, decompressing gzip/zstd by magic bytes."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(_GZIP_MAGIC):
+        # Multi-member files (one member per checkpoint) read as one stream
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic == _ZSTD_MAGIC:
+        _require_zstandard()
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+class SnapshotWriter:
+    """
+    Write documents to a snapshot file one at a time.
+
+    Output goes to <path>.partial, which replaces the target only when the
+    writer is closed without error, so an interrupted download never leaves
+    a truncated snapshot behind.
+
+    checkpoint() makes everything written so far durable and returns the
+    byte offset to pass back as resume_offset after a crash. For compressed
+    output it closes the current gzip member / zstd frame; concatenated
+    members and frames decompress as one stream.
+    """
+
+    def __init__(self, path: str, resume_offset: Optional[int] = None,
+                 resume_count: int = 0, keep_partial: bool = False):
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.keep_partial = keep_partial
+        self._ndjson = _is_ndjson_path(path)
+        self._compression = _compression_for(path)
+        self._segment = None
+
+        if resume_offset is not None:
+            self._raw = open(self.partial_path, 'r+b')
+            self._raw.truncate(resume_offset)
+            self._raw.seek(resume_offset)
+            self.count = resume_count
+        else:
+            self._raw = open(self.partial_path, 'wb')
+            self.count = 0
+            if not self._ndjson:
+                self._write('{"documents": [')
+
+    def _write(self, text: str):
+        if self._segment is None:
+            if self._compression == 'gzip':
+                self._segment = gzip.GzipFile(fileobj=self._raw, mode='wb')
+            elif self._compression == 'zstd':
+                self._segment = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+            else:
+                self._segment = self._raw
+        self._segment.write(text.encode('utf-8'))
+
+    def _end_segment(self):
+        if self._segment is not None and self._segment is not self._raw:
+            self._segment.close()  # Writes the gzip trailer / zstd frame end
+        self._segment = None
+
+    def write(self, doc: Dict):
+        line = json.dumps(doc, separators=_SEPARATORS)
+        if self._ndjson:
+            self._write(line + '\n')
+        else:
+            self._write(('\n' if self.count == 0 else ',\n') + line)
+        self.count += 1
+
+    def write_many(self, docs: Iterable[Dict]):
+        for doc in docs:
+            self.write(doc)
+
+    def checkpoint(self) -> int:
+        """Flush everything written so far to disk and return its byte length."""
+        self._end_segment()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        return self._raw.tell()
+
+    def close(self):
+        if self._raw is None:
+            return
+        if not self._ndjson:
+            self._write('\n]}\n')
+        self._end_segment()
+        self._raw.close()
+        self._raw = None
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Stop writing; discard the partial file unless keep_partial is set."""
+        if self._raw is None:
+            return
+        if self.keep_partial:
+            # Leave the bytes up to the last checkpoint for a later resume
+            self._segment = None
+            self._raw.close()
+        else:
+            self._end_segment()
+            self._raw.close()
+            os.remove(self.partial_path)
+        self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _JsonStream:
+    """
+    Incremental reader for one JSON text, parsed value by value.
+
+    Reads the file in chunks and decodes one value at a time with
+    json.JSONDecoder.raw_decode, so only the value being parsed (plus one
+    chunk) is held in memory.
+    """
+
+    def __init__(self, f, text: str = ''):
+        self._f = f
+        self._buf = text
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self._f.read(_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)."""
+        while True:
+            match = _NON_WHITESPACE.search(self._buf, self._pos)
+            if match:
+                self._pos = match.start()
+                return self._buf[self._pos]
+            self._pos = len(self._buf)
+            if not self._fill():
+                return ''
+
+    def take(self, expected: str):
+        """Consume the next non-whitespace character, which must be in expected."""
+        ch = self.peek()
+        if not ch or ch not in expected:
+            raise json.JSONDecodeError(f'Expecting one of {expected!r}', self._buf, self._pos)
+        self._pos += 1
+        return ch
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number running up to the buffer end may be cut short
+                # ('12' of '125', or '0' of '0.5' cut after the point)
+                if self._eof or not _NUMBER_TAIL.match(self._buf, end):
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def items(self) -> Iterator:
+        """Yield the elements of the array starting at the current position."""
+        self.take('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(',]') == ']':
+                return
+
+
+def _iter_json(stream: _JsonStream) -> Iterator[Dict]:
+    """Yield documents from a JSON text without loading it whole."""
+    if stream.peek() == '[':
+        yield from stream.items()
+    elif stream.peek() != '{':
+        yield stream.value()
+    else:
+        # Walk the top-level object; the documents array is streamed and
+        # any other (small) members are collected
+        stream.take('{')
+        record = {}
+        streamed = False
+        if stream.peek() == '}':
+            stream.take('}')
+        else:
+            while True:
+                key = stream.value()
+                stream.take(':')
+                if key == 'documents' and stream.peek() == '[':
+                    streamed = True
+                    yield from stream.items()
+                else:
+                    record[key] = stream.value()
+                if stream.take(',}') == '}':
+                    break
+        if not streamed:
+            if 'documents' in record:
+                yield from record['documents']
+            else:
+                yield record
+    if stream.peek():
+        raise json.JSONDecodeError('Extra data', stream._buf, stream._pos)
+
+
+def iter_documents(path: str) -> Iterator[Dict]:
+    """
+    Yield the documents stored in a snapshot file, in file order.
+
+    NDJSON snapshots are read line by line. {"documents": [...]} files yield
+    their documents, plain JSON lists yield their items, and any other JSON
+    object is yielded as a single record. JSON files are parsed
+    incrementally, one document at a time, so memory use does not grow with
+    the size of the snapshot.
+    """
+    with open_snapshot(path) as f:
+        first = f.readline()
+        if not first:
+            return  # Empty NDJSON snapshot (collection had no documents)
+        stripped = first.strip()
+
+        record = None
+        if stripped.startswith('{'):
+            try:
+                record = json.loads(stripped)
+            except json.JSONDecodeError:
+                record = None  # Multi-line JSON document, parsed below
+
+        if isinstance(record, dict) and 'documents' not in record:
+            # Newline-delimited: every non-blank line is one document
+            yield record
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        if record is not None:
+            # Whole {"documents": [...]} object on one line
+            yield from record['documents']
+            return
+
+        yield from _iter_json(_JsonStream(f, first))
+
+
+def load_sync_state(path: str) -> Optional[Dict]:
+    """Return the sync state stored next to a snapshot, or None."""
+    try:
+        with open(path + SYNC_STATE_SUFFIX, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def iter_changes(path: str) -> Iterator[Dict]:
+    """
+    Records of a snapshot's change journal, oldest first.
+
+    Each record is {'id': unique record id, 'from': watermark before the
+    sync, 'to': watermark after, 'removed': [old documents], 'added': [new
+    documents]}; a changed document appears in both lists. A full download deletes the journal.
+    """
+    try:
+        with open(path + CHANGES_SUFFIX, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except FileNotFoundError:
+        return
+
+
+def snapshot_profile(path: str) -> str:
+    """Projection profile a snapshot was downloaded with ('full' if unknown)."""
+    state = load_sync_state(path)
+    return state.get('profile', 'full') if state else 'full'
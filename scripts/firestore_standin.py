@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Local Firestore REST stand-in for offline download and verification benchmarks.
+
+Serves synthetic tripCompletions and auditLog collections over the same REST
+paths the scripts use, so the download engine (firestore_rest.py) can be
+exercised and measured without network access or touching the live project.
+
+What it implements:
+- GET  .../documents/{collection}?pageSize=&pageToken=&mask.fieldPaths=
+  (list with opaque nextPageToken pagination and field masks)
+- POST .../documents:batchGet (used by delta sync)
+- gzip responses when the client sends Accept-Encoding: gzip
+- Injected latency, HTTP 429/503 errors and dropped connections
+- Updates, deletes and additions, so delta syncs have changes to fetch:
+  POST .../documents:mutate (stand-in only), StandinCollections.mutate(),
+  or --mutate-every N (see below)
+
+Documents are generated on demand from their index with a seeded RNG, so a
+1,000,000-document collection costs no memory and every run serves the same
+data until it is mutated.
+
+MUTATIONS:
+An updated document is regenerated with new symptom ratings (trips) or a new
+source (audit entries) and gets the current time as its updateTime, as
+Firestore would. Deleted documents drop out of list pages and come back as
+'missing' from batchGet; added documents are appended after the last index.
+Only the changed indices are remembered. With --mutate-every N, every Nth
+list page served also updates one document on an earlier page and one on a
+later page, which is the pattern a listing running during writes sees.
+
+    # POST body of .../documents:mutate; returns the changed document names
+    {"collection": "tripCompletions", "update": [3, 17], "delete": [5], "add": 2} Trip IDs carry valid HMAC signatures for the public research key, so
+verify_trip_signatures.py reports them as authenticated.
+
+Usage:
+    # Serve 100k trips and 100k audit entries with 20 ms latency and 1% errors
+    python firestore_standin.py serve --port 8089 --docs 100000 --latency-ms 20 --error-rate 0.01
+
+    # Point any script at it
+    FIRESTORE_BASE_URL=http://127.0.0.1:8089 python verify_trip_signatures.py
+
+    # Let writes happen while clients list the collection
+    python firestore_standin.py serve --docs 100000 --mutate-every 10
+
+    # Benchmark a full download (starts its own server in a subprocess)
+    python firestore_standin.py bench --docs 1000000 --output /tmp/trips.ndjson.gz
+
+Requirements:
+    - Python 3.7+ (standard library only; ThreadingHTTPServer)
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+PROJECT = 'jetlagpro-research'
+DOCUMENTS_PREFIX = f'/v1/projects/{PROJECT}/databases/(default)/documents'
+
+# Public research key (same default as verify_trip_signatures.py)
+SIGNATURE_KEY = b'7f3a9d8b2c4e1f6a5d8b3c9e7f2a4d6b8c1e3f5a7d9b2c4e6f8a1d3b5c7e9f2a'
+
+DESTINATIONS = ['LHRE', 'NRTW', 'BKKE', 'JFKW', 'CDGE', 'SYDE', 'LAXW', 'DXBE', 'SINE', 'GRUW']
+TIME_ZONES = [
+    'America/New_York', 'America/Los_Angeles', 'Europe/London', 'Europe/Paris',
+    'Asia/Tokyo', 'Asia/Bangkok', 'Australia/Sydney', 'Asia/Dubai',
+]
+SYMPTOMS = ['sleep', 'fatigue', 'concentration', 'irritability', 'motivation', 'gi']
+
+# Fixed epoch for generated timestamps: 2025-11-10T00:00:00Z
+BASE_EPOCH = 1762732800
+
+
+def _iso(epoch: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch)) + 'Z'
+
+
+def _trip_id(rng: random.Random, start: float) -> str:
+    device = '%08X' % rng.getrandbits(32)
+    base = '-'.join([
+        device,
+        rng.choice(DESTINATIONS),
+        time.strftime('%y%m%d', time.gmtime(start)),
+        time.strftime('%H%M', time.gmtime(start)),
+    ])
+    signature = hmac.new(SIGNATURE_KEY, base.encode('utf-8'), hashlib.sha256).hexdigest()[:8]
+    return f'{base}-{signature}'
+
+
+def make_trip(index: int, seed: int) -> Dict:
+    """Synthetic tripCompletions document, deterministic in (index, seed)."""
+    rng = random.Random(seed * 1000003 + index)
+    start = BASE_EPOCH + index * 37 + rng.randint(0, 3600)
+    trip_id = _trip_id(rng, start)
+    points = [rng.random() < 0.6 for _ in range(12)]
+    origin = rng.choice(TIME_ZONES)
+    fields = {
+        'tripId': {'stringValue': trip_id},
+        'startDate': {'stringValue': _iso(start)},
+        'completionDate': {'stringValue': _iso(start + 86400)},
+        'completionMethod': {'stringValue': rng.choice(['point12_stimulated', 'arrival_survey'])},
+        'originTimezone': {'stringValue': origin},
+        'arrivalTimeZone': {'stringValue': rng.choice(TIME_ZONES)},
+        'destinationCode': {'stringValue': trip_id.split('-')[1][:3]},
+        'timezonesCount': {'integerValue': str(rng.randint(0, 12))},
+        'travelDirection': {'stringValue': rng.choice(['east', 'west'])},
+        'pointsCompleted': {'integerValue': str(sum(points))},
+        'surveyCompleted': {'booleanValue': rng.random() < 0.7},
+        'researchConsentGranted': {'booleanValue': rng.random() < 0.9},
+        'generalAnticipated': {'integerValue': str(rng.randint(1, 5))},
+        'ageRange': {'stringValue': rng.choice(['25-34', '35-44', '45-54', '55-64'])},
+        'userComment': {'stringValue': 'Synthetic trip generated by firestore_standin.py'},
+        '_writeMetadata': {'mapValue': {'fields': {
+            'platform': {'stringValue': 'iOS 18.6.2'},
+            'source': {'stringValue': 'ios_app'},
+            'timestamp': {'timestampValue': _iso(start + 86400)},
+        }}},
+    }
+    for n, done in enumerate(points, 1):
+        fields[f'point{n}Completed'] = {'booleanValue': done}
+    for symptom in SYMPTOMS:
+        fields[f'{symptom}Post'] = {'integerValue': str(rng.randint(1, 5))}
+    return _document('tripCompletions', trip_id, fields, start + 86400)
+
+
+def make_audit_entry(index: int, seed: int) -> Dict:
+    """Synthetic auditLog document, deterministic in (index, seed)."""
+    rng = random.Random(seed * 1000033 + index)
+    when = BASE_EPOCH + index * 19
+    operation = 'CREATE' if index % 3 else 'UPDATE'
+    doc_id = '%032x' % rng.getrandbits(128)
+    fields = {
+        'eventId': {'stringValue': '%016x' % rng.getrandbits(64)},
+        'operation': {'stringValue': operation},
+        'collection': {'stringValue': 'tripCompletions'},
+        'documentId': {'stringValue': f'T{index:08d}'},
+        'source': {'stringValue': 'ios_app' if operation == 'CREATE' else 'web_survey'},
+        'timestamp': {'timestampValue': _iso(when)},
+        'changedFields': {'arrayValue': {'values': [
+            {'stringValue': 'surveyCompleted'}, {'stringValue': 'sleepPost'},
+        ]}} if operation == 'UPDATE' else {'nullValue': None},
+    }
+    return _document('auditLog', doc_id, fields, when)
+
+
+def _document(collection: str, doc_id: str, fields: Dict, updated: float) -> Dict:
+    return {
+        'name': f'projects/{PROJECT}/databases/(default)/documents/{collection}/{doc_id}',
+        'fields': fields,
+        'createTime': _iso(updated - 60)[:-1] + '.120000Z',
+        'updateTime': _iso(updated)[:-1] + '.345678Z',
+    }
+
+
+GENERATORS = {
+    'tripCompletions': make_trip,
+    'auditLog': make_audit_entry,
+}
+
+
+def _revise(collection: str, doc: Dict, index: int, revision: int, updated: float, seed: int) -> Dict:
+    """Document as changed by its revision-th update at time updated."""
+    rng = random.Random((seed * 1000003 + index) * 1009 + revision)
+    fields = dict(doc['fields'])
+    if collection == 'tripCompletions':
+        for symptom in SYMPTOMS:
+            fields[f'{symptom}Post'] = {'integerValue': str(rng.randint(1, 5))}
+    else:
+        fields['source'] = {'stringValue': f'revision_{revision}'}
+    revised = dict(doc, fields=fields)
+    revised['updateTime'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(updated)) + f'.{int(updated % 1 * 1e6):06d}Z'
+    return revised
+
+
+class StandinCollections:
+    """
+    Synthetic collections addressed by index. Only mutations are held in
+    memory: revisions of updated indices, deleted indices and the number of
+    added documents.
+    """
+
+    def __init__(self, docs: int, seed: int = 1):
+        self.docs = docs
+        self.seed = seed
+        self._counts = {collection: docs for collection in GENERATORS}
+        self._revisions = {}  # (collection, index) -> (revision, updated epoch)
+        self._deleted = set()  # (collection, index)
+        self._names = {}  # Lazily built name -> index map for batchGet
+        self._lock = threading.Lock()
+
+    def count(self, collection: str) -> int:
+        """Indices in use (deleted ones included)."""
+        return self._counts[collection]
+
+    def document(self, collection: str, index: int) -> Optional[Dict]:
+        """Current version of a document, or None if it was deleted."""
+        key = (collection, index)
+        if key in self._deleted:
+            return None
+        doc = GENERATORS[collection](index, self.seed)
+        revision = self._revisions.get(key)
+        return doc if revision is None else _revise(collection, doc, index, *revision, self.seed)
+
+    def page(self, collection: str, offset: int, size: int) -> List[Dict]:
+        docs = (self.document(collection, i) for i in range(offset, min(offset + size, self.count(collection))))
+        return [doc for doc in docs if doc is not None]
+
+    def _index(self, collection: str, name: str) -> Optional[int]:
+        with self._lock:
+            names = self._names.setdefault(collection, {})
+            make = GENERATORS[collection]
+            for i in range(len(names), self.count(collection)):
+                names[make(i, self.seed)['name']] = i
+            return names.get(name)
+
+    def get(self, name: str) -> Optional[Dict]:
+        collection = name.split('/documents/', 1)[-1].split('/', 1)[0]
+        if collection not in GENERATORS:
+            return None
+        index = self._index(collection, name)
+        return None if index is None else self.document(collection, index)
+
+    def mutate(self, collection: str, update=(), delete=(), add: int = 0) -> Dict[str, List[str]]:
+        """
+        Update and delete documents by index and append new ones.
+
+        Returns the names of the updated, deleted and added documents
+        (indices out of range or already deleted are skipped).
+        """
+        make = GENERATORS[collection]
+        changes = {'updated': [], 'deleted': [], 'added': []}
+        with self._lock:
+            now = time.time()
+            count = self._counts[collection]
+            for index in update:
+                key = (collection, index)
+                if 0 <= index < count and key not in self._deleted:
+                    revision = self._revisions.get(key, (0, now))[0] + 1
+                    self._revisions[key] = (revision, now)
+                    changes['updated'].append(make(index, self.seed)['name'])
+            for index in delete:
+                key = (collection, index)
+                if 0 <= index < count and key not in self._deleted:
+                    self._deleted.add(key)
+                    changes['deleted'].append(make(index, self.seed)['name'])
+            for index in range(count, count + add):
+                changes['added'].append(make(index, self.seed)['name'])
+            self._counts[collection] = count + add
+        return changes
+
+
+def _apply_mask(doc: Dict, field_paths: List[str]) -> Dict:
+    masked = dict(doc)
+    masked['fields'] = {k: v for k, v in doc['fields'].items() if k in field_paths}
+    return masked
+
+
+def _encode_token(offset: int) -> str:
+    return base64.urlsafe_b64encode(f'offset:{offset}'.encode()).decode().rstrip('=')
+
+
+def _decode_token(token: str) -> int:
+    padded = token + '=' * (-len(token) % 4)
+    return int(base64.urlsafe_b64decode(padded).decode().split(':', 1)[1])
+
+
+def make_handler(collections: StandinCollections, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, drop_rate: float = 0, seed: int = 1, mutate_every: int = 0):
+    """Build a request handler class bound to the given data and fault settings."""
+    fault_rng = random.Random(seed)
+    fault_lock = threading.Lock()
+    pages_served = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _inject(self) -> bool:
+            """Apply latency and faults; True if the request was already answered."""
+            with fault_lock:
+                roll = fault_rng.random()
+                delay = (latency_ms + fault_rng.uniform(0, jitter_ms)) / 1000
+            if delay:
+                time.sleep(delay)
+            if roll < drop_rate:
+                self.close_connection = True
+                return True
+            if roll < drop_rate + error_rate:
+                status = 429 if roll < drop_rate + error_rate / 2 else 503
+                self._send_json({'error': {'code': status, 'status': 'UNAVAILABLE'}}, status)
+                return True
+            return False
+
+        def _send_json(self, obj, status: int = 200):
+            body = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzip.compress(body, compresslevel=5)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if not url.path.startswith(DOCUMENTS_PREFIX + '/'):
+                self._send_json({'error': {'code': 404, 'status': 'NOT_FOUND'}}, 404)
+                return
+            collection = url.path[len(DOCUMENTS_PREFIX) + 1:]
+            if collection not in GENERATORS:
+                self._send_json({}, 200)  # Firestore returns {} for empty collections
+                return
+            if self._inject():
+                return
+
+            params = urllib.parse.parse_qs(url.query)
+            size = min(int(params.get('pageSize', ['20'])[0]), 1000)
+            try:
+                offset = _decode_token(params['pageToken'][0]) if 'pageToken' in params else 0
+            except (ValueError, IndexError):
+                self._send_json({'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}}, 400)
+                return
+
+            docs = collections.page(collection, offset, size)
+            field_paths = params.get('mask.fieldPaths')
+            if field_paths:
+                docs = [_apply_mask(doc, field_paths) for doc in docs]
+            response = {'documents': docs} if docs else {}
+            count = collections.count(collection)
+            if offset + size < count:
+                response['nextPageToken'] = _encode_token(offset + size)
+            self._send_json(response)
+
+            if mutate_every:
+                with fault_lock:
+                    pages_served[0] += 1
+                    due = pages_served[0] % mutate_every == 0
+                    # One document already listed, then one not listed yet
+                    listed = min(offset + size, count)
+                    update = [fault_rng.randrange(listed)] if listed else []
+                    if listed < count:
+                        update.append(fault_rng.randrange(listed, count))
+                if due:
+                    collections.mutate(collection, update=update)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.startswith(DOCUMENTS_PREFIX + ':mutate'):
+                request = json.loads(body)
+                if request.get('collection') not in GENERATORS:
+                    self._send_json({'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}}, 400)
+                    return
+                self._send_json(collections.mutate(request['collection'], request.get('update', []),
+                                                   request.get('delete', []), int(request.get('add', 0))))
+                return
+            if not self.path.startswith(DOCUMENTS_PREFIX + ':batchGet'):
+                self._send_json({'error': {'code': 404, 'status': 'NOT_FOUND'}}, 404)
+                return
+            if self._inject():
+                return
+            request = json.loads(body)
+            field_paths = request.get('mask', {}).get('fieldPaths')
+            results = []
+            for name in request.get('documents', []):
+                doc = collections.get(name)
+                if doc is None:
+                    results.append({'missing': name})
+                else:
+                    results.append({'found': _apply_mask(doc, field_paths) if field_paths else doc})
+            self._send_json(results)
+
+    return Handler
+
+
+def serve(port: int, docs: int, seed: int = 1, host: str = '127.0.0.1',
+          collections: Optional[StandinCollections] = None, **faults) -> ThreadingHTTPServer:
+    """
+    Create a stand-in server (call serve_forever() on the result). Its data
+    is server.collections, so in-process callers can mutate() it directly;
+    pass collections to serve existing (e.g. mutated) data instead of new.
+    """
+    collections = collections or StandinCollections(docs, seed)
+    server = ThreadingHTTPServer((host, port), make_handler(collections, seed=seed, **faults))
+    server.daemon_threads = True
+    server.collections = collections
+    return server
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Stand-in server did not start on port {port}')
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def bench(args) -> int:
+    """Run a stand-in server in a subprocess and time a full download against it."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from firestore_rest import FirestoreClient, download_collection
+
+    port = _free_port()
+    server = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), 'serve',
+        '--port', str(port), '--docs', str(args.docs), '--seed', str(args.seed),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--drop-rate', str(args.drop_rate),
+        '--mutate-every', str(args.mutate_every),
+    ])
+    try:
+        _wait_for_port(port)
+        client = FirestoreClient(base_url=f'http://127.0.0.1:{port}')
+        print(f'Downloading {args.docs} {args.collection} documents from stand-in on port {port}...')
+        started = time.perf_counter()
+        with client:
+            count = download_collection(args.collection, args.output, client=client,
+                                        profile=args.profile, resume=False)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    peak = _peak_rss_mb()
+    print(f'  Documents:  {count}')
+    print(f'  Time:       {elapsed:.2f} s ({count / elapsed:,.0f} docs/s)')
+    print(f'  Retries:    {client.retries}')
+    print(f'  Output:     {args.output} ({size_mb:.1f} MB)')
+    if peak is not None:
+        print(f'  Peak RSS:   {peak:.1f} MB')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Firestore REST stand-in server')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(p):
+        p.add_argument('--docs', type=int, default=10000, help='Documents per collection (default: 10000)')
+        p.add_argument('--seed', type=int, default=1, help='Seed for generated data and faults')
+        p.add_argument('--latency-ms', type=float, default=0, help='Added latency per request')
+        p.add_argument('--jitter-ms', type=float, default=0, help='Random extra latency per request (0..N ms)')
+        p.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered 429/503')
+        p.add_argument('--drop-rate', type=float, default=0, help='Fraction of connections dropped without a response')
+        p.add_argument('--mutate-every', type=int, default=0,
+                       help='Update two documents (one already listed, one not yet) after every N list pages')
+
+    p_serve = sub.add_parser('serve', help='Run the stand-in server')
+    p_serve.add_argument('--port', type=int, default=8089)
+    p_serve.add_argument('--host', default='127.0.0.1')
+    add_common(p_serve)
+
+    p_bench = sub.add_parser('bench', help='Time a full download against a fresh stand-in')
+    p_bench.add_argument('--collection', default='tripCompletions', choices=sorted(GENERATORS))
+    p_bench.add_argument('--output', default='standin-bench.ndjson.gz')
+    p_bench.add_argument('--profile', default='full', help='Projection profile to download')
+    add_common(p_bench)
+
+    args = parser.parse_args()
+    if args.command == 'bench':
+        return bench(args)
+
+    server = serve(args.port, args.docs, args.seed, args.host,
+                   latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                   error_rate=args.error_rate, drop_rate=args.drop_rate,
+                   mutate_every=args.mutate_every)
+    print(f'Firestore stand-in serving {args.docs} documents per collection at http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Decode Firestore REST API values to plain Python types.
+
+Every loader used to carry its own if/elif chain over the value wrappers
+(stringValue, integerValue, ...), and the three copies disagreed: only the
+audit verifier handled nested maps, and the trip signature verifier dropped
+arrays. This module is the single decoder they all share.
+
+DECODING RULES (match verify.html extractFirestoreValue()):
+- stringValue, timestampValue  -> str (timestamps are kept as-is)
+- integerValue                 -> int
+- doubleValue                  -> float
+- booleanValue                 -> bool (true or the string 'true')
+- nullValue                    -> None
+- arrayValue                   -> list (an empty arrayValue is [])
+- mapValue                     -> dict (an empty mapValue is {})
+- Anything else (plain JSON from GCS exports, Admin SDK {_seconds: ...}
+  timestamps) passes through; plain dicts have their members decoded.
+
+Scalars are decoded through a type-tag dispatch table, and arrays and maps
+are decoded with an explicit stack instead of recursion, so arbitrarily deep
+values cannot hit the recursion limit.
+
+LAZY DECODING:
+lazy_document() returns a LazyTrip, a read-only mapping that decodes each
+field the first time it is read and caches the result. Consumers that read
+only a few fields (signature checks read tripId) skip decoding the rest.
+
+Usage:
+    from firestore_values import decode_document, decode_value
+
+    trip = decode_document(doc)           # {'tripId': '...', ...}
+    trip = lazy_document(doc)             # same, decoded on first access
+    value = decode_value(doc['fields']['_writeMetadata'])
+
+    # Per-document decode cost on a snapshot (or synthetic trips)
+    python firestore_values.py [snapshot_file]
+
+Requirements:
+    - Python 3.6+ (standard library only)
+"""
+
+import os
+import sys
+import time
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator
+
+
+# Bump when decoded output changes; caches of decoded trips (trip_table.py)
+# are keyed by it and rebuilt automatically
+DECODER_VERSION = 1
+
+
+def _decode_bool(raw) -> bool:
+    return raw is True or raw == 'true'
+
+
+# Scalar type tag -> converter. Containers (arrayValue, mapValue) and
+# nullValue are handled by the stack walk in decode_value().
+SCALAR_DECODERS = {
+    'stringValue': str,
+    'timestampValue': str,
+    'integerValue': int,
+    'doubleValue': float,
+    'booleanValue': _decode_bool,
+}
+
+
+def decode_value(value: Any) -> Any:
+    """Decode one Firestore value (or plain JSON value) without recursion."""
+    root = [None]
+    stack = [(root, 0, value)]
+
+    while stack:
+        target, slot, value = stack.pop()
+
+        if isinstance(value, dict):
+            if len(value) == 1:
+                # Firestore values are single-key {typeTag: payload} objects
+                (tag, raw), = value.items()
+                decode = SCALAR_DECODERS.get(tag)
+                if decode is not None:
+                    target[slot] = decode(raw)
+                    continue
+                if tag == 'nullValue':
+                    target[slot] = None
+                    continue
+                if tag == 'arrayValue' and isinstance(raw, dict):
+                    values = raw.get('values', [])
+                    result = [None] * len(values)
+                    target[slot] = result
+                    stack.extend((result, i, v) for i, v in enumerate(values))
+                    continue
+                if tag == 'mapValue' and isinstance(raw, dict):
+                    fields = raw.get('fields', {})
+                    # Pre-fill keys so the result keeps the document's key order
+                    result = dict.fromkeys(fields)
+                    target[slot] = result
+                    stack.extend((result, k, v) for k, v in fields.items())
+                    continue
+            if '_seconds' in value:
+                # Admin SDK Timestamp object: kept as-is, normalized later
+                target[slot] = value
+                continue
+            # Plain object (GCS export) - decode each member
+            result = dict.fromkeys(value)
+            target[slot] = result
+            stack.extend((result, k, v) for k, v in value.items())
+            continue
+
+        # Strings, numbers, None and plain lists are kept as-is
+        target[slot] = value
+
+    return root[0]
+
+
+def decode_fields(fields: Dict, skip_null: bool = False) -> Dict:
+    """
+    Decode a document's 'fields' map.
+
+    With skip_null, fields holding nullValue are left out of the result, so
+    a null field and a missing field look the same to trip.get().
+    """
+    decoded = {}
+    for key, value in fields.items():
+        # Fast path: top-level scalars are by far the most common field type
+        if len(value) == 1:
+            (tag, raw), = value.items()
+            decode = SCALAR_DECODERS.get(tag)
+            if decode is not None:
+                decoded[key] = decode(raw)
+                continue
+            if tag == 'nullValue':
+                if not skip_null:
+                    decoded[key] = None
+                continue
+        decoded[key] = decode_value(value)
+    return decoded
+
+
+def decode_document(doc: Dict, skip_null: bool = True) -> Dict:
+    """
+    Decode a snapshot record into a plain trip/entry dict.
+
+    Firestore documents ({'name': ..., 'fields': {...}}) are decoded field by
+    field; records that are already plain (no 'fields' and no 'name') are
+    returned unchanged.
+    """
+    if 'fields' in doc:
+        return decode_fields(doc['fields'], skip_null)
+    if 'name' in doc:
+        return {}
+    return doc
+
+
+def _decode_field(value: Dict) -> Any:
+    """Decode one top-level field value (None for nullValue)."""
+    if len(value) == 1:
+        (tag, raw), = value.items()
+        decode = SCALAR_DECODERS.get(tag)
+        if decode is not None:
+            return decode(raw)
+        if tag == 'nullValue':
+            return None
+    return decode_value(value)
+
+
+# Sentinel for LazyTrip.__getitem__
+_MISSING = object()
+
+
+def _is_null(value: Dict) -> bool:
+    return len(value) == 1 and 'nullValue' in value
+
+
+class LazyTrip(Mapping):
+    """
+    Read-only mapping over a document's 'fields' that decodes on access.
+
+    Behaves like the dict decode_document() returns (null fields are
+    absent), but each field is decoded the first time it is read and then
+    cached. Use dict(trip) for a fully decoded copy.
+    """
+
+    __slots__ = ('_fields', '_decoded')
+
+    def __init__(self, fields: Dict):
+        self._fields = fields
+        self._decoded = {}
+
+    def get(self, key, default=None):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        raw = self._fields.get(key)
+        if raw is None:
+            return default
+        value = _decode_field(raw)
+        if value is None:
+            return default
+        self._decoded[key] = value
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        raw = self._fields.get(key)
+        return raw is not None and not _is_null(raw)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, raw in self._fields.items() if not _is_null(raw))
+
+    def __len__(self) -> int:
+        return sum(1 for raw in self._fields.values() if not _is_null(raw))
+
+    def __repr__(self) -> str:
+        return f'LazyTrip({dict(self)!r})'
+
+
+def lazy_document(doc: Dict):
+    """
+    Like decode_document(), but Firestore documents come back as a LazyTrip
+    that decodes fields on first access. Plain records are returned unchanged.
+    """
+    if 'fields' in doc:
+        return LazyTrip(doc['fields'])
+    if 'name' in doc:
+        return {}
+    return doc
+
+
+def _benchmark(path: str = None, repeat: int = 5):
+    """Print the per-document decode cost for a snapshot or synthetic trips."""
+    if path:
+        from firestore_snapshot import iter_documents
+        docs = list(iter_documents(path))
+        source = path
+    else:
+        from firestore_standin import make_trip
+        docs = [make_trip(i, 1) for i in range(20000)]
+        source = 'synthetic tripCompletions'
+    if not docs:
+        print(f'No documents in {source}')
+        return
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            decode_document(doc)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    lazy_best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            lazy_document(doc).get('tripId')
+        elapsed = time.perf_counter() - started
+        lazy_best = elapsed if lazy_best is None else min(lazy_best, elapsed)
+
+    fields = sum(len(doc.get('fields', {})) for doc in docs) / len(docs)
+    print(f'Decoded {len(docs)} documents from {source} (avg {fields:.1f} fields)')
+    print(f'  Eager, all fields: {best / len(docs) * 1e6:.2f} us/document '
+          f'({len(docs) / best:,.0f} documents/s, best of {repeat})')
+    print(f'  Lazy, tripId only: {lazy_best / len(docs) * 1e6:.2f} us/document '
+          f'({len(docs) / lazy_best:,.0f} documents/s, best of {repeat})')
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Delta sync and incremental aggregates against the local Firestore stand-in.
+
+Mutates the stand-in between syncs (and during listings, with
+mutate_every), then checks that a delta-synced snapshot equals a fresh full
+download and that aggregates updated from the change journal equal a full
+rebuild.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_jetlag_data import TripAggregates, load_trip_table, update_aggregates
+from firestore_rest import FirestoreClient, download_collection, sync_collection
+from firestore_snapshot import iter_changes, iter_documents
+from firestore_standin import serve
+
+COLLECTION = 'tripCompletions'
+
+
+def assert_close(test: unittest.TestCase, actual, expected, path: str = '', abs_tol: float = 1e-9):
+    """Recursive equality with a relative tolerance for floats."""
+    if isinstance(expected, dict):
+        test.assertEqual(set(actual), set(expected), path)
+        for key in expected:
+            assert_close(test, actual[key], expected[key], f'{path}.{key}', abs_tol)
+    elif isinstance(expected, (list, tuple)):
+        test.assertEqual(len(actual), len(expected), path)
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(test, a, e, f'{path}[{i}]', abs_tol)
+    elif isinstance(expected, float) and not isinstance(actual, str):
+        test.assertTrue(math.isclose(actual, expected, rel_tol=1e-9, abs_tol=abs_tol)
+                        or (actual != actual and expected != expected), f'{path}: {actual} != {expected}')
+    else:
+        test.assertEqual(actual, expected, path)
+
+
+class StandinTestCase(unittest.TestCase):
+    docs = 2500
+    mutate_every = 0
+
+    def setUp(self):
+        self.server = serve(0, self.docs, mutate_every=self.mutate_every)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = FirestoreClient(base_url=f'http://127.0.0.1:{self.server.server_address[1]}')
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def restart(self, server):
+        """Switch the client to another stand-in server."""
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.client = FirestoreClient(base_url=f'http://127.0.0.1:{server.server_address[1]}')
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def fresh_download(self):
+        with FirestoreClient(base_url=self.client.base_url) as client:
+            download_collection(COLLECTION, self.path('fresh.ndjson'), client=client, resume=False)
+        return list(iter_documents(self.path('fresh.ndjson')))
+
+
+class DeltaSyncTest(StandinTestCase):
+
+    def test_sync_applies_updates_deletes_and_additions(self):
+        snapshot = self.path('trips.ndjson')
+        download_collection(COLLECTION, snapshot, client=self.client)
+        changes = self.server.collections.mutate(COLLECTION, update=[3, 40, 41, 2000],
+                                                 delete=[7, 1500], add=5)
+
+        result = sync_collection(COLLECTION, snapshot, client=self.client)
+
+        self.assertEqual(result['mode'], 'delta')
+        self.assertEqual(result['deleted'], 2)
+        self.assertEqual(result['documents'], self.docs - 2 + 5)
+        self.assertEqual(list(iter_documents(snapshot)), self.fresh_download())
+        record, = iter_changes(snapshot)
+        self.assertEqual({doc['name'] for doc in record['removed']},
+                         set(changes['updated'] + changes['deleted']))
+        self.assertEqual({doc['name'] for doc in record['added']},
+                         set(changes['updated'] + changes['added']))
+
+    def test_document_deleted_before_batch_get_is_dropped(self):
+        snapshot = self.path('trips.ndjson')
+        download_collection(COLLECTION, snapshot, client=self.client)
+        collections = self.server.collections
+        updated = collections.mutate(COLLECTION, update=[11])['updated']
+        get = collections.get
+        # Listed as changed, then gone by the time batchGet asks for it
+        collections.get = lambda name: None if name in updated else get(name)
+
+        result = sync_collection(COLLECTION, snapshot, client=self.client)
+
+        self.assertEqual(result['deleted'], 1)
+        self.assertNotIn(updated[0], {doc['name'] for doc in iter_documents(snapshot)})
+        record, = iter_changes(snapshot)
+        self.assertEqual([doc['name'] for doc in record['removed']], updated)
+        self.assertEqual(record['added'], [])
+
+    def test_unchanged_collection_fetches_nothing(self):
+        snapshot = self.path('trips.ndjson')
+        download_collection(COLLECTION, snapshot, client=self.client)
+        result = sync_collection(COLLECTION, snapshot, client=self.client)
+        self.assertEqual((result['fetched'], result['deleted']), (0, 0))
+        self.assertEqual(list(iter_changes(snapshot)), [])
+
+
+class WritesDuringListingTest(StandinTestCase):
+    mutate_every = 1
+
+    def test_updates_made_while_listing_are_fetched_by_the_next_sync(self):
+        # Every page served updates one document already listed and one
+        # still to come, so the highest updateTime seen passes the earlier
+        # updates; the watermark must not
+        snapshot = self.path('trips.ndjson')
+        download_collection(COLLECTION, snapshot, client=self.client)
+        self.assertNotEqual(list(iter_documents(snapshot)), self.fresh_download())
+
+        # Sync and compare against a server without further writes
+        self.restart(serve(0, 0, collections=self.server.collections))
+        sync_collection(COLLECTION, snapshot, client=self.client)
+
+        self.assertEqual(list(iter_documents(snapshot)), self.fresh_download())
+
+
+class IncrementalAggregatesTest(StandinTestCase):
+
+    def test_incremental_update_equals_full_rebuild(self):
+        snapshot = self.path('trips.ndjson')
+        download_collection(COLLECTION, snapshot, client=self.client)
+        with contextlib.redirect_stdout(io.StringIO()):
+            update_aggregates(snapshot, use_cache=False)
+
+        collections = self.server.collections
+        collections.mutate(COLLECTION, update=range(0, 2500, 37), delete=[5, 900, 901], add=40)
+        sync_collection(COLLECTION, snapshot, client=self.client)
+        collections.mutate(COLLECTION, update=[5, 6, 2510], delete=[2520])
+        sync_collection(COLLECTION, snapshot, client=self.client)
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            incremental = update_aggregates(snapshot, use_cache=False)
+        self.assertIn('updated from 2 sync(s)', out.getvalue())
+
+        rebuilt = TripAggregates()
+        rebuilt.add(load_trip_table(snapshot, use_cache=False))
+        for result in ('validation_breakdown', 'basic_statistics', 'dose_response',
+                       'point_usage', 'point_combinations'):
+            with self.subTest(result=result):
+                assert_close(self, getattr(incremental, result)(), getattr(rebuilt, result)())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+FirestoreClient retries and resumable downloads against the local stand-in.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_rest
+from firestore_rest import CHECKPOINT_SUFFIX, FirestoreClient, download_collection
+from firestore_snapshot import PARTIAL_SUFFIX, iter_documents
+from firestore_standin import serve
+
+COLLECTION = 'tripCompletions'
+
+
+def _start(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class RetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.dir)
+
+    def standin(self, docs: int, **faults) -> str:
+        server = serve(0, docs, **faults)
+        self.servers.append(server)
+        return _start(server)
+
+    def test_dropped_connections_and_503s_are_retried(self):
+        url = self.standin(3000, error_rate=0.2, drop_rate=0.1, seed=3)
+        output = os.path.join(self.dir, 'trips.ndjson')
+        with FirestoreClient(base_url=url) as client:
+            count = download_collection(COLLECTION, output, client=client)
+        self.assertGreater(client.retries, 0)
+        self.assertEqual(count, 3000)
+        self.assertEqual(len(list(iter_documents(output))), 3000)
+
+    def test_refused_connection_fails_without_retrying(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]  # Closed again: nothing listens here
+        client = FirestoreClient(base_url=f'http://127.0.0.1:{port}')
+        started = time.perf_counter()
+        with self.assertRaises(ConnectionRefusedError):
+            client.get(client.documents_path(COLLECTION))
+        self.assertEqual(client.retries, 0)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.server = serve(0, 3500)
+        self.url = _start(self.server)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def interrupted_download(self, output: str, pages: int):
+        """Run a download that dies after the given number of pages."""
+        class Interrupted(Exception):
+            pass
+
+        def on_page(count):
+            if count >= pages * firestore_rest.PAGE_SIZE:
+                raise Interrupted()
+
+        with FirestoreClient(base_url=self.url) as client:
+            with self.assertRaises(Interrupted):
+                download_collection(COLLECTION, output, client=client, on_page=on_page)
+
+    def test_resume_after_interruption_equals_full_download(self):
+        expected = os.path.join(self.dir, 'expected.json')
+        with FirestoreClient(base_url=self.url) as client:
+            download_collection(COLLECTION, expected, client=client)
+
+        for name in ('trips.json', 'trips.ndjson.gz'):
+            with self.subTest(output=name):
+                output = os.path.join(self.dir, name)
+                self.interrupted_download(output, pages=2)
+                self.assertTrue(os.path.exists(output + CHECKPOINT_SUFFIX))
+                with FirestoreClient(base_url=self.url) as client:
+                    download_collection(COLLECTION, output, client=client)
+                self.assertFalse(os.path.exists(output + CHECKPOINT_SUFFIX))
+                self.assertEqual(list(iter_documents(output)), list(iter_documents(expected)))
+
+    def test_resume_truncates_bytes_written_after_the_checkpoint(self):
+        output = os.path.join(self.dir, 'trips.ndjson')
+        self.interrupted_download(output, pages=1)
+        # A crash mid-page leaves bytes past the checkpoint offset
+        with open(output + PARTIAL_SUFFIX, 'ab') as f:
+            f.write(b'{"name": "half a docum')
+        with FirestoreClient(base_url=self.url) as client:
+            count = download_collection(COLLECTION, output, client=client)
+        self.assertEqual(count, 3500)
+        self.assertEqual(len({doc['name'] for doc in iter_documents(output)}), 3500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Snapshot files: SnapshotWriter formats, and the incremental JSON parser
+across chunk boundaries.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_snapshot
+from firestore_snapshot import PARTIAL_SUFFIX, SnapshotWriter, _iter_json, _JsonStream, iter_documents
+
+DOCS = [
+    {'name': 'projects/p/documents/tripCompletions/a', 'fields': {
+        'tripId': {'stringValue': 'A1B2C3D4-1730534400000'},
+        'pointsCompleted': {'integerValue': '12'},
+        'sleepPost': {'doubleValue': 2.5e-1},
+        'note': {'stringValue': 'commas, ] brackets } and "quotes" \\ é漢'},
+    }},
+    {'name': 'projects/p/documents/tripCompletions/b', 'fields': {}},
+    {'name': 'projects/p/documents/tripCompletions/c', 'fields': {
+        'count': {'integerValue': '1234567890'},
+        'values': {'arrayValue': {'values': [{'doubleValue': -1.5}, {'nullValue': None}]}},
+    }},
+]
+
+
+def parse(text: str, chunk_size: int):
+    with mock.patch.object(firestore_snapshot, '_CHUNK_SIZE', chunk_size):
+        return list(_iter_json(_JsonStream(io.StringIO(text))))
+
+
+class ChunkBoundaryTest(unittest.TestCase):
+    """Every chunk size splits the text at a different set of positions."""
+
+    def assert_parses(self, text: str, expected):
+        for chunk_size in range(1, 40):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(text, chunk_size), expected)
+
+    def test_pretty_printed_documents_object(self):
+        text = json.dumps({'documents': DOCS, 'count': 3}, indent=2, ensure_ascii=False)
+        self.assert_parses(text, DOCS)
+
+    def test_compact_and_ascii_escaped(self):
+        self.assert_parses(json.dumps({'documents': DOCS}), DOCS)
+
+    def test_plain_list(self):
+        self.assert_parses(json.dumps(DOCS, indent=1), DOCS)
+
+    def test_numbers_ending_at_a_chunk_boundary(self):
+        # A number cut by the chunk end still parses as a (shorter) number
+        self.assert_parses('[1234567890, 0.000125, -7e10]', [1234567890, 0.000125, -7e10])
+
+    def test_single_object_and_empty_inputs(self):
+        self.assert_parses('  {"tripId": "x", "count": 10}  ', [{'tripId': 'x', 'count': 10}])
+        self.assert_parses('{"documents": []}', [])
+        self.assert_parses('[ ]', [])
+        self.assert_parses('{}', [{}])
+
+    def test_truncated_and_trailing_data_raise(self):
+        text = json.dumps({'documents': DOCS})
+        for bad in (text[:-3], text + ' []'):
+            for chunk_size in (1, 7, 1 << 16):
+                with self.subTest(chunk_size=chunk_size, bad=bad[-10:]):
+                    with self.assertRaises(json.JSONDecodeError):
+                        parse(bad, chunk_size)
+
+
+class IterDocumentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_file_forms(self):
+        forms = {
+            'pretty.json': json.dumps({'documents': DOCS}, indent=2),
+            'one-line.json': json.dumps({'documents': DOCS}),
+            'list.json': json.dumps(DOCS, indent=2),
+            'docs.ndjson': ''.join(json.dumps(doc) + '\n\n' for doc in DOCS),
+        }
+        for name, text in forms.items():
+            path = self.write(name, text)
+            with self.subTest(form=name), mock.patch.object(firestore_snapshot, '_CHUNK_SIZE', 5):
+                self.assertEqual(list(iter_documents(path)), DOCS)
+
+    def test_empty_file(self):
+        self.assertEqual(list(iter_documents(self.write('empty.ndjson', ''))), [])
+
+
+class SnapshotWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_formats_round_trip(self):
+        for name in ('trips.json', 'trips.ndjson', 'trips.jsonl', 'trips.json.gz', 'trips.ndjson.gz'):
+            path = os.path.join(self.dir, name)
+            with self.subTest(format=name):
+                with SnapshotWriter(path) as writer:
+                    writer.write_many(DOCS)
+                self.assertFalse(os.path.exists(path + PARTIAL_SUFFIX))
+                self.assertEqual(list(iter_documents(path)), DOCS)
+                if name == 'trips.json':
+                    with open(path, encoding='utf-8') as f:
+                        self.assertEqual(json.load(f), {'documents': DOCS})
+
+    def test_empty_snapshots(self):
+        for name in ('empty.json', 'empty.ndjson.gz'):
+            path = os.path.join(self.dir, name)
+            with self.subTest(format=name):
+                SnapshotWriter(path).close()
+                self.assertEqual(list(iter_documents(path)), [])
+
+    def test_resume_from_a_checkpoint_across_gzip_members(self):
+        path = os.path.join(self.dir, 'trips.ndjson.gz')
+        writer = SnapshotWriter(path, keep_partial=True)
+        writer.write(DOCS[0])
+        offset = writer.checkpoint()
+        writer.write(DOCS[1])  # Lost: written after the checkpoint
+        writer.abort()
+
+        with SnapshotWriter(path, resume_offset=offset, resume_count=1) as writer:
+            writer.write_many(DOCS[1:])
+        self.assertEqual(writer.count, len(DOCS))
+        self.assertEqual(list(iter_documents(path)), DOCS)
+
+    def test_error_keeps_the_previous_snapshot(self):
+        path = os.path.join(self.dir, 'trips.ndjson')
+        with SnapshotWriter(path) as writer:
+            writer.write(DOCS[0])
+        with self.assertRaises(RuntimeError):
+            with SnapshotWriter(path) as writer:
+                writer.write_many(DOCS)
+                raise RuntimeError('download failed')
+        self.assertFalse(os.path.exists(path + PARTIAL_SUFFIX))
+        self.assertEqual(list(iter_documents(path)), DOCS[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Firestore value decoder: round trips through the REST value encoding, and
+LazyTrip views that must read like the eagerly decoded dict.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firestore_values import LazyTrip, decode_document, decode_fields, decode_value, lazy_document
+
+
+def encode(value):
+    """Python value -> Firestore REST value (the inverse of decode_value())."""
+    if value is None:
+        return {'nullValue': None}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'integerValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, str):
+        return {'stringValue': value}
+    if isinstance(value, list):
+        return {'arrayValue': {'values': [encode(v) for v in value]} if value else {}}
+    if isinstance(value, dict):
+        return {'mapValue': {'fields': {k: encode(v) for k, v in value.items()}} if value else {}}
+    raise TypeError(value)
+
+
+TRIP = {
+    'tripId': 'A1B2C3D4-1730534400000-1730620800000-LHR-JFK',
+    'pointsCompleted': 12,
+    'timezonesCount': -5,
+    'sleepPost': 2.5,
+    'surveyCompleted': True,
+    'isTest': False,
+    'originCode': '',
+    'tags': ['a', 1, 2.0, None, True, [], {}],
+    'survey': {'answers': {'q1': [1, {'deep': 'x'}]}, 'empty': {}},
+}
+
+
+class DecodeValueTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for key, value in TRIP.items():
+            with self.subTest(field=key):
+                decoded = decode_value(encode(value))
+                self.assertEqual(decoded, value)
+                self.assertEqual(type(decoded), type(value))
+
+    def test_document_round_trip_keeps_key_order(self):
+        decoded = decode_document({'name': 'x', 'fields': {k: encode(v) for k, v in TRIP.items()}})
+        self.assertEqual(list(decoded.items()), list(TRIP.items()))
+        self.assertEqual(list(decoded['survey']), ['answers', 'empty'])
+
+    def test_null_fields_are_skipped_unless_asked_for(self):
+        fields = {'a': encode(None), 'b': encode(1)}
+        self.assertEqual(decode_document({'fields': fields}), {'b': 1})
+        self.assertEqual(decode_fields(fields), {'a': None, 'b': 1})
+
+    def test_wire_forms(self):
+        self.assertIs(decode_value({'booleanValue': 'true'}), True)
+        self.assertIs(decode_value({'booleanValue': 'false'}), False)
+        self.assertEqual(decode_value({'integerValue': '-42'}), -42)
+        self.assertEqual(decode_value({'timestampValue': '2025-11-02T08:00:00Z'}), '2025-11-02T08:00:00Z')
+        self.assertEqual(decode_value({'arrayValue': {}}), [])
+        self.assertEqual(decode_value({'mapValue': {}}), {})
+
+    def test_plain_records_pass_through(self):
+        admin_timestamp = {'_seconds': 1730534400, '_nanoseconds': 0}
+        self.assertIs(decode_value(admin_timestamp), admin_timestamp)
+        plain = {'tripId': 'x', 'nested': {'count': {'integerValue': '3'}}, 'list': [1, 2]}
+        self.assertEqual(decode_value(plain), {'tripId': 'x', 'nested': {'count': 3}, 'list': [1, 2]})
+        self.assertIs(decode_document(plain), plain)
+        self.assertEqual(decode_document({'name': 'x'}), {})
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = sys.getrecursionlimit() * 3
+        value = 'leaf'
+        for _ in range(depth):
+            value = {'mapValue': {'fields': {'child': {'arrayValue': {'values': [value]}}}}}
+        decoded = decode_value(value)
+        for _ in range(depth):
+            decoded, = decoded['child']
+        self.assertEqual(decoded, 'leaf')
+
+
+class LazyTripTest(unittest.TestCase):
+
+    def setUp(self):
+        fields = {k: encode(v) for k, v in TRIP.items()}
+        fields['optional'] = encode(None)
+        self.doc = {'name': 'x', 'fields': fields}
+
+    def test_reads_like_the_decoded_dict(self):
+        eager = decode_document(self.doc)
+        lazy = lazy_document(self.doc)
+        self.assertIsInstance(lazy, LazyTrip)
+        self.assertEqual(dict(lazy), eager)
+        self.assertEqual(list(lazy), list(eager))
+        self.assertEqual(len(lazy), len(eager))
+        for key in list(TRIP) + ['optional', 'absent']:
+            with self.subTest(field=key):
+                self.assertEqual(key in lazy, key in eager)
+                self.assertEqual(lazy.get(key), eager.get(key))
+                self.assertEqual(lazy.get(key, 'default'), eager.get(key, 'default'))
+        with self.assertRaises(KeyError):
+            lazy['optional']
+
+    def test_fields_decode_once_on_first_access(self):
+        lazy = lazy_document(self.doc)
+        self.assertEqual(lazy._decoded, {})
+        survey = lazy['survey']
+        self.assertEqual(set(lazy._decoded), {'survey'})
+        self.assertIs(lazy.get('survey'), survey)
+
+    def test_plain_records_pass_through(self):
+        plain = {'tripId': 'x'}
+        self.assertIs(lazy_document(plain), plain)
+        self.assertEqual(lazy_document({'name': 'x'}), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+12-bit point masks: per-point counts and co-occurrence from the mask
+histogram, checked against direct counts over the point fields.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import itertools
+import os
+import random
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_jetlag_data import (
+    POINT_MAPPING, mask_point_ids, point_combination_analysis, point_mask_histogram,
+    point_usage_analysis,
+)
+from trip_table import POINT_MASK, TripTable
+
+
+def random_trips(count: int = 500, seed: int = 3):
+    rng = random.Random(seed)
+    trips = []
+    for _ in range(count):
+        trip = {'surveyCompleted': rng.choice((True, True, False, None, 'true', 1))}
+        for point in POINT_MAPPING:
+            roll = rng.random()
+            if roll < 0.45:
+                trip[point['field']] = True
+            elif roll < 0.9:
+                trip[point['field']] = False
+            elif roll < 0.95:
+                trip[point['field']] = rng.choice((None, 'true', 1))
+        trips.append(trip)
+    return trips
+
+
+def stimulated(trip):
+    """Point ids counted for a trip, as analytics.js does (surveyed, exactly true)."""
+    if not trip.get('surveyCompleted'):
+        return []
+    return [point['id'] for point in POINT_MAPPING if trip.get(point['field']) is True]
+
+
+class PointMaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trips = random_trips()
+
+    def test_mask_bits_match_the_point_fields(self):
+        table = TripTable.from_trips(self.trips)
+        for trip, mask in zip(self.trips, table.column(POINT_MASK)):
+            expected = [p['id'] for p in POINT_MAPPING if trip.get(p['field']) is True]
+            self.assertEqual(mask_point_ids(mask), expected)
+        self.assertEqual(mask_point_ids(0), [])
+        self.assertEqual(mask_point_ids(0xFFF), list(range(1, 13)))
+
+    def test_histogram_counts_surveyed_trips(self):
+        histogram = point_mask_histogram(self.trips)
+        expected = Counter(sum(1 << (i - 1) for i in stimulated(t)) for t in self.trips if t.get('surveyCompleted'))
+        self.assertEqual(histogram, expected)
+
+    def test_point_usage_matches_direct_counts(self):
+        expected = {p['name']: sum(1 for t in self.trips if p['id'] in stimulated(t)) for p in POINT_MAPPING}
+        self.assertEqual(point_usage_analysis(self.trips), expected)
+        self.assertEqual(point_usage_analysis(TripTable.from_trips(self.trips)), expected)
+
+    def test_cooccurrence_and_combinations(self):
+        result = point_combination_analysis(self.trips, top=5)
+        names = {p['id']: p['name'] for p in POINT_MAPPING}
+        pairs = Counter()
+        sets = Counter()
+        for trip in self.trips:
+            ids = stimulated(trip)
+            pairs.update(itertools.product(ids, ids))
+            if ids:
+                sets[tuple(ids)] += 1
+
+        for a, b in itertools.product(names, names):
+            self.assertEqual(result['cooccurrence'][names[a]][names[b]], pairs[(a, b)])
+        self.assertEqual(result['trips'], sum(sets.values()))
+        ranked = sorted(sets.items(), key=lambda item: (-item[1], list(item[0])))[:5]
+        self.assertEqual(result['combinations'],
+                         [{'points': [names[i] for i in ids], 'count': n} for ids, n in ranked])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Bootstrap intervals: hand-computed BCa corrections, and results that depend
+only on the seed.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import math
+import os
+import sys
+import unittest
+from statistics import NormalDist
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trip_numpy import optional_numpy
+
+np = optional_numpy()
+if np is not None:
+    import trip_bootstrap
+    from trip_bootstrap import _acceleration, _intervals, bootstrap_cells
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class BCaTest(unittest.TestCase):
+
+    def test_acceleration_by_hand(self):
+        # Jackknife means 3, 3, 8/3, 4/3 around 5/2: sum d^2 = 17/9, sum d^3 = 4/3
+        expected = (4 / 3) / (6 * (17 / 9) ** 1.5)
+        self.assertAlmostEqual(_acceleration(np.array([1.0, 1.0, 2.0, 6.0])), expected, places=12)
+        self.assertEqual(_acceleration(np.array([1.0, 2.0, 3.0, 4.0, 5.0])), 0.0)
+
+    def test_bias_corrected_interval_by_hand(self):
+        # Symmetric values (a = 0); bootstrap means spread evenly over
+        # [2.6, 3.6], so 4000 of 10001 fall below the sample mean of 3 and
+        # any quantile q of them is 2.6 + q
+        values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+        means = 2.6 + np.linspace(0.0, 1.0, 10001)
+        normal = NormalDist()
+        z0 = normal.inv_cdf(4000 / 10001)
+        z = normal.inv_cdf(0.975)
+
+        result = _intervals(values, means, 0.95)
+
+        self.assertEqual((result['n'], result['mean']), (5, 3.0))
+        for actual, expected in zip(result['percentile'], (2.625, 3.575)):
+            self.assertAlmostEqual(actual, expected, places=12)
+        for actual, expected in zip(result['bca'], (2.6 + normal.cdf(2 * z0 - z), 2.6 + normal.cdf(2 * z0 + z))):
+            self.assertAlmostEqual(actual, expected, places=12)
+
+    def test_skewed_cell_shifts_bca_upwards(self):
+        values = np.array([1.0] * 12 + [2.0] * 4 + [5.0] * 3)
+        result = bootstrap_cells({'cell': values}, replicates=20000, workers=1)['cell']
+        (p_low, p_high), (b_low, b_high) = result['percentile'], result['bca']
+        self.assertLess(p_low, result['mean'])
+        self.assertGreater(p_high, result['mean'])
+        self.assertGreater(b_low, p_low)
+        self.assertGreater(b_high, p_high)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class BootstrapCellsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(8)
+        self.samples = {
+            'a': rng.integers(1, 6, size=40).astype(float).tolist(),
+            'single': [3.0],
+            'constant': [2.0, 2.0, 2.0],
+            'b': rng.integers(1, 6, size=7).astype(float).tolist(),
+        }
+
+    def test_degenerate_cells_get_zero_width_intervals(self):
+        result = bootstrap_cells(self.samples, replicates=100, workers=1)
+        self.assertEqual(list(result), list(self.samples))
+        self.assertEqual(result['single']['bca'], (3.0, 3.0))
+        self.assertEqual(result['constant']['percentile'], (2.0, 2.0))
+
+    def test_percentile_interval_is_the_quantiles_of_the_replicate_means(self):
+        replicates = trip_bootstrap.CHUNK_REPLICATES + 700
+        result = bootstrap_cells({'a': self.samples['a']}, replicates=replicates, seed=3, workers=1)['a']
+        values = np.asarray(self.samples['a'])
+        means = np.concatenate([
+            trip_bootstrap._replicate_means(values, trip_bootstrap.CHUNK_REPLICATES, 3, 0, 0),
+            trip_bootstrap._replicate_means(values, 700, 3, 0, 1),
+        ])
+        self.assertEqual(result['percentile'], tuple(np.quantile(means, [0.025, 0.975])))
+        self.assertTrue(math.isclose(result['mean'], float(values.mean())))
+
+    def test_results_depend_only_on_the_seed(self):
+        replicates = 2 * trip_bootstrap.CHUNK_REPLICATES + 1
+        serial = bootstrap_cells(self.samples, replicates=replicates, seed=11, workers=1)
+        self.assertEqual(bootstrap_cells(self.samples, replicates=replicates, seed=11, workers=2), serial)
+        self.assertNotEqual(bootstrap_cells(self.samples, replicates=replicates, seed=12, workers=1), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
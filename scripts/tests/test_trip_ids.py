@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Trip ID parsing: verification results and device IDs from parse_trip_id()
+checked against the split('-') classifier and the re.split(r'[-_]') device
+rule they replaced, over generated and hand-picked IDs.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import hashlib
+import hmac
+import itertools
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trip_ids import LEGACY, MISSING, SIGNED, UNEXPECTED, UUID, parse_trip_id
+from verify_trip_signatures import REASON_CATEGORIES, compute_signature_from_trip_id, verify_trip_signature
+
+SECRET_KEY = 'test-secret'
+
+HAND_PICKED = [
+    '',
+    'ABC12345',
+    'ABC12345-JFK',
+    'ABC12345-JFK-20251108',
+    'ABC12345-JFK-20251108-143022',
+    'ABC12345-JFK-20251108-143022-a1b2c3d4',
+    'ABC12345-JFK-20251108-143022-A1B2C3D4',
+    'ABC12345-JFK-20251108-143022-a1b2c3d',
+    'ABC12345-JFK-20251108-143022-a1b2c3d4e',
+    'ABC12345-JFK-20251108-143022-g1b2c3d4',
+    'ABC12345-JFK-20251108-143022-',
+    'ABC12345-JFK-20251108-143022-a1b2c3d4-x',
+    '----',
+    '-----',
+    '--------',
+    '12345678-1234-1234-1234-123456789abc',
+    '12345678-1234-1234-1234-12345678',
+    'ABC_12345-JFK-20251108-143022',
+    'device/ABC12345-JFK-20251108-143022',
+    'dev/ice-JFK_x-1-2-3',
+    'äöü-JFK-20251108-143022-deadbeef',
+]
+
+
+def baseline_verify(trip_id, secret_key):
+    """verify_trip_signature() as it was before parse_trip_id()."""
+    if not trip_id:
+        return {'valid': False, 'reason': 'missing_trip_id', 'category': 'error', 'tripId': ''}
+    parts = trip_id.split('-')
+    if len(parts) == 5 and [len(p) for p in parts] == [8, 4, 4, 4, 12]:
+        return {'valid': True, 'reason': 'legacy_uuid_format', 'category': 'legacy', 'tripId': trip_id}
+    if len(parts) == 4:
+        return {'valid': True, 'reason': 'legacy_no_signature', 'category': 'legacy', 'tripId': trip_id}
+    if len(parts) == 5:
+        provided = parts[4]
+        if not re.match(r'^[a-fA-F0-9]{8}$', provided):
+            return {'valid': False, 'reason': 'invalid_signature_format', 'category': 'invalid',
+                    'tripId': trip_id, 'providedSignature': provided}
+        expected = hmac.new(secret_key.encode('utf-8'), '-'.join(parts[:4]).encode('utf-8'),
+                            hashlib.sha256).hexdigest()[:8].lower()
+        if provided.lower() == expected:
+            return {'valid': True, 'reason': 'valid_signature', 'category': 'authenticated',
+                    'tripId': trip_id, 'signature': provided}
+        return {'valid': False, 'reason': 'signature_mismatch', 'category': 'invalid',
+                'tripId': trip_id, 'expected': expected, 'provided': provided}
+    return {'valid': False, 'reason': 'unexpected_format', 'category': 'error',
+            'tripId': trip_id, 'parts': len(parts)}
+
+
+def baseline_device_id(trip_id):
+    """Device ID as export_trips_for_r.py and the report worked it out."""
+    parts = re.split(r'[-_]', trip_id) if '/' not in trip_id else trip_id.split('/')
+    return parts[0]
+
+
+def sign(base):
+    return hmac.new(SECRET_KEY.encode('utf-8'), base.encode('utf-8'), hashlib.sha256).hexdigest()[:8]
+
+
+def generated_ids(count=3000, seed=7):
+    """IDs with 0-7 parts of assorted lengths and characters; a third correctly signed."""
+    rng = random.Random(seed)
+    alphabet = 'abcdefABCDEF0123456789gxZ_/ é'
+    ids = []
+    for _ in range(count):
+        lengths = rng.choice(([8, 4, 4, 4, 12], [8, 3, 8, 6], [8, 3, 8, 6, 8],
+                              [rng.randint(0, 12) for _ in range(rng.randint(1, 7))]))
+        parts = [''.join(rng.choice(alphabet) for _ in range(n)) for n in lengths]
+        trip_id = '-'.join(parts)
+        if len(parts) == 5 and rng.random() < 0.35:
+            signature = sign('-'.join(parts[:4]))
+            trip_id = '-'.join(parts[:4] + [signature.upper() if rng.random() < 0.5 else signature])
+        ids.append(trip_id)
+    return ids
+
+
+class ParseTripIdTest(unittest.TestCase):
+
+    def test_formats_and_parts(self):
+        signed = parse_trip_id('ABC12345-JFK-20251108-143022-a1b2c3d4')
+        self.assertEqual((signed.format, signed.destination, signed.date, signed.time, signed.signature),
+                         (SIGNED, 'JFK', '20251108', '143022', 'a1b2c3d4'))
+        self.assertEqual(signed.base_trip_id, 'ABC12345-JFK-20251108-143022')
+        self.assertTrue(signed.has_signature_format())
+
+        legacy = parse_trip_id('ABC12345-JFK-20251108-143022')
+        self.assertEqual((legacy.format, legacy.signature, legacy.base_trip_id), (LEGACY, None, None))
+        self.assertFalse(legacy.has_signature_format())
+
+        self.assertEqual(parse_trip_id('12345678-1234-1234-1234-123456789abc').format, UUID)
+        self.assertEqual(parse_trip_id('a-b-c-d-e-f').format, UNEXPECTED)
+        self.assertEqual(parse_trip_id('a-b-c-d-e-f').parts, 6)
+        for missing in ('', None, 12345, ['a-b-c-d']):
+            self.assertEqual(parse_trip_id(missing).format, MISSING)
+
+    def test_verification_matches_the_baseline_classifier(self):
+        for trip_id in HAND_PICKED + generated_ids():
+            with self.subTest(trip_id=trip_id):
+                self.assertEqual(verify_trip_signature(trip_id, SECRET_KEY), baseline_verify(trip_id, SECRET_KEY))
+
+    def test_generated_ids_cover_every_reason(self):
+        reasons = {baseline_verify(trip_id, SECRET_KEY)['reason'] for trip_id in generated_ids()}
+        self.assertEqual(reasons, set(REASON_CATEGORIES))
+
+    def test_trailing_newline_is_not_a_signature(self):
+        # verify.html's /^[a-fA-F0-9]{8}$/ has no multiline flag, so '$' does not
+        # match before a final newline (Python's '$' in re.match would)
+        trip_id = 'ABC12345-JFK-20251108-143022-a1b2c3d4\n'
+        self.assertEqual(verify_trip_signature(trip_id, SECRET_KEY)['reason'], 'invalid_signature_format')
+
+    def test_compute_signature(self):
+        for trip_id in HAND_PICKED + generated_ids(300):
+            parts = trip_id.split('-')
+            with self.subTest(trip_id=trip_id):
+                expected = sign('-'.join(parts[:4])) if len(parts) >= 4 else None
+                self.assertEqual(compute_signature_from_trip_id(trip_id, SECRET_KEY), expected)
+
+    def test_device_id_matches_the_baseline_rule(self):
+        for trip_id in itertools.chain(HAND_PICKED[1:], generated_ids(1000)):
+            with self.subTest(trip_id=trip_id):
+                self.assertEqual(parse_trip_id(trip_id).device_id, baseline_device_id(trip_id))
+        self.assertEqual(parse_trip_id('').device_id, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
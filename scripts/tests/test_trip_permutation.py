@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Stratified trend permutation test: the statistic by hand, Monte Carlo
+p-values against exact enumeration, and early stopping.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trip_numpy import optional_numpy
+
+np = optional_numpy()
+if np is not None:
+    from trip_permutation import stratified_trend_test, wilson_interval
+
+# Two strata with two and three bands; a third with one band only
+SCORES = [1, 1, 2, 2, 3, 1, 2, 2, 3, 3, 1, 1]
+VALUES = [4.0, 3.5, 3.0, 3.5, 2.0, 5.0, 4.0, 4.5, 2.5, 3.0, 1.0, 2.0]
+STRATA = ['a', 'a', 'a', 'a', 'a', 'b', 'b', 'b', 'b', 'b', 'c', 'c']
+# No clear trend: exact p-values 0.48, 0.64 and 0.87
+WEAK_VALUES = [3.0, 4.0, 3.5, 2.5, 3.5, 4.0, 3.0, 3.5, 4.5, 3.0, 1.0, 2.0]
+
+
+def statistic(scores, values, strata):
+    total = 0.0
+    for key in set(strata):
+        rows = [i for i, s in enumerate(strata) if s == key]
+        mean = sum(values[i] for i in rows) / len(rows)
+        total += sum(scores[i] * (values[i] - mean) for i in rows)
+    return total
+
+
+def exact_p_value(scores, values, strata, alternative):
+    """Share of all within-stratum relabelings as or more extreme than observed."""
+    observed = statistic(scores, values, strata)
+    layers = [[i for i, s in enumerate(strata) if s == key] for key in sorted(set(strata))]
+    extreme = total = 0
+    for arrangement in itertools.product(*(set(itertools.permutations([scores[i] for i in rows]))
+                                           for rows in layers)):
+        permuted = list(scores)
+        for rows, labels in zip(layers, arrangement):
+            for i, label in zip(rows, labels):
+                permuted[i] = label
+        t = statistic(permuted, values, strata)
+        total += 1
+        if alternative == 'decreasing':
+            extreme += t <= observed + 1e-9
+        elif alternative == 'increasing':
+            extreme += t >= observed - 1e-9
+        else:
+            extreme += abs(t) >= abs(observed) - 1e-9
+    return extreme / total
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TrendTestTest(unittest.TestCase):
+
+    def test_statistic_and_strata(self):
+        result = stratified_trend_test(SCORES, VALUES, STRATA, max_permutations=1000,
+                                       min_permutations=1000)
+        # a: mean 3.2 -> 1*(0.8+0.3) + 2*(-0.2+0.3) + 3*(-1.2) = -2.3
+        # b: mean 3.8 -> 1*1.2 + 2*(0.2+0.7) + 3*(-1.3-0.8) = -3.3
+        self.assertAlmostEqual(result['statistic'], -5.6, places=12)
+        self.assertAlmostEqual(result['statistic'], statistic(SCORES[:10], VALUES[:10], STRATA[:10]), places=12)
+        self.assertEqual((result['strata'], result['n']), (2, 10))
+
+    def test_p_values_match_exact_enumeration(self):
+        for values, alternative in itertools.product((VALUES, WEAK_VALUES),
+                                                     ('decreasing', 'increasing', 'two-sided')):
+            with self.subTest(values=values[0], alternative=alternative):
+                exact = exact_p_value(SCORES[:10], values[:10], STRATA[:10], alternative)
+                result = stratified_trend_test(SCORES, values, STRATA, max_permutations=40000,
+                                               alternative=alternative, min_permutations=40000)
+                self.assertEqual(result['permutations'], 40000)
+                self.assertFalse(result['stopped_early'])
+                # Monte Carlo standard error at 40000 draws is at most 0.0025
+                self.assertAlmostEqual(result['p_value'], exact, delta=0.01)
+
+    def test_same_seed_same_result(self):
+        first = stratified_trend_test(SCORES, VALUES, STRATA, max_permutations=5000, seed=4)
+        self.assertEqual(stratified_trend_test(SCORES, VALUES, STRATA, max_permutations=5000, seed=4), first)
+
+    def test_clear_trend_stops_early(self):
+        rng = np.random.default_rng(2)
+        scores = rng.integers(1, 4, size=600)
+        values = 5.0 - scores + rng.normal(0, 0.5, size=600)
+        strata = rng.integers(2, 6, size=600)
+        result = stratified_trend_test(scores, values, strata, max_permutations=100000)
+        self.assertTrue(result['stopped_early'])
+        self.assertLess(result['permutations'], 100000)
+        self.assertLess(result['p_interval'][1], 0.05)
+        self.assertEqual(result['p_value'], 1 / (result['permutations'] + 1))
+
+    def test_no_usable_strata(self):
+        result = stratified_trend_test([1, 1, 2], [3.0, 4.0, 5.0], ['a', 'a', 'b'])
+        self.assertEqual((result['p_value'], result['permutations'], result['strata']), (1.0, 0, 0))
+
+    def test_rejects_unknown_alternative(self):
+        with self.assertRaises(ValueError):
+            stratified_trend_test(SCORES, VALUES, STRATA, alternative='less')
+
+    def test_wilson_interval(self):
+        # 10 of 100 at 95%: the textbook (0.0552, 0.1744)
+        low, high = wilson_interval(10, 100, 0.95)
+        self.assertAlmostEqual(low, 0.0552, places=4)
+        self.assertAlmostEqual(high, 0.1744, places=4)
+        self.assertEqual(wilson_interval(0, 0, 0.95), (0.0, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
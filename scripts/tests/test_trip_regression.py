@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+OLS with sandwich standard errors: a four-row fit worked out by hand
+(coefficients, HC0/HC1/HC2/HC3 and device-clustered covariances), Student t
+p-values, and collinear columns.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trip_numpy import optional_numpy
+
+np = optional_numpy()
+if np is not None:
+    from trip_regression import fit_model, ols, t_two_sided_p
+    from trip_table import TripTable
+
+# y = b0 + b1 x on four points. By hand:
+#   X'X = [[4, 6], [6, 14]], (X'X)^-1 = [[0.7, -0.3], [-0.3, 0.2]]
+#   beta = (1.1, 1.1), residuals e = (-0.1, 0.8, -1.3, 0.6)
+#   leverages h = (0.7, 0.3, 0.3, 0.7)
+X_VALUES = [0.0, 1.0, 2.0, 3.0]
+Y_VALUES = [1.0, 3.0, 2.0, 5.0]
+RESIDUALS = [-0.1, 0.8, -1.3, 0.6]
+LEVERAGES = [0.7, 0.3, 0.3, 0.7]
+BREAD = [[0.7, -0.3], [-0.3, 0.2]]
+
+# HC0 meat sum e^2 x x' = [[2.7, 5.1], [5.1, 10.64]] -> B M B diagonal
+HC0_VARIANCES = [0.1386, 0.0566]
+# HC1 = HC0 * n / (n - k) = HC0 * 2
+HC1_VARIANCES = [0.2772, 0.1132]
+# Devices {0, 1} and {2, 3}: score sums (0.7, 0.8) and (-0.7, -0.8),
+# meat [[0.98, 1.12], [1.12, 1.28]], B M B diagonal (0.125, 0.005),
+# times G/(G-1) * (n-1)/(n-k) = 2 * 3/2 = 3
+CLUSTER_VARIANCES = [0.375, 0.015]
+
+
+def sandwich_by_hand(weights):
+    """Diagonal of B (sum w_i x_i x_i') B for the four-row design."""
+    meat = [[0.0, 0.0], [0.0, 0.0]]
+    for x, w in zip(X_VALUES, weights):
+        row = (1.0, x)
+        for a in range(2):
+            for b in range(2):
+                meat[a][b] += w * row[a] * row[b]
+    variances = []
+    for j in range(2):
+        variances.append(sum(BREAD[j][a] * meat[a][b] * BREAD[b][j] for a in range(2) for b in range(2)))
+    return variances
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class HandComputedFitTest(unittest.TestCase):
+
+    def setUp(self):
+        X = np.column_stack([np.ones(4), X_VALUES])
+        self.fit = ols(np.array(Y_VALUES), X, ['(Intercept)', 'x'], clusters=['d1', 'd1', 'd2', 'd2'])
+
+    def assert_variances(self, name, expected):
+        for se, variance in zip(self.fit['se'][name], expected):
+            self.assertAlmostEqual(se, math.sqrt(variance), places=12, msg=name)
+
+    def test_coefficients(self):
+        self.assertEqual((self.fit['n'], self.fit['df_residual'], self.fit['clusters']), (4, 2, 2))
+        np.testing.assert_allclose(self.fit['coefficients'], [1.1, 1.1], rtol=1e-12)
+        # R^2 = 1 - SSE / SST = 1 - 2.7 / 8.75
+        self.assertAlmostEqual(self.fit['r_squared'], 1 - 2.7 / 8.75, places=12)
+
+    def test_hc0_hc1_and_cluster(self):
+        self.assert_variances('HC0', HC0_VARIANCES)
+        self.assert_variances('HC1', HC1_VARIANCES)
+        self.assert_variances('cluster', CLUSTER_VARIANCES)
+
+    def test_hc2_hc3(self):
+        self.assert_variances('HC2', sandwich_by_hand([e * e / (1 - h) for e, h in zip(RESIDUALS, LEVERAGES)]))
+        self.assert_variances('HC3', sandwich_by_hand([e * e / (1 - h) ** 2 for e, h in zip(RESIDUALS, LEVERAGES)]))
+        self.assert_variances('HC0', sandwich_by_hand([e * e for e in RESIDUALS]))
+
+    def test_t_and_p(self):
+        t = self.fit['t']['HC1']
+        np.testing.assert_allclose(t, [1.1 / math.sqrt(0.2772), 1.1 / math.sqrt(0.1132)], rtol=1e-12)
+        # Student t with 2 df: p = 1 - |t| / sqrt(t^2 + 2)
+        for t_value, p in zip(t, self.fit['p']['HC1']):
+            self.assertAlmostEqual(p, 1 - abs(t_value) / math.sqrt(t_value ** 2 + 2), places=12)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class OlsTest(unittest.TestCase):
+
+    def test_t_distribution_p_values(self):
+        # 2 * pt(-|t|, df), from numerical integration of the t density
+        self.assertAlmostEqual(t_two_sided_p(2.0, 10), 0.0733880348, places=9)
+        self.assertAlmostEqual(t_two_sided_p(-3.5, 30), 0.0014768074, places=9)
+        self.assertAlmostEqual(t_two_sided_p(1.959963985, 1e9), 0.05, places=7)
+        self.assertEqual(t_two_sided_p(0.0, 5), 1.0)
+        self.assertTrue(math.isnan(t_two_sided_p(float('nan'), 5)))
+
+    def test_collinear_columns_are_dropped(self):
+        rng = np.random.default_rng(1)
+        x = rng.normal(size=50)
+        X = np.column_stack([np.ones(50), x, 2 * x, np.ones(50)])
+        y = 3 + 2 * x + rng.normal(size=50)
+        fit = ols(y, X, ['(Intercept)', 'x', 'x2', 'east'])
+        self.assertEqual(fit['terms'], ['(Intercept)', 'x'])
+        self.assertEqual(fit['dropped'], ['x2', 'east'])
+        expected, *_ = np.linalg.lstsq(X[:, :2], y, rcond=None)
+        np.testing.assert_allclose(fit['coefficients'], expected, rtol=1e-10)
+        self.assertNotIn('cluster', fit['se'])
+
+    def test_too_few_rows(self):
+        with self.assertRaises(ValueError):
+            ols(np.array([1.0, 2.0]), np.column_stack([np.ones(2), [0.0, 1.0]]), ['(Intercept)', 'x'])
+
+    def test_fit_model_falls_back_to_hc1_for_one_device(self):
+        trips = [{
+            'tripId': f'A1B2C3D4-{i:04d}',
+            'pointsCompleted': 2 + i % 11,
+            'timezonesCount': 1 + i % 9,
+            'travelDirection': 'East' if i % 3 else ' west ',
+            'sleepPost': 1 + (i * 7) % 5,
+            'fatiguePost': 1 + (i * 3) % 5,
+        } for i in range(60)]
+        trips.append(dict(trips[0], pointsCompleted=1))        # < 2 points: left out
+        trips.append(dict(trips[0], travelDirection='north'))  # Unknown direction: left out
+        for model, k in (('dose', 4), ('primary', 5)):
+            with self.subTest(model=model):
+                fit = fit_model(TripTable.from_trips(trips), model)
+                self.assertEqual((fit['n'], len(fit['terms'])), (60, k))
+                self.assertEqual(fit['clusters'], 1)
+                self.assertEqual(fit['default'], 'HC1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Exclusion rules: the row predicates (trip dicts) and the column predicates
+(TripTable) must exclude the same trips; RuleEngine orders rules by cost
+per exclusion and counts each trip against the first rule that excludes it.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import io
+import itertools
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_jetlag_data import EXCLUSION_RULES, iter_valid_trips, valid_trip_indices
+import trip_rules
+from trip_rules import Rule, RuleEngine
+from trip_table import TripTable
+
+MISSING = object()
+
+# Values seen (or plausible) in exports for the flag fields
+FLAG_VALUES = (True, False, 1, 0, 'true', 'false', '', None, MISSING)
+COUNT_VALUES = (0, 3, 3.0, -2, None, MISSING)
+
+
+def _trip(n: int, **fields) -> dict:
+    trip = {
+        'tripId': f'A1B2C3D4-{n:06d}',
+        'startDate': '2025-11-02T08:00:00Z',
+        'timezonesCount': 3,
+        'arrivalTimeZone': 'Europe/London',
+        'originTimezone': 'America/New_York',
+        'completionMethod': 'manual',
+        'surveyCompleted': True,
+        'researchConsentGranted': True,
+        'pointsCompleted': 12,
+    }
+    for field, value in fields.items():
+        if value is MISSING:
+            trip.pop(field, None)
+        else:
+            trip[field] = value
+    return trip
+
+
+def mixed_type_trips():
+    trips = []
+    for is_test, survey, consent in itertools.product(FLAG_VALUES, repeat=3):
+        trips.append(_trip(len(trips), isTest=is_test, surveyCompleted=survey,
+                           researchConsentGranted=consent))
+    for zones, points in itertools.product(COUNT_VALUES, repeat=2):
+        trips.append(_trip(len(trips), timezonesCount=zones, pointsCompleted=points))
+    trips.append(_trip(len(trips), tripId=''))
+    trips.append(_trip(len(trips), originTimezone='Europe/London'))
+    trips.append(_trip(len(trips), originTimezone='Europe/London', completionMethod='manual_survey'))
+    return trips
+
+
+class RowColumnParityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trips = mixed_type_trips()
+        self.table = TripTable.from_trips(self.trips)
+
+    def test_each_rule_excludes_the_same_trips(self):
+        for rule in EXCLUSION_RULES:
+            with self.subTest(rule=rule.name):
+                column = rule.column(self.table)
+                by_row = [i for i, trip in enumerate(self.trips) if rule.row(trip)]
+                by_column = [i for i in range(len(self.table)) if column(i)]
+                by_table_row = [i for i in range(len(self.table)) if rule.row(self.table.row(i))]
+                self.assertEqual(by_column, by_row)
+                self.assertEqual(by_table_row, by_row)
+
+    def test_streaming_and_table_filters_agree(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            streamed = [trip['tripId'] for trip in iter_valid_trips(self.trips)]
+            indices = valid_trip_indices(self.table)
+        self.assertEqual([self.trips[i]['tripId'] for i in sorted(indices)], streamed)
+        self.assertTrue(0 < len(streamed) < len(self.trips))
+
+    def test_counts_agree_past_the_calibration_sample(self):
+        streaming = RuleEngine(EXCLUSION_RULES, sample_size=50)
+        table = RuleEngine(EXCLUSION_RULES, sample_size=50)
+        valid = list(streaming.filter(self.trips))
+        indices = table.filter_table(self.table)
+        self.assertEqual((table.seen, table.valid), (streaming.seen, streaming.valid))
+        self.assertEqual(len(indices), len(valid))
+        self.assertEqual(sum(table.excluded.values()), sum(streaming.excluded.values()))
+
+
+class FakeClock:
+    """perf_counter() stand-in that advances only when a rule is evaluated."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def rule(self, name: str, cost: float, excludes) -> Rule:
+        def check(trip):
+            self.now += cost
+            return excludes(trip['n'])
+        return Rule(name, name, check)
+
+
+class Rows(list):
+    """Just enough of TripTable for filter_table() with row-only rules."""
+
+    def row(self, i: int) -> dict:
+        return self[i]
+
+
+class RuleEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        clock = FakeClock()
+        patch = mock.patch.object(trip_rules.time, 'perf_counter', clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+        # Cost per exclusion: 10 / (1/2) = 20, 1 / (1/3) = 3, and unbounded
+        self.rules = [
+            clock.rule('slow_even', 10.0, lambda n: n % 2 == 0),
+            clock.rule('cheap_third', 1.0, lambda n: n % 3 == 0),
+            clock.rule('never', 0.1, lambda n: False),
+        ]
+        self.trips = [{'n': n} for n in range(200)]
+
+    def check(self, engine: RuleEngine, valid):
+        self.assertEqual([rule.name for rule in engine.order], ['cheap_third', 'slow_even', 'never'])
+        # Multiples of 3 go to cheap_third, the other even numbers to slow_even
+        self.assertEqual(engine.excluded, {'slow_even': 66, 'cheap_third': 67, 'never': 0})
+        self.assertEqual((engine.seen, engine.valid), (200, 67))
+        self.assertEqual(valid, [n for n in range(200) if n % 2 and n % 3])
+        self.assertEqual([line.split()[0] for line in engine.summary_lines()],
+                         ['Rule', 'cheap_third', 'slow_even', 'never'])
+
+    def test_streaming(self):
+        for sample_size in (1, 60, 1000):
+            with self.subTest(sample_size=sample_size):
+                engine = RuleEngine(self.rules, sample_size=sample_size)
+                self.check(engine, [trip['n'] for trip in engine.filter(self.trips)])
+
+    def test_table(self):
+        for sample_size in (1, 60, 1000):
+            with self.subTest(sample_size=sample_size):
+                engine = RuleEngine(self.rules, sample_size=sample_size)
+                indices = engine.filter_table(Rows(self.trips))
+                self.check(engine, sorted(indices))
+
+    def test_column_predicate_is_used_when_given(self):
+        rule = Rule('odd', 'odd', lambda trip: self.fail('row predicate used'),
+                    column=lambda table: lambda i: table[i]['n'] % 2 == 1)
+        engine = RuleEngine([rule], sample_size=10)
+        self.assertEqual(engine.filter_table(Rows(self.trips)), list(range(0, 200, 2)))
+        self.assertEqual(engine.excluded, {'odd': 100})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Welford accumulators: one-pass statistics, merging partial results,
+removing values again, and the grouped dose-response cells against a
+two-pass reference; TripAggregates state updated by add() and remove().
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_jetlag_data import TripAggregates, dose_response_analysis
+from firestore_standin import make_trip
+from firestore_values import decode_document
+from test_delta_sync import assert_close
+from trip_stats import GroupedStats, RunningStats
+from trip_table import TripTable
+
+REL = 1e-12
+
+
+def accumulate(values) -> RunningStats:
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+
+def random_values(rng: random.Random, count: int):
+    # Large offset: the naive sum-of-squares formula loses every digit here
+    return [1e6 + rng.gauss(3, 1.5) for _ in range(count)]
+
+
+class RunningStatsTest(unittest.TestCase):
+
+    def assert_stats(self, stats: RunningStats, values):
+        self.assertEqual(stats.n, len(values))
+        self.assertTrue(math.isclose(stats.mean, statistics.fmean(values), rel_tol=REL))
+        self.assertTrue(math.isclose(stats.variance, statistics.pvariance(values), rel_tol=1e-8))
+        self.assertTrue(math.isclose(stats.sem, statistics.pstdev(values) / math.sqrt(len(values)), rel_tol=1e-8))
+
+    def test_matches_two_pass_statistics(self):
+        rng = random.Random(1)
+        for count in (1, 2, 10, 1000):
+            values = random_values(rng, count)
+            with self.subTest(count=count):
+                self.assert_stats(accumulate(values), values)
+
+    def test_empty(self):
+        self.assertEqual(RunningStats().as_dict(), {'n': 0, 'mean': 0.0, 'std': 0.0, 'sem': 0.0})
+
+    def test_merged_chunks_equal_one_pass(self):
+        rng = random.Random(2)
+        values = random_values(rng, 2000)
+        for cuts in ([0, 2000], [0, 1, 2000], [0, 700, 700, 1999, 2000], [0, 0, 1000, 2000, 2000]):
+            with self.subTest(cuts=cuts):
+                merged = RunningStats()
+                for start, end in zip(cuts, cuts[1:]):
+                    merged.merge(accumulate(values[start:end]))
+                self.assert_stats(merged, values)
+
+    def test_grouped_merge(self):
+        rng = random.Random(3)
+        pairs = [(rng.choice('abc'), rng.random()) for _ in range(600)] + [(None, 99.0)]
+        whole = GroupedStats.from_pairs(pairs)
+        merged = GroupedStats.from_pairs(pairs[:250])
+        merged.merge(GroupedStats.from_pairs(pairs[250:]))
+        self.assertEqual(len(whole), 3)
+        self.assertNotIn(None, whole)
+        for key, stats in whole.items():
+            with self.subTest(key=key):
+                self.assert_stats(stats, [v for k, v in pairs if k == key])
+                self.assert_stats(merged.get(key), [v for k, v in pairs if k == key])
+
+
+class RemoveTest(unittest.TestCase):
+
+    assert_stats = RunningStatsTest.assert_stats
+
+    def test_remove_after_add_restores_the_stats(self):
+        rng = random.Random(5)
+        base = random_values(rng, 500)
+        extra = random_values(rng, 200)
+        stats = accumulate(base)
+        original = stats.as_dict()
+        for value in extra:
+            stats.add(value)
+        rng.shuffle(extra)
+        for value in extra:
+            stats.remove(value)
+        self.assertEqual(stats.n, original['n'])
+        for key in ('mean', 'std', 'sem'):
+            self.assertTrue(math.isclose(stats.as_dict()[key], original[key], rel_tol=1e-7), key)
+
+    def test_remove_from_the_middle_equals_never_added(self):
+        rng = random.Random(6)
+        values = random_values(rng, 300)
+        stats = accumulate(values)
+        for value in values[100:150]:
+            stats.remove(value)
+        self.assert_stats(stats, values[:100] + values[150:])
+
+    def test_remove_last_value_empties(self):
+        stats = accumulate([2.0, 4.0])
+        stats.remove(2.0)
+        self.assertEqual((stats.n, stats.mean, stats.m2), (1, 4.0, 0.0))
+        stats.remove(4.0)
+        self.assertEqual((stats.n, stats.mean, stats.m2), (0, 0.0, 0.0))
+
+    def test_grouped_remove_drops_empty_groups_and_state_round_trips(self):
+        groups = GroupedStats.from_pairs([('a', 1.0), ('a', 3.0), ('b', 2.0)])
+        groups.remove('b', 2.0)
+        self.assertNotIn('b', groups)
+        state = json.loads(json.dumps(groups.to_state()))
+        restored = GroupedStats.from_state(state)
+        self.assertEqual(restored.get('a').as_dict(), groups.get('a').as_dict())
+
+
+def reference_dose_response(trips):
+    """Two-pass per-cell lists, as dose_response_analysis() used to compute them."""
+    cells = {}
+    for trip in trips:
+        points = trip.get('pointsCompleted') or 0
+        ratings = [trip[f] for f in ('sleepPost', 'fatiguePost', 'concentrationPost',
+                                     'irritabilityPost', 'motivationPost', 'giPost') if trip.get(f) is not None]
+        if points < 2 or not ratings:
+            continue
+        group = '2-4 points' if points <= 4 else '5-7 points' if points <= 7 else '8-12 points'
+        tz = trip.get('timezonesCount') or 0
+        cells.setdefault(f"{group}_{'12+' if tz >= 12 else tz}_tz", []).append(sum(ratings) / len(ratings))
+    results = {}
+    for key in (f'{group}_{tz}_tz' for group in ('2-4 points', '5-7 points', '8-12 points')
+                for tz in (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, '12+')):
+        severities = cells.get(key)
+        if not severities:
+            continue
+        mean = sum(severities) / len(severities)
+        std = math.sqrt(sum((s - mean) ** 2 for s in severities) / len(severities))
+        results[key] = {'n': len(severities), 'mean': mean, 'std': std, 'sem': std / math.sqrt(len(severities))}
+    return results
+
+
+class DoseResponseTest(unittest.TestCase):
+
+    def test_matches_two_pass_reference(self):
+        rng = random.Random(4)
+        trips = []
+        for _ in range(3000):
+            trip = {'pointsCompleted': rng.randint(0, 12), 'timezonesCount': rng.randint(0, 15)}
+            for field in ('sleepPost', 'fatiguePost', 'concentrationPost', 'irritabilityPost', 'motivationPost', 'giPost'):
+                if rng.random() < 0.8:
+                    trip[field] = rng.randint(1, 5)
+            trips.append(trip)
+
+        result = dose_response_analysis(trips)
+        expected = reference_dose_response(trips)
+        self.assertEqual(list(result), list(expected))
+        for key, cell in expected.items():
+            with self.subTest(cell=key):
+                self.assertEqual(result[key]['n'], cell['n'])
+                for stat in ('mean', 'std', 'sem'):
+                    self.assertTrue(math.isclose(result[key][stat], cell[stat], rel_tol=1e-9, abs_tol=1e-12))
+
+
+class TripAggregatesTest(unittest.TestCase):
+
+    def setUp(self):
+        trips = [decode_document(make_trip(i, 9)) for i in range(1200)]
+        self.old = TripTable.from_trips(trips[:800])
+        self.new = TripTable.from_trips(trips[800:])
+
+    def results(self, aggregates: TripAggregates):
+        return {name: getattr(aggregates, name)() for name in
+                ('validation_breakdown', 'basic_statistics', 'dose_response', 'point_usage', 'point_combinations')}
+
+    def aggregate(self, *tables, remove=()):
+        aggregates = TripAggregates()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for table in tables:
+                aggregates.add(table)
+            for table in remove:
+                aggregates.remove(table)
+        return aggregates
+
+    def assert_results_close(self, actual, expected):
+        # A removed value leaves rounding residue in m2; std is its square root
+        assert_close(self, actual, expected, abs_tol=1e-7)
+
+    def test_remove_after_add_returns_the_original_results(self):
+        original = self.results(self.aggregate(self.old))
+        updated = self.results(self.aggregate(self.old, self.new, remove=[self.new]))
+        self.assert_results_close(updated, original)
+
+    def test_adding_in_parts_equals_adding_at_once(self):
+        whole = TripTable.from_trips(list(self.old.rows()) + list(self.new.rows()))
+        self.assert_results_close(self.results(self.aggregate(self.old, self.new)),
+                                  self.results(self.aggregate(whole)))
+
+    def test_state_round_trips_through_json(self):
+        aggregates = self.aggregate(self.old)
+        restored = TripAggregates.from_dict(json.loads(json.dumps(aggregates.to_dict())))
+        self.assertEqual(self.results(restored), self.results(aggregates))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+TripTable: typed columns, row views and take(), timestamps parsed once into
+epoch columns, NaN-aware composite scores (with and without NumPy), and the
+memory-mapped decoded-trip cache.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trip_table
+from analyze_jetlag_data import calculate_aggregate_severity, get_anticipated_severity
+from firestore_standin import make_trip
+from firestore_values import decode_document
+from trip_table import (
+    BOOL_FIELDS, CACHE_SUFFIX, CATEGORY_FIELDS, COMPOSITES, EPOCH_SUFFIX, FLOAT_FIELDS, INT_FIELDS,
+    MISSING_INT, PRE_SEVERITY_FIELDS, SYMPTOM_GROUPS, TEXT_FIELDS, TIMESTAMP_FIELDS, TripTable, cache_key,
+    load_table, nan_row_means, parse_epoch, save_table,
+)
+
+
+def sample_trips(count: int = 300, seed: int = 5):
+    """Stand-in trips with some fields dropped, nulled or given odd values."""
+    rng = random.Random(seed)
+    trips = []
+    for i in range(count):
+        trip = decode_document(make_trip(i, seed))
+        for field in FLOAT_FIELDS + INT_FIELDS + BOOL_FIELDS + CATEGORY_FIELDS:
+            roll = rng.random()
+            if roll < 0.1:
+                trip.pop(field, None)
+            elif roll < 0.15:
+                trip[field] = None
+            elif roll < 0.2 and field in FLOAT_FIELDS:
+                trip[field] = rng.choice(['', '3', 2.5, 4])
+        trips.append(trip)
+    return trips
+
+
+def expected_value(trip, field):
+    """What TripTable.value() should give for a trip dict's field."""
+    value = trip.get(field)
+    if value is None:
+        return None
+    if field in FLOAT_FIELDS:
+        return None if value == '' else float(value)
+    if field in BOOL_FIELDS:
+        return bool(value) if field in ('isTest', 'surveyCompleted') else value is True
+    return value
+
+
+def array_d(*values):
+    return array('d', values)
+
+
+def same(a, b) -> bool:
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+class TripTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trips = sample_trips()
+        self.table = TripTable.from_trips(iter(self.trips))
+
+    def test_values_round_trip(self):
+        self.assertEqual(len(self.table), len(self.trips))
+        for field in FLOAT_FIELDS + INT_FIELDS + BOOL_FIELDS + CATEGORY_FIELDS + TEXT_FIELDS:
+            with self.subTest(field=field):
+                self.assertEqual(self.table.values(field), [expected_value(t, field) for t in self.trips])
+
+    def test_missing_sentinels(self):
+        for i, trip in enumerate(self.trips):
+            if trip.get('pointsCompleted') is None:
+                self.assertEqual(self.table.column('pointsCompleted')[i], MISSING_INT)
+            if trip.get('sleepPost') in (None, ''):
+                self.assertTrue(math.isnan(self.table.column('sleepPost')[i]))
+            if trip.get('surveyCompleted') is None:
+                self.assertEqual(self.table.column('surveyCompleted')[i], -1)
+            if trip.get('originTimezone') is None:
+                self.assertEqual(self.table.column('originTimezone')[i], -1)
+
+    def test_categories_are_interned_once(self):
+        zones = self.table.categories('originTimezone')
+        self.assertEqual(len(zones), len(set(zones)))
+        self.assertEqual(set(zones), {t['originTimezone'] for t in self.trips if t.get('originTimezone')})
+
+    def test_rows_read_like_the_trips(self):
+        for trip, row in zip(self.trips, self.table.rows()):
+            self.assertEqual(row.get('tripId'), trip['tripId'])
+            self.assertEqual(row.get('pointsCompleted', 'none'),
+                             'none' if trip.get('pointsCompleted') is None else trip['pointsCompleted'])
+            self.assertEqual('originTimezone' in row, trip.get('originTimezone') is not None)
+
+    def test_take_selects_rows_in_order(self):
+        indices = [250, 3, 3, 17, 0]
+        part = self.table.take(indices)
+        self.assertEqual(len(part), len(indices))
+        for field in ('tripId', 'pointsCompleted', 'sleepPost', 'arrivalTimeZone', 'surveyCompleted'):
+            self.assertEqual(part.values(field), [self.table.value(field, i) for i in indices])
+        for name in ('severity', 'anticipated'):
+            whole = self.table.composite(name)
+            self.assertTrue(all(same(a, whole[i]) for a, i in zip(part.composite(name), indices)))
+
+
+class ParseEpochTest(unittest.TestCase):
+
+    def test_iso_forms(self):
+        utc = datetime(2025, 11, 2, 8, 30, 15, tzinfo=timezone.utc).timestamp()
+        cases = {
+            '2025-11-02T08:30:15Z': utc,
+            '2025-11-02T08:30:15+00:00': utc,
+            '2025-11-02T09:30:15+01:00': utc,
+            '2025-11-02T03:30:15-05:00': utc,
+            '2025-11-02T08:30:15': utc,  # No offset: UTC
+            '2025-11-02T08:30:15.250Z': utc + 0.25,
+            '2025-11-02T08:30:15.123456789Z': utc + 0.123456,  # Nanoseconds cut to micro
+            '2025-11-02': datetime(2025, 11, 2, tzinfo=timezone.utc).timestamp(),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertAlmostEqual(parse_epoch(text), expected, places=6)
+
+    def test_missing_or_invalid_is_nan(self):
+        for value in (None, '', 'not a date', '2025-13-45', 1730534400, {'_seconds': 1}):
+            with self.subTest(value=value):
+                self.assertTrue(math.isnan(parse_epoch(value)))
+
+    def test_epoch_columns_are_parsed_once_at_build_time(self):
+        trips = sample_trips(50)
+        trips[0]['startDate'] = 'garbage'
+        table = TripTable.from_trips(trips)
+        for field in TIMESTAMP_FIELDS:
+            column = table.column(field + EPOCH_SUFFIX)
+            with self.subTest(field=field):
+                self.assertTrue(all(same(column[i], parse_epoch(trip.get(field)))
+                                    for i, trip in enumerate(trips)))
+        self.assertTrue(math.isnan(table.column('startDate' + EPOCH_SUFFIX)[0]))
+        self.assertEqual(table.value('startDate', 0), 'garbage')
+
+
+def rated_trips(count: int = 400, seed: int = 11):
+    """Trips with every symptom rating group, each rating possibly missing."""
+    rng = random.Random(seed)
+    ratings = (1, 2, 3, 4, 5, 2.5, 1 / 3, 0.1, None)
+    trips = []
+    for _ in range(count):
+        trip = {}
+        for group in SYMPTOM_GROUPS.values():
+            for field in group:
+                value = rng.choice(ratings)
+                if value is not None or rng.random() < 0.5:
+                    trip[field] = value
+        trip['generalAnticipated'] = rng.choice((None, None, 3, 4.5, ''))
+        trips.append(trip)
+    return trips
+
+
+def reference_mean(trip, fields):
+    present = [trip[f] for f in fields if trip.get(f) is not None]
+    return sum(present) / len(present) if present else None
+
+
+class CompositeTest(unittest.TestCase):
+    """Composite scores must be bit-identical to the per-trip functions."""
+
+    def setUp(self):
+        self.trips = rated_trips()
+
+    def assert_scores(self, scores, expected):
+        self.assertEqual(len(scores), len(expected))
+        for i, (score, value) in enumerate(zip(scores, expected)):
+            if value is None:
+                self.assertTrue(math.isnan(score), i)
+            else:
+                self.assertEqual(score, value, i)
+
+    def check_composites(self):
+        table = TripTable.from_trips(self.trips)
+        self.assert_scores(table.composite('severity'),
+                           [calculate_aggregate_severity(t) for t in self.trips])
+        self.assert_scores(table.composite('anticipated'),
+                           [get_anticipated_severity(t) for t in self.trips])
+        self.assert_scores(table.composite('pre_severity'),
+                           [reference_mean(t, PRE_SEVERITY_FIELDS) for t in self.trips])
+        # Rows hand back the table's score
+        for i in (0, 1, 2):
+            self.assertTrue(same(calculate_aggregate_severity(table.row(i)), table.composite('severity')[i]))
+
+    def test_with_numpy(self):
+        if trip_table.optional_numpy() is None:
+            self.skipTest('numpy is not installed')
+        self.check_composites()
+
+    def test_without_numpy(self):
+        with mock.patch.object(trip_table, 'optional_numpy', lambda: None):
+            self.check_composites()
+
+    def test_nan_row_means_edge_cases(self):
+        nan = float('nan')
+        for use_numpy in (True, False):
+            with self.subTest(numpy=use_numpy), mock.patch.object(
+                    trip_table, 'optional_numpy', trip_table.optional_numpy if use_numpy else (lambda: None)):
+                self.assertEqual(list(nan_row_means([])), [])
+                self.assertEqual(list(nan_row_means([array_d(), array_d()])), [])
+                means = nan_row_means([array_d(1, nan, nan), array_d(2, 4, nan)])
+                self.assertEqual(list(means[:2]), [1.5, 4.0])
+                self.assertTrue(math.isnan(means[2]))
+
+    def test_unknown_composite(self):
+        with self.assertRaises(KeyError):
+            TripTable().composite('unknown')
+
+
+class TableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.export = os.path.join(self.dir, 'trips.json')
+        self.trips = sample_trips(120)
+        self.trips[7]['tripId'] = None
+        self.trips[8]['tripId'] = 'Ünïcode-✈'
+        with open(self.export, 'w') as f:
+            json.dump(self.trips, f)
+        self.cache = self.export + CACHE_SUFFIX
+        self.table = TripTable.from_trips(self.trips)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        key = cache_key(self.export)
+        save_table(self.table, self.cache, key)
+        loaded = load_table(self.cache, key)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(len(loaded), len(self.table))
+        self.assertEqual(set(loaded.fields), set(self.table.fields))
+        for field in self.table.fields:
+            with self.subTest(field=field):
+                self.assertTrue(all(same(a, b) for a, b in
+                                    zip(loaded.values(field), self.table.values(field))))
+        for name in COMPOSITES:
+            with self.subTest(composite=name):
+                self.assertTrue(all(same(a, b) for a, b in
+                                    zip(loaded.composite(name), self.table.composite(name))))
+        # Numeric columns are views of the mapped file, and the table is read-only
+        self.assertIsInstance(loaded.column('sleepPost'), memoryview)
+        with self.assertRaises(TypeError):
+            loaded.append({})
+
+    def test_empty_table(self):
+        save_table(TripTable(), self.cache, 'key')
+        loaded = load_table(self.cache, 'key')
+        self.assertEqual(len(loaded), 0)
+        self.assertEqual(loaded.values('tripId'), [])
+
+    def test_stale_or_damaged_caches_are_ignored(self):
+        key = cache_key(self.export)
+        save_table(self.table, self.cache, key)
+        self.assertIsNone(load_table(self.cache, key + 'x'))
+        self.assertIsNone(load_table(self.cache + '.missing', key))
+
+        with open(self.export, 'a') as f:
+            f.write(' ')
+        self.assertNotEqual(cache_key(self.export), key)
+
+        with open(self.cache, 'r+b') as f:
+            f.write(b'XXXX')
+        self.assertIsNone(load_table(self.cache, key))
+
+
+if __name__ == '__main__':
+    unittest.main()
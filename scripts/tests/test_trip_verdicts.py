@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Verdict store: saving and reloading, appending, files of another key or cut
+off mid-line, results rebuilt from verdicts against fresh verification, and
+verify_all_trips() reports with and without a store.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test_trip_ids import HAND_PICKED, SECRET_KEY, generated_ids
+from trip_verdicts import VERDICTS_SUFFIX, VerdictStore, key_fingerprint
+from verify_trip_signatures import (
+    SignatureVerifier, validation_from_verdict, verify_all_trips, verify_trip_signature,
+)
+
+
+def trips_for(trip_ids):
+    return [{'tripId': trip_id, 'documentId': f'doc{i}'} for i, trip_id in enumerate(trip_ids)]
+
+
+class VerdictStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.trips_path = os.path.join(tmp.name, 'trips.json')
+
+    def store(self, secret_key=SECRET_KEY):
+        return VerdictStore.for_snapshot(self.trips_path, secret_key)
+
+    def test_path_names_the_key_by_fingerprint(self):
+        store = self.store()
+        self.assertEqual(store.path, f'{self.trips_path}.{key_fingerprint(SECRET_KEY)}{VERDICTS_SUFFIX}')
+        self.assertNotIn(SECRET_KEY, store.path)
+        self.assertNotEqual(self.store('other').path, store.path)
+
+    def test_save_and_reload(self):
+        store = self.store()
+        store.add('a-b-c-d', 'legacy_no_signature')
+        store.add('a-b-c-d-00000000', 'signature_mismatch', '1234abcd')
+        self.assertEqual(store.save(), 2)
+        self.assertEqual(store.save(), 0)
+
+        store.add('x', 'unexpected_format')
+        store.add('a-b-c-d', 'valid_signature')  # Already known: kept as it was
+        self.assertEqual(store.save(), 1)
+
+        loaded = self.store()
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.get('a-b-c-d'), ('legacy_no_signature', ''))
+        self.assertEqual(loaded.get('a-b-c-d-00000000'), ('signature_mismatch', '1234abcd'))
+        self.assertIn('x', loaded)
+        self.assertIsNone(loaded.get('y'))
+
+    def test_unstorable_trip_ids_are_skipped(self):
+        store = self.store()
+        for trip_id in ('', 'a\tb', 'a\nb', 'a\rb'):
+            store.add(trip_id, 'unexpected_format')
+        self.assertEqual((len(store), store.save()), (0, 0))
+        self.assertFalse(os.path.exists(store.path))
+
+    def test_file_of_another_key_is_ignored_and_replaced(self):
+        other = VerdictStore(self.store().path, key_fingerprint('other'))
+        other.add('a-b-c-d-00000000', 'valid_signature')
+        other.save()
+
+        store = self.store()
+        self.assertEqual(len(store), 0)
+        store.add('a-b-c-d', 'legacy_no_signature')
+        store.save()
+        loaded = self.store()
+        self.assertEqual(loaded.get('a-b-c-d'), ('legacy_no_signature', ''))
+        self.assertNotIn('a-b-c-d-00000000', loaded)
+
+    def test_interrupted_append_is_ignored_and_rewritten(self):
+        store = self.store()
+        store.add('a-b-c-d', 'legacy_no_signature')
+        store.save()
+        with open(store.path, 'a', encoding='utf-8') as f:
+            f.write('x-y-z-w\tlegacy_no')
+
+        store = self.store()
+        self.assertEqual(len(store), 1)
+        store.add('q', 'unexpected_format')
+        store.save()
+        with open(store.path, encoding='utf-8') as f:
+            self.assertTrue(f.read().endswith('q\tunexpected_format\t\n'))
+        self.assertEqual(len(self.store()), 2)
+        self.assertNotIn('x-y-z-w', self.store())
+
+    def test_validation_from_verdict_equals_fresh_verification(self):
+        for trip_id in HAND_PICKED + generated_ids(1500):
+            fresh = verify_trip_signature(trip_id, SECRET_KEY)
+            with self.subTest(trip_id=trip_id):
+                self.assertEqual(validation_from_verdict(trip_id, fresh['reason'], fresh.get('expected', '')), fresh)
+
+    def test_verify_all_trips_with_a_store(self):
+        trips = trips_for(HAND_PICKED + generated_ids(1500))
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = verify_all_trips(trips, SECRET_KEY, batch_size=256)
+            store = self.store()
+            self.assertEqual(verify_all_trips(trips, SECRET_KEY, batch_size=256, store=store), expected)
+            store.save()
+
+            # Second run: every result comes from the store, no HMAC is computed
+            with mock.patch.object(SignatureVerifier, 'sign', side_effect=AssertionError('signed')):
+                rerun = verify_all_trips(trips, SECRET_KEY, batch_size=256, store=self.store())
+        self.assertEqual(rerun, expected)
+        # Trips without a trip ID are verified (and stored) under their document ID
+        self.assertEqual(len(self.store()), len({t['tripId'] or t['documentId'] for t in trips}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Verifying while downloading: the pipelined report against downloading
+first and verifying the snapshot afterwards, and download errors reaching
+the caller.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firestore_standin import SIGNATURE_KEY, serve
+from test_firestore_client import _start
+from verify_trip_signatures import load_trips, verify_all_trips, verify_while_downloading
+
+
+class VerifyWhileDownloadingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.dir, 'trips.ndjson')
+        self.server = serve(0, 2500, error_rate=0.05, seed=4)
+        environ = mock.patch.dict(os.environ, FIRESTORE_BASE_URL=_start(self.server))
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def reports(self, secret_key, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipelined = verify_while_downloading(secret_key, output_file=self.output, workers=4, **options)
+            afterwards = verify_all_trips(load_trips(self.output), secret_key, **options)
+        return pipelined, afterwards
+
+    def test_same_report_as_verifying_the_snapshot(self):
+        pipelined, afterwards = self.reports(SIGNATURE_KEY.decode('ascii'))
+        self.assertEqual(pipelined, afterwards)
+        self.assertEqual((pipelined['total_trips'], pipelined['authenticated']), (2500, 2500))
+
+    def test_failures_with_the_wrong_key(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            report = verify_while_downloading('wrong key', output_file=self.output, compact=True)
+        self.assertEqual((report['invalid'], len(report['samples']['invalid'])), (2500, 10))
+        self.assertEqual(out.getvalue().count('(signature_mismatch)'), 2500)
+
+    def test_download_errors_reach_the_caller(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]  # Closed again: nothing listens here
+        with mock.patch.dict(os.environ, FIRESTORE_BASE_URL=f'http://127.0.0.1:{port}'):
+            with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(ConnectionRefusedError):
+                verify_while_downloading('key', output_file=self.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
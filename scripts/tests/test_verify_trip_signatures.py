@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Signature verification: the prepared HMAC state against hmac.new() for
+short, long and non-ASCII keys, batch verification in a process pool
+against in-process verification, and compact reports (CompactTally)
+against full ones.
+
+Run from the repository root:
+    python -m pytest scripts/tests
+"""
+
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import verify_trip_signatures
+from test_trip_ids import HAND_PICKED, SECRET_KEY, generated_ids
+from test_trip_verdicts import trips_for
+from verify_trip_signatures import (
+    FAILED_CATEGORIES, SAMPLE_SIZE, CompactTally, SignatureVerifier, print_report, verify_all_trips, verify_batches,
+)
+
+KEYS = ['', 'k', SECRET_KEY, 'x' * 63, 'x' * 64, 'x' * 65, 'é' * 40, 'ключ-🔑' * 20]
+
+
+class SignatureVerifierTest(unittest.TestCase):
+
+    def test_sign_matches_hmac_new(self):
+        messages = ['', 'ABC12345-JFK-20251108-143022', 'é-ü-ß-漢', 'm' * 200]
+        for key in KEYS:
+            verifier = SignatureVerifier(key)
+            for message in messages:
+                with self.subTest(key=key, message=message):
+                    expected = hmac.new(key.encode('utf-8'), message.encode('utf-8'),
+                                        hashlib.sha256).hexdigest()[:8]
+                    self.assertEqual(verifier.sign(message), expected)
+
+    def test_signing_does_not_change_the_prepared_state(self):
+        verifier = SignatureVerifier(SECRET_KEY)
+        first = verifier.sign('ABC12345-JFK-20251108-143022')
+        verifier.sign('something else')
+        self.assertEqual(verifier.sign('ABC12345-JFK-20251108-143022'), first)
+
+    def test_verify_many_equals_verify(self):
+        verifier = SignatureVerifier(SECRET_KEY)
+        trip_ids = HAND_PICKED + generated_ids(500)
+        self.assertEqual(verifier.verify_many(trip_ids), [verifier.verify(trip_id) for trip_id in trip_ids])
+
+    def test_verifier_is_prepared_once_per_key(self):
+        verify_trip_signatures._verifier.cache_clear()
+        first = verify_trip_signatures._verifier(SECRET_KEY)
+        self.assertIs(verify_trip_signatures._verifier(SECRET_KEY), first)
+        self.assertIsNot(verify_trip_signatures._verifier('other'), first)
+
+
+class VerifyBatchesTest(unittest.TestCase):
+
+    def setUp(self):
+        trip_ids = HAND_PICKED + generated_ids(700)
+        self.batches = [trip_ids[i:i + 97] for i in range(0, len(trip_ids), 97)]
+
+    def verified(self, workers, batches=None):
+        return list(verify_batches(iter(batches or self.batches), SECRET_KEY, workers))
+
+    def test_batches_in_order(self):
+        serial = self.verified(1)
+        self.assertEqual([batch for batch, _ in serial], self.batches)
+        verifier = SignatureVerifier(SECRET_KEY)
+        for batch, results in serial:
+            self.assertEqual(results, verifier.verify_many(batch))
+
+    def test_process_pool_equals_in_process(self):
+        self.assertEqual(self.verified(2), self.verified(1))
+
+    def test_single_batch_and_no_batches(self):
+        self.assertEqual(self.verified(4, self.batches[:1]), self.verified(1, self.batches[:1]))
+        self.assertEqual(list(verify_batches(iter([]), SECRET_KEY, 4)), [])
+
+
+class CompactTallyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trips = trips_for(HAND_PICKED + generated_ids(2000))
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.records_path = os.path.join(tmp.name, 'failures.ndjson')
+
+    def reports(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            full = verify_all_trips(self.trips, SECRET_KEY, batch_size=300)
+            compact = verify_all_trips(self.trips, SECRET_KEY, batch_size=300, compact=True,
+                                       records_path=self.records_path)
+        return full, compact
+
+    def test_counts_and_exit_code_equal_the_full_report(self):
+        full, compact = self.reports()
+        self.assertNotIn('categories', compact)
+        for key in ('total_trips', 'authenticated', 'legacy', 'invalid', 'error'):
+            self.assertEqual(compact[key], full[key], key)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(print_report(full), 1)
+            self.assertEqual(print_report(compact, verbose=True), 1)
+
+    def test_samples_come_from_their_category(self):
+        full, compact = self.reports()
+        for category, records in full['categories'].items():
+            sample = compact['samples'][category]
+            with self.subTest(category=category):
+                self.assertEqual(len(sample), min(len(records), SAMPLE_SIZE))
+                if category in FAILED_CATEGORIES:
+                    for entry in sample:
+                        self.assertIn(entry, records)
+                else:
+                    self.assertLessEqual(set(sample), {record['tripId'] for record in records})
+
+    def test_every_failure_is_streamed_in_trip_order(self):
+        full, compact = self.reports()
+        self.assertEqual(compact['records_path'], self.records_path)
+        with open(self.records_path, encoding='utf-8') as f:
+            streamed = [json.loads(line) for line in f]
+        failed = [record for category in FAILED_CATEGORIES for record in full['categories'][category]]
+        order = {trip['documentId']: i for i, trip in enumerate(self.trips)}
+        self.assertEqual(streamed, sorted(failed, key=lambda record: order[record['documentId']]))
+
+    def test_reservoir_sample_is_uniform(self):
+        # Sampling 2 of 5 trip IDs, each should be kept with probability 2/5
+        kept = Counter()
+        runs = 4000
+        for seed in range(runs):
+            tally = CompactTally(sample_size=2, seed=seed)
+            for i in range(5):
+                tally.add(f'trip{i}', f'doc{i}', {'category': 'legacy'})
+            self.assertEqual(tally.counts['legacy'], 5)
+            kept.update(tally.samples['legacy'])
+        for i in range(5):
+            self.assertAlmostEqual(kept[f'trip{i}'] / runs, 0.4, delta=0.04)
+
+    def test_same_seed_same_samples(self):
+        def samples(seed):
+            tally = CompactTally(sample_size=3, seed=seed)
+            for i in range(100):
+                tally.add(f'trip{i}', f'doc{i}', {'category': 'authenticated'})
+            return tally.samples['authenticated']
+        self.assertEqual(samples(5), samples(5))
+        self.assertNotEqual(samples(5), samples(6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Bootstrap confidence intervals for the dose-response cells.
+
+dose_response_analysis() reports mean, std and SEM per (stimulation level,
+time zone) cell. Many cells hold only a handful of trips, where a
+normal-theory mean +/- 1.96 SEM interval is unreliable (severities are
+bounded 1-5 and skewed). This module resamples each cell's severities
+instead and reports two intervals for the mean:
+
+- Percentile: the alpha/2 and 1-alpha/2 quantiles of the bootstrap means.
+- BCa (bias-corrected and accelerated, Efron 1987): the percentile
+  quantiles shifted by the bootstrap bias (z0) and a jackknife estimate of
+  skewness (acceleration). Preferred for small, skewed cells.
+
+HOW IT RUNS:
+- Replicates are drawn in vectorized NumPy batches: one (batch x n) index
+  matrix per batch, averaged along its rows. Batches are sized to keep each
+  index matrix around BATCH_ELEMENTS values.
+- Work is split into tasks of CHUNK_REPLICATES replicates per cell and
+  spread over a process pool. Each task seeds its own generator from
+  SeedSequence(seed, spawn_key=(cell, chunk)), so the intervals depend only
+  on the seed - not on the number of workers or the order tasks finish.
+- With workers=1 (or a single task) everything runs in-process.
+
+Cells with one trip, or with all severities equal, get a zero-width
+interval at the mean.
+
+Usage:
+    from trip_bootstrap import bootstrap_cells
+
+    samples = dose_response_samples(valid_trips)      # analyze_jetlag_data
+    intervals = bootstrap_cells(samples, replicates=10000)
+    intervals['2-4 points_5_tz']['bca']               # (low, high)
+
+    # Or from the command line, on a trips export
+    python analyze_jetlag_data.py --trips trips.json --bootstrap 10000
+
+Requirements:
+    - Python 3.8+
+    - numpy 1.20+ (see trip_numpy.py)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from trip_numpy import DEFAULT_SEED, import_numpy
+
+np = import_numpy()
+
+# Replicates per task handed to a worker
+CHUNK_REPLICATES = 2500
+
+# Target size of one (batch x n) resampling index matrix
+BATCH_ELEMENTS = 1 << 21
+
+_NORMAL = NormalDist()
+
+
+def _replicate_means(values: np.ndarray, replicates: int, seed: int, cell: int,
+                     chunk: int) -> np.ndarray:
+    """Means of `replicates` resamples of values, drawn in vectorized batches."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(cell, chunk)))
+    n = len(values)
+    batch = max(1, min(replicates, BATCH_ELEMENTS // n))
+    means = np.empty(replicates)
+    for start in range(0, replicates, batch):
+        stop = min(start + batch, replicates)
+        indices = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[indices].mean(axis=1)
+    return means
+
+
+def _task(args: Tuple) -> Tuple[int, int, np.ndarray]:
+    values, replicates, seed, cell, chunk = args
+    return cell, chunk, _replicate_means(values, replicates, seed, cell, chunk)
+
+
+def _acceleration(values: np.ndarray) -> float:
+    """BCa acceleration from the jackknife means (leave-one-out)."""
+    n = len(values)
+    jackknife = (values.sum() - values) / (n - 1)
+    deviations = jackknife.mean() - jackknife
+    denominator = 6.0 * (deviations ** 2).sum() ** 1.5
+    return float((deviations ** 3).sum() / denominator) if denominator else 0.0
+
+
+def _intervals(values: np.ndarray, means: np.ndarray, confidence: float) -> Dict:
+    """Percentile and BCa intervals from the bootstrap means of one cell."""
+    mean = float(values.mean())
+    alpha = 1.0 - confidence
+    if len(values) < 2 or values.min() == values.max():
+        return {'n': len(values), 'mean': mean, 'percentile': (mean, mean), 'bca': (mean, mean)}
+
+    percentile = tuple(float(q) for q in np.quantile(means, [alpha / 2, 1 - alpha / 2]))
+
+    # Bias correction: how far the bootstrap distribution sits off the mean
+    below = float(np.mean(means < mean))
+    if below <= 0.0 or below >= 1.0:
+        bca = percentile  # z0 is infinite; no usable correction
+    else:
+        z0 = _NORMAL.inv_cdf(below)
+        a = _acceleration(values)
+        adjusted = []
+        for z_alpha in (_NORMAL.inv_cdf(alpha / 2), _NORMAL.inv_cdf(1 - alpha / 2)):
+            shifted = z0 + z_alpha
+            adjusted.append(_NORMAL.cdf(z0 + shifted / (1 - a * shifted)))
+        bca = tuple(float(q) for q in np.quantile(means, adjusted))
+
+    return {'n': len(values), 'mean': mean, 'percentile': percentile, 'bca': bca}
+
+
+def bootstrap_cells(samples: Dict[str, Sequence[float]], replicates: int = 10000,
+                    confidence: float = 0.95, seed: int = DEFAULT_SEED,
+                    workers: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Bootstrap intervals for the mean of every cell.
+
+    Args:
+        samples: cell key -> severities (e.g. dose_response_samples())
+        replicates: bootstrap replicates per cell
+        confidence: interval coverage (0.95 for 95% intervals)
+        seed: base seed; identical seeds give identical intervals
+        workers: worker processes (default: CPU count; 1 = in-process)
+
+    Returns:
+        cell key -> {'n', 'mean', 'percentile': (low, high), 'bca': (low, high)},
+        in the order of samples
+    """
+    keys = list(samples)
+    arrays = [np.asarray(samples[key], dtype=float) for key in keys]
+
+    tasks = []
+    for cell, values in enumerate(arrays):
+        if len(values) < 2 or values.min() == values.max():
+            continue  # Zero-width interval; nothing to resample
+        for chunk, start in enumerate(range(0, replicates, CHUNK_REPLICATES)):
+            tasks.append((values, min(CHUNK_REPLICATES, replicates - start), seed, cell, chunk))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_task, tasks))
+    else:
+        results = [_task(task) for task in tasks]
+
+    chunks: Dict[int, List] = {}
+    for cell, chunk, means in results:
+        chunks.setdefault(cell, []).append((chunk, means))
+
+    intervals = {}
+    for cell, (key, values) in enumerate(zip(keys, arrays)):
+        parts = [means for _, means in sorted(chunks.get(cell, []), key=lambda part: part[0])]
+        means = np.concatenate(parts) if parts else np.empty(0)
+        intervals[key] = _intervals(values, means, confidence)
+    return intervals
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Trip ID parsing shared by verification, filtering, export and reporting.
+
+Trip IDs come in three shapes (see verify_trip_signatures.py):
+
+- UUID (very old trips):  XXXXXXXX-XXXX-XXXX-XXXX-XXXXXXXXXXXX (8-4-4-4-12)
+- legacy (4 parts):       deviceID-dest-date-time
+- signed (5 parts):       deviceID-dest-date-time-signature
+
+Verification used to tell them apart with split('-') and a run of length
+comparisons, then check the signature with an uncompiled re.match(); the
+export and the report each split the ID again with re.split(r'[-_]') for
+the device ID. parse_trip_id() does it once, with one compiled pattern, and
+returns a TripId record holding every part. TripTable.trip_ids() parses a
+table's IDs once and keeps the records for all later users.
+
+DEVICE ID:
+TripId.device_id keeps the rule the export and the report have always used:
+the text before the first '/' when the ID contains one, otherwise the text
+before the first '-' or '_'. Verification never needs it, so it is worked
+out on first access and then kept on the record.
+
+Usage:
+    from trip_ids import SIGNED, parse_trip_id
+
+    parsed = parse_trip_id('ABC12345-JFK-20251108-143022-a1b2c3d4')
+    parsed.format, parsed.device_id, parsed.base_trip_id, parsed.signature
+
+Requirements:
+    - Python 3.6+ (standard library only)
+"""
+
+import re
+from typing import Optional
+
+# TripId.format values
+MISSING = 'missing'
+UUID = 'uuid'
+LEGACY = 'legacy'
+SIGNED = 'signed'
+UNEXPECTED = 'unexpected'
+
+# The UUID shape is tried first; otherwise 4 or 5 '-'-separated parts
+# (groups: uuid, device, destination, date, time, signature)
+_TRIP_ID = re.compile(
+    r'([^-]{8}-[^-]{4}-[^-]{4}-[^-]{4}-[^-]{12}\Z)'
+    r'|([^-]*)-([^-]*)-([^-]*)-([^-]*)(?:-([^-]*))?\Z'
+)
+
+# Signature part of a signed ID: 8 hex characters (verify.html line 903)
+SIGNATURE_PATTERN = re.compile(r'[a-fA-F0-9]{8}\Z')
+
+# Device ID as in the export and the report (see module docstring)
+_DEVICE_ID = re.compile(r'[^/]*(?=/)|[^-_]*')
+
+
+class TripId:
+    """The parts of one trip ID (None where the format has no such part)."""
+
+    __slots__ = ('trip_id', 'format', 'destination', 'date', 'time', 'signature', '_device_id')
+
+    def __init__(self, trip_id: str, format: str, destination: Optional[str] = None,
+                 date: Optional[str] = None, time: Optional[str] = None,
+                 signature: Optional[str] = None):
+        self.trip_id = trip_id
+        self.format = format
+        self.destination = destination
+        self.date = date
+        self.time = time
+        self.signature = signature
+        self._device_id = None
+
+    @property
+    def device_id(self) -> str:
+        """Device part of the ID (see module docstring); '' when missing."""
+        if self._device_id is None:
+            self._device_id = _DEVICE_ID.match(self.trip_id).group()
+        return self._device_id
+
+    @property
+    def base_trip_id(self) -> Optional[str]:
+        """deviceID-dest-date-time of a signed ID: the HMAC input."""
+        if self.signature is None:
+            return None
+        return self.trip_id[:len(self.trip_id) - len(self.signature) - 1]
+
+    @property
+    def parts(self) -> int:
+        """Number of '-'-separated parts (as len(trip_id.split('-')))."""
+        return self.trip_id.count('-') + 1
+
+    def has_signature_format(self) -> bool:
+        """Whether the signature part is 8 hex characters."""
+        return self.signature is not None and SIGNATURE_PATTERN.match(self.signature) is not None
+
+    def __repr__(self) -> str:
+        return f'TripId({self.trip_id!r}, format={self.format!r})'
+
+
+def parse_trip_id(trip_id) -> TripId:
+    """Parse a trip ID in one pass; anything but a non-empty string is MISSING."""
+    if not trip_id or not isinstance(trip_id, str):
+        return TripId('', MISSING)
+    match = _TRIP_ID.match(trip_id)
+    if match is None:
+        return TripId(trip_id, UNEXPECTED)
+    uuid, _, destination, date, time, signature = match.groups()
+    if uuid is not None:
+        return TripId(trip_id, UUID)
+    return TripId(trip_id, LEGACY if signature is None else SIGNED,
+                  destination, date, time, signature)
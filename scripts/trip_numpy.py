@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+NumPy access shared by the optional numeric analyses.
+
+The report itself needs only the standard library; where NumPy is installed
+it takes whole-column paths for its arithmetic (optional_numpy()). The
+bootstrap CIs (trip_bootstrap.py), the trend permutation test (trip_permutation.py), the
+regression models (trip_regression.py) and TripTable.to_numpy() need NumPy.
+They import it through import_numpy(), so a missing or too old NumPy raises
+one ImportError with the install hint; the command-line handlers in
+analyze_jetlag_data.py print it. Library modules never print on import.
+
+NUMPY_MIN_VERSION is the oldest NumPy with everything these modules use
+(Generator.permuted() arrived in 1.20).
+
+Usage:
+    from trip_numpy import DEFAULT_SEED, import_numpy, optional_numpy
+
+    np = import_numpy()          # ImportError with the install hint
+    np = optional_numpy()        # None without a usable NumPy (fast paths)
+
+Requirements:
+    - Python 3.7+ (standard library only)
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+NUMPY_MIN_VERSION = (1, 20)
+
+NUMPY_HINT = 'Install numpy {}.{} or later: pip install "numpy>={}.{}"'.format(*NUMPY_MIN_VERSION * 2)
+
+# Default seed of the randomized analyses; a fixed seed makes the report
+# reproducible run to run
+DEFAULT_SEED = 20251024
+
+
+def _version(text: str) -> Tuple[int, ...]:
+    """Leading numeric release parts of a version string ('1.26.4' -> (1, 26, 4))."""
+    return tuple(int(part) for part in re.findall(r'\d+', text.split('+')[0])[:3])
+
+
+def import_numpy():
+    """The numpy module; ImportError with NUMPY_HINT if missing or too old."""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(f'{NUMPY_HINT} ({e})') from e
+    if _version(numpy.__version__) < NUMPY_MIN_VERSION:
+        raise ImportError(f'{NUMPY_HINT} (found numpy {numpy.__version__})')
+    return numpy
+
+
+@lru_cache(maxsize=None)
+def optional_numpy():
+    """The numpy module when a usable one is installed, else None (no hint)."""
+    try:
+        return import_numpy()
+    except ImportError:
+        return None
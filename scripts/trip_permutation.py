@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Permutation test for a monotone dose-response trend, stratified by time zones.
+
+The question behind the dose-response chart is whether severity falls as
+the stimulation level rises (2-4 -> 5-7 -> 8-12 points). Testing it used to
+mean exporting to CSV and fitting analyze_jetlag_r.R. This module tests it
+directly, without distributional assumptions:
+
+STATISTIC:
+Within each time zone stratum, trips get a band score (1, 2, 3 for 2-4,
+5-7, 8-12 points) and the statistic is
+
+    T = sum over strata of sum_i score_i * (severity_i - stratum mean)
+
+i.e. the summed within-stratum covariance of score and severity (a
+stratified linear-by-linear trend statistic, as in the Cochran-Armitage /
+Mantel trend tests). Negative T means severity falls as the band rises.
+Centering within strata removes differences between time zone buckets, so
+only the band ordering inside each bucket counts.
+
+NULL DISTRIBUTION:
+Under "no trend", band labels are exchangeable within a stratum. Labels are
+shuffled within every stratum in vectorized NumPy blocks (one
+Generator.permuted() call per stratum per block), and the p-value is
+(1 + #{T_perm as or more extreme}) / (1 + permutations).
+
+EARLY STOPPING:
+After each block a 99.9% Wilson interval is computed for the p-value. Once
+it lies entirely above or below alpha, more permutations cannot change the
+decision and the test stops (never before min_permutations). The interval
+is reported with the p-value so readers can see its precision.
+
+Usage:
+    from trip_permutation import stratified_trend_test
+
+    result = stratified_trend_test(scores, severities, strata, max_permutations=100000)
+    result['p_value'], result['permutations'], result['stopped_early']
+
+    # Or from the command line, on a trips export
+    python analyze_jetlag_data.py --trips trips.json --permutations 100000
+
+Requirements:
+    - Python 3.8+
+    - numpy 1.20+ (see trip_numpy.py)
+"""
+
+from statistics import NormalDist
+from typing import Dict, Hashable, Sequence
+
+from trip_numpy import DEFAULT_SEED, import_numpy
+
+np = import_numpy()
+
+# Permutations drawn per vectorized block
+BLOCK_SIZE = 1000
+
+# Confidence of the p-value interval used to decide early stopping
+STOPPING_CONFIDENCE = 0.999
+
+ALTERNATIVES = ('decreasing', 'increasing', 'two-sided')
+
+
+def wilson_interval(successes: int, trials: int, confidence: float) -> tuple:
+    """Wilson score interval for a binomial proportion."""
+    if not trials:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half = z * ((p * (1 - p) + z * z / (4 * trials)) / trials) ** 0.5 / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_trend_test(scores: Sequence[float], values: Sequence[float],
+                          strata: Sequence[Hashable], max_permutations: int = 100000,
+                          alternative: str = 'decreasing', alpha: float = 0.05,
+                          min_permutations: int = 2 * BLOCK_SIZE,
+                          seed: int = DEFAULT_SEED) -> Dict:
+    """
+    Permutation test of a monotone trend of values over ordered scores,
+    with scores permuted within strata.
+
+    Args:
+        scores: ordinal group score per observation (e.g. 1, 2, 3 per band)
+        values: outcome per observation (aggregate severity)
+        strata: stratum key per observation (time zone bucket)
+        max_permutations: upper bound on permutations drawn
+        alternative: 'decreasing' (values fall as scores rise), 'increasing'
+            or 'two-sided'
+        alpha: significance level the early-stopping rule decides against
+        min_permutations: permutations drawn before stopping is considered
+        seed: random seed; identical inputs and seeds give identical results
+
+    Returns:
+        Dict with statistic, p_value, p_interval (Wilson, STOPPING_CONFIDENCE),
+        permutations, stopped_early, strata (used), n, alternative
+    """
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f'alternative must be one of {ALTERNATIVES}')
+
+    scores = np.asarray(scores, dtype=float)
+    values = np.asarray(values, dtype=float)
+    keys = list(strata)
+
+    # Centered values per stratum; strata with a single score level carry
+    # no information about the trend and are dropped
+    groups = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(key, []).append(i)
+    layers = []
+    for indices in groups.values():
+        indices = np.asarray(indices)
+        layer_scores = scores[indices]
+        if layer_scores.min() == layer_scores.max():
+            continue
+        centered = values[indices] - values[indices].mean()
+        layers.append((layer_scores, centered))
+
+    statistic = float(sum(s @ c for s, c in layers))
+    result = {
+        'statistic': statistic,
+        'alternative': alternative,
+        'strata': len(layers),
+        'n': sum(len(s) for s, _ in layers),
+    }
+    if not layers:
+        result.update(p_value=1.0, p_interval=(1.0, 1.0), permutations=0, stopped_early=False)
+        return result
+
+    # Small tolerance so permutations that tie the observed statistic
+    # (up to rounding) count as "as extreme"
+    tolerance = 1e-9 * max(1.0, abs(statistic))
+    rng = np.random.default_rng(seed)
+    extreme = 0
+    drawn = 0
+    stopped_early = False
+    while drawn < max_permutations:
+        block = min(BLOCK_SIZE, max_permutations - drawn)
+        permuted = np.zeros(block)
+        for layer_scores, centered in layers:
+            shuffled = rng.permuted(np.broadcast_to(layer_scores, (block, len(layer_scores))), axis=1)
+            permuted += shuffled @ centered
+        if alternative == 'decreasing':
+            extreme += int(np.count_nonzero(permuted <= statistic + tolerance))
+        elif alternative == 'increasing':
+            extreme += int(np.count_nonzero(permuted >= statistic - tolerance))
+        else:
+            extreme += int(np.count_nonzero(np.abs(permuted) >= abs(statistic) - tolerance))
+        drawn += block
+
+        if drawn >= min_permutations and drawn < max_permutations:
+            low, high = wilson_interval(extreme, drawn, STOPPING_CONFIDENCE)
+            if high < alpha or low > alpha:
+                stopped_early = True
+                break
+
+    result.update(
+        p_value=(extreme + 1) / (drawn + 1),
+        p_interval=wilson_interval(extreme, drawn, STOPPING_CONFIDENCE),
+        permutations=drawn,
+        stopped_early=stopped_early,
+    )
+    return result
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+OLS regression with sandwich (robust) standard errors for the trip analyses.
+
+The regression models used to need a round trip through R:
+export_trips_for_r.py writes a CSV, and analyze_jetlag_r.R reads it back and
+fits lm() with sandwich/lmtest standard errors. This module fits the same
+models directly from the validated TripTable, so an analysis iteration needs
+no CSV and no R start-up.
+
+MODELS (as in analyze_jetlag_r.R):
+- dose:    jetlag_score ~ stimulated_points + time_zones + direction
+- primary: jetlag_score ~ adherence_cat + time_zones + direction
+           (adherence_cat 2-4 is the reference level, direction west)
+
+SAMPLE:
+The rows analyze_jetlag_r.R keeps from the export: a valid severity, a time
+zone count, direction east or west, and at least 2 stimulated points.
+jetlag_score is rounded to 4 decimals, as in the CSV, so the estimates agree
+with R to numerical tolerance. device_id is the tripId's device part
+(trip_ids.TripId.device_id, as in the CSV).
+
+STANDARD ERRORS:
+With bread B = (X'X)^-1, residuals e, leverages h and k coefficients:
+- HC0: B X' diag(e^2) X B
+- HC1: HC0 * n / (n - k)
+- HC2: e^2 / (1 - h) in place of e^2
+- HC3: e^2 / (1 - h)^2 in place of e^2
+- cluster: B (sum over devices of X_g'e_g e_g'X_g) B
+           * G / (G - 1) * (n - 1) / (n - k)
+  which is sandwich::vcovCL(type = "HC1"), the default in analyze_jetlag_r.R.
+  With fewer than 2 devices the report falls back to HC1, as the R script does.
+
+t statistics use n - k residual degrees of freedom (as lmtest::coeftest on an
+lm fit). Columns that are collinear with earlier ones (e.g. direction when
+every trip went east) are dropped, as lm() reports them as NA.
+
+Usage:
+    from trip_regression import fit_model
+
+    fit = fit_model(valid_trips, 'dose')             # valid TripTable
+    fit['coefficients'], fit['se']['cluster'], fit['p']['cluster']
+
+    # Or from the command line, on a trips export
+    python analyze_jetlag_data.py --trips trips.json --regression
+
+Requirements:
+    - Python 3.7+
+    - numpy 1.20+ (see trip_numpy.py)
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+from trip_numpy import import_numpy
+from trip_table import TripTable
+
+np = import_numpy()
+
+MODELS = ('dose', 'primary')
+
+COVARIANCE_TYPES = ('HC0', 'HC1', 'HC2', 'HC3', 'cluster')
+
+# Relative tolerance for dropping collinear columns (lm()'s default)
+COLLINEARITY_TOLERANCE = 1e-7
+
+
+def adherence_category(points: int) -> str:
+    """analyze_jetlag_r.R adherence_cat of a trip with at least 2 points."""
+    if points <= 4:
+        return '2-4'
+    if points <= 7:
+        return '5-7'
+    return '8-12'
+
+
+def model_data(table: TripTable, model: str = 'dose') -> Dict:
+    """
+    Response, design matrix and device clusters of a model.
+
+    Args:
+        table: validated trips
+        model: one of MODELS
+
+    Returns:
+        Dict with y (n), X (n x k), terms (column names, intercept first) and
+        clusters (device id per row; rows without one get their own cluster)
+    """
+    if model not in MODELS:
+        raise ValueError(f'model must be one of {MODELS}')
+
+    points = table.filled('pointsCompleted', None)
+    time_zones = table.filled('timezonesCount', None)
+    severity = table.severity()
+    trip_ids = table.trip_ids()
+    y, rows, clusters = [], [], []
+    for i, (n_points, tz, score) in enumerate(zip(points, time_zones, severity)):
+        if score != score or tz is None or n_points is None or n_points < 2:
+            continue
+        direction = table.value('travelDirection', i)
+        direction = direction.strip().lower() if isinstance(direction, str) else None
+        if direction not in ('east', 'west'):
+            continue
+        east = 1.0 if direction == 'east' else 0.0
+        if model == 'dose':
+            rows.append((1.0, float(n_points), float(tz), east))
+        else:
+            category = adherence_category(n_points)
+            rows.append((1.0, float(category == '5-7'), float(category == '8-12'), float(tz), east))
+        y.append(round(score, 4))
+        device = trip_ids[i].device_id.strip()
+        clusters.append(device or f'missing_row_{len(y)}')
+
+    if model == 'dose':
+        terms = ['(Intercept)', 'stimulated_points', 'time_zones', 'directioneast']
+    else:
+        terms = ['(Intercept)', 'adherence_cat5-7', 'adherence_cat8-12', 'time_zones', 'directioneast']
+    X = np.array(rows, dtype=float).reshape(len(rows), len(terms))
+    return {'y': np.array(y, dtype=float), 'X': X, 'terms': terms, 'clusters': clusters}
+
+
+def _independent_columns(X: np.ndarray) -> List[int]:
+    """Columns kept in order, skipping those (near) spanned by earlier ones."""
+    kept = []
+    for j in range(X.shape[1]):
+        column = X[:, j]
+        norm = np.linalg.norm(column)
+        if norm == 0.0:
+            continue
+        if kept:
+            basis = X[:, kept]
+            coef, *_ = np.linalg.lstsq(basis, column, rcond=None)
+            column = column - basis @ coef
+        if np.linalg.norm(column) > COLLINEARITY_TOLERANCE * norm:
+            kept.append(j)
+    return kept
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b) (continued fraction, Lentz)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _incomplete_beta(b, a, 1.0 - x)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-15:
+            break
+    return front * fraction
+
+
+def t_two_sided_p(t: float, df: float) -> float:
+    """Two-sided p-value of a t statistic (Student t with df degrees of freedom)."""
+    if t != t or df <= 0:
+        return float('nan')
+    return _incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+
+
+def ols(y: np.ndarray, X: np.ndarray, terms: Sequence[str],
+        clusters: Optional[Sequence] = None) -> Dict:
+    """
+    Ordinary least squares with every COVARIANCE_TYPES standard error.
+
+    Args:
+        y: response (n)
+        X: design matrix (n x k), intercept column included
+        terms: column names
+        clusters: cluster label per row (for the 'cluster' type; None skips it)
+
+    Returns:
+        Dict with n, df_residual, terms (collinear ones dropped), dropped,
+        coefficients, r_squared, clusters (count), and se / t / p, each a dict
+        of covariance type -> array aligned with terms
+    """
+    kept = _independent_columns(X)
+    dropped = [terms[j] for j in range(len(terms)) if j not in kept]
+    X = X[:, kept]
+    terms = [terms[j] for j in kept]
+    n, k = X.shape
+    df_residual = n - k
+    if df_residual <= 0:
+        raise ValueError(f'Too few trips for the model ({n} rows, {k} coefficients)')
+
+    # QR: beta = R^-1 Q'y, (X'X)^-1 = R^-1 R^-T, leverages = row sums of Q^2
+    q, r = np.linalg.qr(X)
+    coefficients = np.linalg.solve(r, q.T @ y)
+    r_inverse = np.linalg.solve(r, np.eye(k))
+    bread = r_inverse @ r_inverse.T
+    residuals = y - X @ coefficients
+    leverage = np.einsum('ij,ij->i', q, q)
+
+    def sandwich(weights: np.ndarray) -> np.ndarray:
+        scores = X * weights[:, None]
+        return bread @ (scores.T @ scores) @ bread
+
+    # Sandwiches take sqrt-weights: scores are X_i * e_i * sqrt(adjustment)
+    covariances = {
+        'HC0': sandwich(residuals),
+        'HC2': sandwich(residuals / np.sqrt(1.0 - leverage)),
+        'HC3': sandwich(residuals / (1.0 - leverage)),
+    }
+    covariances['HC1'] = covariances['HC0'] * n / df_residual
+
+    n_clusters = 0
+    if clusters is not None:
+        labels, codes = np.unique(np.asarray(clusters, dtype=object).astype(str), return_inverse=True)
+        n_clusters = len(labels)
+        if n_clusters >= 2:
+            summed = np.zeros((n_clusters, k))
+            np.add.at(summed, codes, X * residuals[:, None])
+            adjustment = n_clusters / (n_clusters - 1) * (n - 1) / df_residual
+            covariances['cluster'] = bread @ (summed.T @ summed) @ bread * adjustment
+
+    se, t, p = {}, {}, {}
+    for name in COVARIANCE_TYPES:
+        if name not in covariances:
+            continue
+        se[name] = np.sqrt(np.diag(covariances[name]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t[name] = coefficients / se[name]
+        p[name] = np.array([t_two_sided_p(float(value), df_residual) for value in t[name]])
+
+    centered = y - y.mean()
+    total = float(centered @ centered)
+    return {
+        'n': n,
+        'df_residual': df_residual,
+        'terms': terms,
+        'dropped': dropped,
+        'coefficients': coefficients,
+        'r_squared': 1.0 - float(residuals @ residuals) / total if total else float('nan'),
+        'clusters': n_clusters,
+        'se': se,
+        't': t,
+        'p': p,
+    }
+
+
+def fit_model(table: TripTable, model: str = 'dose') -> Dict:
+    """
+    Fit one of MODELS to the validated trips.
+
+    Returns the ols() result plus model and default: the covariance type the
+    R script reports ('cluster', or 'HC1' with fewer than 2 devices).
+    """
+    data = model_data(table, model)
+    fit = ols(data['y'], data['X'], data['terms'], data['clusters'])
+    fit['model'] = model
+    fit['default'] = 'cluster' if 'cluster' in fit['se'] else 'HC1'
+    return fit
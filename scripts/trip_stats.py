@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+One-pass grouped statistics for the trip analyses.
+
+dose_response_analysis used to collect every severity into a list per
+(stimulation level, time zone) group and then walk each list twice, once
+for the mean and once for the variance. GroupedStats replaces that with a
+single pass: each value updates a RunningStats accumulator for its group
+using Welford's online algorithm, so memory is constant per group and the
+cost is linear in the number of trips.
+
+RunningStats reports the same n/mean/std/sem as the dashboard charts
+(charts.js): std is the population standard deviation (divide by n) and
+sem = std / sqrt(n). Two accumulators can be merged (Chan et al.), so
+partial results over separate chunks of trips combine exactly as if the
+values had been added to one accumulator, and a value can be removed again
+(the Welford update run backwards), so a changed trip is swapped out
+without revisiting the others. to_state()/from_state() round-trip an
+accumulator through JSON.
+
+Any cross-tab can use it: pass one key per trip (a tuple for several
+dimensions) alongside the values.
+
+Usage:
+    from trip_stats import GroupedStats
+
+    groups = GroupedStats.from_pairs(zip(keys, severities))
+    for key, stats in groups.items():
+        print(key, stats.as_dict())
+
+Requirements:
+    - Python 3.6+ (standard library only)
+"""
+
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+class RunningStats:
+    """Count, mean and sum of squared deviations, updated one value at a time."""
+
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        """Undo add(value) for a value that was added earlier."""
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        n = self.n - 1
+        previous = (self.n * self.mean - value) / n
+        self.m2 = max(self.m2 - (value - previous) * (value - self.mean), 0.0)
+        self.mean = previous
+        self.n = n
+
+    def to_state(self) -> List:
+        return [self.n, self.mean, self.m2]
+
+    @classmethod
+    def from_state(cls, state: Sequence) -> 'RunningStats':
+        stats = cls()
+        stats.n, stats.mean, stats.m2 = int(state[0]), float(state[1]), float(state[2])
+        return stats
+
+    def merge(self, other: 'RunningStats'):
+        """Fold another accumulator into this one."""
+        if not other.n:
+            return
+        if not self.n:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    @property
+    def variance(self) -> float:
+        """Population variance (divides by n, as charts.js does)."""
+        return self.m2 / self.n if self.n else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    @property
+    def sem(self) -> float:
+        return self.std / (self.n ** 0.5) if self.n else 0.0
+
+    def as_dict(self) -> Dict:
+        return {'n': self.n, 'mean': self.mean, 'std': self.std, 'sem': self.sem}
+
+    def __repr__(self) -> str:
+        return f'RunningStats(n={self.n}, mean={self.mean!r}, std={self.std!r})'
+
+
+class GroupedStats:
+    """RunningStats per group key, filled in a single pass."""
+
+    def __init__(self):
+        self._groups = {}
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[Hashable, float]]) -> 'GroupedStats':
+        """Group (key, value) pairs; pairs whose key is None are skipped."""
+        grouped = cls()
+        groups = grouped._groups
+        for key, value in pairs:
+            if key is None:
+                continue
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = RunningStats()
+            stats.add(value)
+        return grouped
+
+    def add(self, key: Hashable, value: float):
+        stats = self._groups.get(key)
+        if stats is None:
+            stats = self._groups[key] = RunningStats()
+        stats.add(value)
+
+    def remove(self, key: Hashable, value: float):
+        """Undo add(key, value); groups left empty are dropped."""
+        stats = self._groups[key]
+        stats.remove(value)
+        if not stats.n:
+            del self._groups[key]
+
+    def merge(self, other: 'GroupedStats'):
+        """Fold another GroupedStats (e.g. over a different chunk) into this one."""
+        for key, stats in other._groups.items():
+            self._groups.setdefault(key, RunningStats()).merge(stats)
+
+    def to_state(self) -> Dict:
+        """JSON-ready state (group keys must be strings)."""
+        return {key: stats.to_state() for key, stats in self._groups.items()}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'GroupedStats':
+        grouped = cls()
+        for key, stats in state.items():
+            grouped._groups[key] = RunningStats.from_state(stats)
+        return grouped
+
+    def get(self, key: Hashable) -> Optional[RunningStats]:
+        return self._groups.get(key)
+
+    def items(self) -> Iterator[Tuple[Hashable, RunningStats]]:
+        return iter(self._groups.items())
+
+    def __contains__(self, key) -> bool:
+        return key in self._groups
+
+    def __len__(self) -> int:
+        return len(self._groups)
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Columnar trip table for the analysis scripts.
+
+The analyses used to walk a list of trip dicts and repeat trip.get(...) for
+every field they touch, in every function. TripTable is built once, as the
+trips stream in, and holds one typed column per analysis field:
+
+- Severities, anticipated severities   array('d'), NaN where missing
+- Counts (pointsCompleted, ...)          array('q'), MISSING_INT where missing
+- Booleans (surveyCompleted, points)     array('b'), 1 = true, 0 = false,
+                                         -1 = missing; isTest and
+                                         surveyCompleted are stored by
+                                         truthiness, the others only count
+                                         as true when they are exactly True
+- Time zones, airport codes, direction   array('i') codes into an interned
+                                         category list, -1 where missing
+- tripId, startDate, hmacSignature       plain lists
+- ISO timestamps (startDate, ...)        array('d') seconds since the epoch
+                                         in <field>Epoch, NaN where missing
+                                         or unparseable
+- Points stimulated (point1..12)         array('H') bitmask in pointMask,
+                                         bit n-1 set = pointNCompleted true
+
+Timestamps are parsed once, when the table is built (or never, when it is
+loaded from the cache), so date rules and sorting compare floats instead of
+parsing strings.
+
+SYMPTOM MATRICES AND COMPOSITE SCORES:
+Post-travel, pre-travel and expected symptom ratings form n x k matrices
+(matrix('post'), ...): k float columns with NaN for a missing rating. The
+composite scores - aggregate severity (NaN-mean of the post ratings),
+anticipated severity (generalAnticipated, else the NaN-mean of the
+expectations) and pre-travel severity - are computed for the whole table
+in one pass per score (composite()), cached on the table and stored in the
+decoded-trip cache. Row means add the present ratings left to right and
+divide by their count, exactly as calculate_aggregate_severity() and
+get_anticipated_severity() do, so the results are bit-identical. With
+NumPy installed they are vectorized over the whole table, one column at a
+time (nan_row_means()); without it they run row by row.
+
+Column arrays support the buffer protocol, so NumPy code can wrap them
+without copying (to_numpy()); the table itself needs only the standard
+library, and uses NumPy for speed when it is installed.
+
+DECODED-TRIP CACHE:
+save_table() writes a table to a binary file next to the export
+(<export>.tripcache) and load_table() maps it back with mmap: numeric
+columns are zero-copy views of the file, so a repeat run skips JSON parsing
+and decoding entirely. The cache is keyed by the SHA-256 of the export, the
+Firestore decoder version and this table's layout version; load_table()
+returns None when any of them differ, and the caller rebuilds it.
+
+Usage:
+    from trip_table import TripTable
+
+    table = TripTable.from_trips(trips)     # any iterable of trip dicts
+    points = table.column('pointsCompleted')
+    for i in range(len(table)):
+        row = table.row(i)                  # dict-like view: row.get('tripId')
+    severity = table.composite('severity')  # one float per trip, NaN = none
+    post = table.matrix('post')             # 6 rating columns
+    device = table.trip_ids()[i].device_id  # tripId parsed once per trip
+
+    key = cache_key('firestore-trips.json')
+    table = load_table('firestore-trips.json' + CACHE_SUFFIX, key)
+    if table is None:
+        table = TripTable.from_trips(trips)
+        save_table(table, 'firestore-trips.json' + CACHE_SUFFIX, key)
+
+Requirements:
+    - Python 3.7+ (standard library only; NumPy 1.20+ optional for to_numpy())
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from firestore_snapshot import PARTIAL_SUFFIX
+from firestore_values import DECODER_VERSION
+from trip_ids import TripId, parse_trip_id
+from trip_numpy import import_numpy, optional_numpy
+
+NAN = float('nan')
+
+# Sentinel stored in integer columns for a missing value
+MISSING_INT = -(2 ** 63)
+
+SEVERITY_FIELDS = (
+    'sleepPost', 'fatiguePost', 'concentrationPost',
+    'irritabilityPost', 'motivationPost', 'giPost',
+)
+PRE_SEVERITY_FIELDS = (
+    'sleepPre', 'fatiguePre', 'concentrationPre', 'irritabilityPre', 'giPre',
+)
+EXPECTATION_FIELDS = (
+    'sleepExpectations', 'fatigueExpectations', 'concentrationExpectations',
+    'irritabilityExpectations', 'giExpectations',
+)
+
+# Symptom rating groups, each an n x k matrix (one float column per rating)
+SYMPTOM_GROUPS = {
+    'post': SEVERITY_FIELDS,
+    'pre': PRE_SEVERITY_FIELDS,
+    'expectations': EXPECTATION_FIELDS,
+}
+POINT_FIELDS = tuple(f'point{n}Completed' for n in range(1, 13))
+
+# 12-bit packed copy of POINT_FIELDS: bit n-1 is set when pointNCompleted is true
+POINT_MASK = 'pointMask'
+
+FLOAT_FIELDS = SEVERITY_FIELDS + PRE_SEVERITY_FIELDS + ('generalAnticipated',) + EXPECTATION_FIELDS
+INT_FIELDS = ('pointsCompleted', 'timezonesCount')
+BOOL_FIELDS = ('isTest', 'surveyCompleted', 'researchConsentGranted') + POINT_FIELDS
+# Flags the exclusion rules test for truthiness (if trip.get('isTest')), so
+# the column rules agree with the row rules for values like 'true' or 1
+TRUTHY_FIELDS = ('isTest', 'surveyCompleted')
+CATEGORY_FIELDS = (
+    'originTimezone', 'arrivalTimeZone', 'originCode', 'destinationCode',
+    'travelDirection', 'completionMethod',
+)
+TEXT_FIELDS = ('tripId', 'startDate', 'hmacSignature')
+
+# ISO timestamp fields parsed once into <field>Epoch float columns
+TIMESTAMP_FIELDS = ('startDate', 'completionDate', 'surveyCompletedAt', 'flightLandingDate', 'created')
+EPOCH_SUFFIX = 'Epoch'
+
+# Composite scores computed once per table (composite()) and cached with it
+COMPOSITES = ('severity', 'anticipated', 'pre_severity')
+
+# Bump when the columns or the cache file layout change
+TABLE_VERSION = 5
+
+CACHE_SUFFIX = '.tripcache'
+_COMPOSITE_PREFIX = 'composite:'
+_CACHE_MAGIC = b'JLPTRIPS'
+_HEADER_SIZE = struct.Struct('<Q')
+_ALIGN = 8
+
+
+def _typecode(column) -> str:
+    """Element type of an array.array or a (memory-mapped) memoryview column."""
+    return column.typecode if isinstance(column, array) else column.format
+
+
+def _to_float(value) -> float:
+    """Numeric value (or numeric string) as float; NaN for missing or ''."""
+    if value is None or value == '':
+        return NAN
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return NAN
+
+
+# Python < 3.11 fromisoformat() accepts at most 6 fractional digits;
+# Firestore timestamps carry up to 9
+_LONG_FRACTION = re.compile(r'(\.\d{6})\d+')
+
+
+def parse_epoch(value) -> float:
+    """
+    ISO 8601 timestamp as seconds since the epoch (NaN if missing/invalid).
+
+    A trailing Z means UTC; values without an offset (e.g. a bare date) are
+    taken as UTC.
+    """
+    if not value or not isinstance(value, str):
+        return NAN
+    text = value.replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            parsed = datetime.fromisoformat(_LONG_FRACTION.sub(r'\1', text))
+        except ValueError:
+            return NAN
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def nan_row_means(columns: List) -> array:
+    """
+    Per-row mean of the non-NaN values across equal-length float columns.
+
+    NaN where a row has no values. Sums run left to right in column order.
+    With NumPy installed the whole table is done in k vectorized steps, one
+    per column (adding 0.0 for a missing rating leaves a sum unchanged, so
+    the result is bit-identical); without it, row by row.
+    """
+    np = optional_numpy()
+    if np is not None and columns and len(columns[0]):
+        total = np.zeros(len(columns[0]))
+        count = np.zeros(len(columns[0]))
+        for column in columns:
+            values = np.frombuffer(column, dtype=np.float64)
+            present = values == values
+            total += np.where(present, values, 0.0)
+            count += present
+        with np.errstate(invalid='ignore'):
+            return array('d', (total / count).tobytes())
+
+    means = array('d')
+    append = means.append
+    for values in zip(*columns):
+        present = [v for v in values if v == v]
+        append(sum(present) / len(present) if present else NAN)
+    return means
+
+
+def _to_int(value) -> int:
+    if value is None:
+        return MISSING_INT
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return MISSING_INT
+
+
+def _to_bool(value, truthy: bool = False) -> int:
+    if value is None:
+        return -1
+    if truthy:
+        return 1 if value else 0
+    return 1 if value is True else 0
+
+
+_BOOL_CONVERSIONS = tuple((field, field in TRUTHY_FIELDS) for field in BOOL_FIELDS)
+
+
+class TripRow:
+    """Read-only, dict-like view of one table row (supports row.get(field))."""
+
+    __slots__ = ('_table', 'index')
+
+    def __init__(self, table: 'TripTable', index: int):
+        self._table = table
+        self.index = index
+
+    def get(self, field: str, default=None):
+        value = self._table.value(field, self.index)
+        return default if value is None else value
+
+    def __getitem__(self, field: str):
+        value = self._table.value(field, self.index)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field: str) -> bool:
+        return self._table.value(field, self.index) is not None
+
+    def trip_id(self) -> TripId:
+        """This trip's parsed tripId (see TripTable.trip_ids())."""
+        return self._table.trip_ids()[self.index]
+
+    def composite(self, name: str) -> Optional[float]:
+        """This trip's composite score (see TripTable.composite()), None if missing."""
+        score = self._table.composite(name)[self.index]
+        return None if score != score else score
+
+
+class TripTable:
+    """Typed per-field columns for a set of trips (see module docstring)."""
+
+    def __init__(self):
+        self._columns = {}
+        self._categories = {}
+        self._codes = {}
+        for field in FLOAT_FIELDS:
+            self._columns[field] = array('d')
+        for field in INT_FIELDS:
+            self._columns[field] = array('q')
+        for field in BOOL_FIELDS:
+            self._columns[field] = array('b')
+        for field in CATEGORY_FIELDS:
+            self._columns[field] = array('i')
+            self._categories[field] = []
+            self._codes[field] = {}
+        for field in TEXT_FIELDS:
+            self._columns[field] = []
+        for field in TIMESTAMP_FIELDS:
+            self._columns[field + EPOCH_SUFFIX] = array('d')
+        self._columns[POINT_MASK] = array('H')
+        self._length = 0
+        self._composites = {}
+        self._trip_ids = None  # Parsed tripId column (see trip_ids())
+        self._mmap = None  # Backing file map for tables loaded from a cache
+
+    @classmethod
+    def from_trips(cls, trips: Iterable[Dict]) -> 'TripTable':
+        """Build a table from trip dicts (consumed once, e.g. a generator)."""
+        if isinstance(trips, TripTable):
+            return trips
+        table = cls()
+        for trip in trips:
+            table.append(trip)
+        return table
+
+    def append(self, trip: Dict):
+        if self._mmap is not None:
+            raise TypeError('A TripTable loaded from a cache file is read-only')
+        columns = self._columns
+        get = trip.get
+        for field in FLOAT_FIELDS:
+            columns[field].append(_to_float(get(field)))
+        for field in INT_FIELDS:
+            columns[field].append(_to_int(get(field)))
+        for field, truthy in _BOOL_CONVERSIONS:
+            columns[field].append(_to_bool(get(field), truthy))
+        mask = 0
+        for bit, field in enumerate(POINT_FIELDS):
+            if columns[field][-1] == 1:
+                mask |= 1 << bit
+        columns[POINT_MASK].append(mask)
+        for field in CATEGORY_FIELDS:
+            if field == 'originTimezone':
+                # Canonical origin IANA id; documents used both spellings
+                value = get('originTimezone') or get('originTimeZone')
+            else:
+                value = get(field)
+            columns[field].append(self._intern(field, value))
+        for field in TEXT_FIELDS:
+            columns[field].append(get(field))
+        for field in TIMESTAMP_FIELDS:
+            columns[field + EPOCH_SUFFIX].append(parse_epoch(get(field)))
+        self._length += 1
+        self._composites.clear()
+        self._trip_ids = None
+
+    def _intern(self, field: str, value) -> int:
+        if value is None:
+            return -1
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+            self._categories[field].append(sys.intern(value) if isinstance(value, str) else value)
+        return code
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, field: str):
+        """Raw column: a typed array (codes for category fields) or a list."""
+        return self._columns[field]
+
+    def categories(self, field: str) -> List:
+        """Distinct values of a category field, indexed by code."""
+        return self._categories[field]
+
+    def value(self, field: str, index: int):
+        """Python value of one cell (None where missing)."""
+        if field == 'originTimeZone':
+            field = 'originTimezone'
+        column = self._columns.get(field)
+        if column is None:
+            return None
+        raw = column[index]
+        if field in self._categories:
+            return None if raw < 0 else self._categories[field][raw]
+        if isinstance(column, list):
+            return raw
+        typecode = _typecode(column)
+        if typecode == 'd':
+            return None if raw != raw else raw
+        if typecode == 'q':
+            return None if raw == MISSING_INT else raw
+        if typecode == 'H':
+            return raw
+        return None if raw < 0 else raw == 1
+
+    def filled(self, field: str, default) -> List:
+        """Numeric column as a list, with default in place of missing values."""
+        column = self._columns[field]
+        typecode = _typecode(column)
+        if typecode == 'd':
+            return [default if v != v else v for v in column]
+        missing = MISSING_INT if typecode == 'q' else -1
+        return [default if v == missing else v for v in column]
+
+    def values(self, field: str) -> List:
+        """Whole column as Python values (None where missing)."""
+        return [self.value(field, i) for i in range(self._length)]
+
+    def take(self, indices: Iterable[int]) -> 'TripTable':
+        """New table holding the given rows, in the given order."""
+        indices = list(indices)
+        table = TripTable()
+        for field, column in self._columns.items():
+            if isinstance(column, list):
+                table._columns[field] = [column[i] for i in indices]
+            else:
+                table._columns[field] = array(_typecode(column), (column[i] for i in indices))
+        for field in CATEGORY_FIELDS:
+            table._categories[field] = list(self._categories[field])
+            table._codes[field] = dict(self._codes[field])
+        for name, scores in self._composites.items():
+            table._composites[name] = array('d', (scores[i] for i in indices))
+        if self._trip_ids is not None:
+            table._trip_ids = [self._trip_ids[i] for i in indices]
+        table._length = len(indices)
+        return table
+
+    def row(self, index: int) -> TripRow:
+        return TripRow(self, index)
+
+    def rows(self) -> Iterator[TripRow]:
+        for i in range(self._length):
+            yield TripRow(self, i)
+
+    def matrix(self, group: str) -> List:
+        """Ratings of a SYMPTOM_GROUPS group as k float columns (NaN = missing)."""
+        return [self._columns[field] for field in SYMPTOM_GROUPS[group]]
+
+    def composite(self, name: str) -> array:
+        """
+        A COMPOSITES score per trip (NaN where it cannot be computed), computed
+        once for the whole table and cached.
+
+        - severity: mean of the present post-travel ratings
+          (analyze_jetlag_data.calculate_aggregate_severity())
+        - anticipated: generalAnticipated, else the mean of the present
+          expectation ratings (get_anticipated_severity())
+        - pre_severity: mean of the present pre-travel ratings
+        """
+        scores = self._composites.get(name)
+        if scores is None:
+            if name == 'severity':
+                scores = nan_row_means(self.matrix('post'))
+            elif name == 'pre_severity':
+                scores = nan_row_means(self.matrix('pre'))
+            elif name == 'anticipated':
+                general = self._columns['generalAnticipated']
+                expected = nan_row_means(self.matrix('expectations'))
+                np = optional_numpy()
+                if np is not None and len(general):
+                    general = np.frombuffer(general, dtype=np.float64)
+                    scores = array('d', np.where(general == general, general,
+                                                 np.frombuffer(expected, dtype=np.float64)).tobytes())
+                else:
+                    scores = array('d', (g if g == g else e for g, e in zip(general, expected)))
+            else:
+                raise KeyError(f'Unknown composite score: {name}')
+            self._composites[name] = scores
+        return scores
+
+    def trip_ids(self) -> List[TripId]:
+        """Parsed tripId per trip (trip_ids.parse_trip_id()), parsed once and kept."""
+        if self._trip_ids is None:
+            self._trip_ids = [parse_trip_id(trip_id) for trip_id in self._columns['tripId']]
+        return self._trip_ids
+
+    def severity(self) -> array:
+        """Aggregate symptom severity per trip (NaN if no symptoms), computed once."""
+        return self.composite('severity')
+
+    def map_categories(self, field: str, func, missing=None):
+        """
+        NumPy array of func(value) for each row of a category field, with
+        missing where the value is absent. func runs once per distinct value.
+        """
+        np = import_numpy()
+        mapped = [func(value) for value in self._categories[field]] + [missing]
+        codes = self.to_numpy(field)
+        return np.asarray(mapped)[codes] if len(codes) else np.asarray(mapped[:0])
+
+    def to_numpy(self, field: str):
+        """
+        Zero-copy NumPy view of a typed column or COMPOSITES score; a
+        SYMPTOM_GROUPS name gives the n x k rating matrix (a copy).
+        """
+        np = import_numpy()
+        if field in SYMPTOM_GROUPS:
+            return np.column_stack([self.to_numpy(f) for f in SYMPTOM_GROUPS[field]])
+        column = self.composite(field) if field in COMPOSITES else self._columns[field]
+        if isinstance(column, list):
+            return np.array(column, dtype=object)
+        typecode = _typecode(column)
+        return np.frombuffer(column, dtype=typecode) if len(column) else np.array([], dtype=typecode)
+
+
+def cache_key(export_path: str) -> str:
+    """Cache key for an export: content hash plus decoder and table versions."""
+    digest = hashlib.sha256()
+    with open(export_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f'{digest.hexdigest()}-d{DECODER_VERSION}-t{TABLE_VERSION}'
+
+
+def save_table(table: TripTable, path: str, key: str):
+    """
+    Write a table to a cache file (atomically, via <path>.partial).
+
+    Layout: magic, header length, JSON header (key, row count, category
+    values, column directory), then each column's raw bytes, 8-byte aligned.
+    Text columns are stored as NUL-separated UTF-8.
+    """
+    blobs = []
+    directory = {}
+    text = {}
+    offset = 0
+
+    def add(data: bytes) -> int:
+        nonlocal offset
+        start = offset
+        blobs.append(data)
+        offset += len(data)
+        padding = -offset % _ALIGN
+        if padding:
+            blobs.append(b'\0' * padding)
+            offset += padding
+        return start
+
+    numeric = {f: c for f, c in table._columns.items() if not isinstance(c, list)}
+    for name in COMPOSITES:
+        numeric[_COMPOSITE_PREFIX + name] = table.composite(name)
+    for field, column in numeric.items():
+        data = column.tobytes() if isinstance(column, array) else bytes(column)
+        directory[field] = {'offset': add(data), 'format': _typecode(column)}
+    for field in TEXT_FIELDS:
+        values = table._columns[field]
+        strings = ['' if v is None else str(v) for v in values]
+        if any('\0' in v for v in strings):
+            raise ValueError(f'{field} contains NUL characters; not cacheable')
+        data = '\0'.join(strings).encode('utf-8')
+        text[field] = {
+            'offset': add(data),
+            'size': len(data),
+            'missing': [i for i, v in enumerate(values) if v is None],
+        }
+
+    header = json.dumps({
+        'key': key,
+        'byteorder': sys.byteorder,
+        'length': len(table),
+        'columns': directory,
+        'text': text,
+        'categories': table._categories,
+    }, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(len(_CACHE_MAGIC) + _HEADER_SIZE.size + len(header)) % _ALIGN)
+
+    partial = path + PARTIAL_SUFFIX
+    with open(partial, 'wb') as f:
+        f.write(_CACHE_MAGIC)
+        f.write(_HEADER_SIZE.pack(len(header)))
+        f.write(header)
+        for data in blobs:
+            f.write(data)
+    os.replace(partial, path)
+
+
+def load_table(path: str, key: Optional[str] = None) -> Optional[TripTable]:
+    """
+    Map a cache file written by save_table() as a read-only TripTable.
+
+    Returns None if the file is missing, unreadable or stale (its key differs
+    from key, or it was written on a machine with the other byte order).
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                return None
+            (header_size,) = _HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))
+            header = json.loads(f.read(header_size))
+            if (key is not None and header.get('key') != key) or header.get('byteorder') != sys.byteorder:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    base = len(_CACHE_MAGIC) + _HEADER_SIZE.size + header_size
+    view = memoryview(mapped)
+    length = header['length']
+
+    table = TripTable()
+    for field, entry in header['columns'].items():
+        start = base + entry['offset']
+        size = length * struct.calcsize(entry['format'])
+        column = view[start:start + size].cast(entry['format'])
+        if field.startswith(_COMPOSITE_PREFIX):
+            table._composites[field[len(_COMPOSITE_PREFIX):]] = column
+        else:
+            table._columns[field] = column
+    for field, entry in header['text'].items():
+        start = base + entry['offset']
+        strings = str(view[start:start + entry['size']], 'utf-8').split('\0') if length else []
+        for i in entry['missing']:
+            strings[i] = None
+        table._columns[field] = strings
+    for field, values in header['categories'].items():
+        table._categories[field] = [sys.intern(v) if isinstance(v, str) else v for v in values]
+        table._codes[field] = {v: i for i, v in enumerate(values)}
+    table._length = length
+    table._mmap = mapped
+    return table
+
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Persistent store of trip signature verdicts.
+
+A trip ID never changes after the app creates it, and neither does the
+signature embedded in it, so its verification result is fixed for a given
+secret key. verify_trip_signatures.py used to verify every trip again on
+every run; with a VerdictStore it verifies only the trip IDs it has not seen
+before and takes the others from the store.
+
+STORAGE:
+One append-only text file per secret key, named after a fingerprint of the
+key (a truncated SHA-256, so the key itself is never written):
+
+    <trips file>.<fingerprint>.verdicts
+
+The first line is a header with the format version and the fingerprint;
+every further line is one verdict, tab-separated:
+
+    tripId <TAB> reason <TAB> expected signature (signature_mismatch only)
+
+The reason determines the category (see verify_trip_signatures.REASON_CATEGORIES).
+New verdicts are appended after each run. A partly written last line (an
+interrupted run) is ignored on load. Trip IDs that are empty or contain tabs
+or line breaks are never stored; they are verified every time.
+
+Usage:
+    from trip_verdicts import VerdictStore
+
+    store = VerdictStore.for_snapshot('trips.json', secret_key)
+    verdict = store.get(trip_id)           # (reason, expected) or None
+    store.add(trip_id, 'valid_signature')
+    store.save()
+
+Requirements:
+    - Python 3.6+ (standard library only)
+"""
+
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+
+VERDICTS_SUFFIX = '.verdicts'
+
+# Bump when the verdict line format or the verification rules change
+VERDICTS_VERSION = 1
+
+_HEADER_PREFIX = '#jetlagpro-verdicts'
+_UNSTORABLE = ('\t', '\n', '\r')
+
+
+def key_fingerprint(secret_key: str) -> str:
+    """Short, non-reversible identifier of a secret key."""
+    return hashlib.sha256(b'jetlagpro-verdicts:' + secret_key.encode('utf-8')).hexdigest()[:16]
+
+
+class VerdictStore:
+    """Verdicts (reason, expected signature) by trip ID for one secret key."""
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self._verdicts: Dict[str, Tuple[str, str]] = {}
+        self._new = []
+        # Whether new verdicts can be appended to the file as it is
+        self._appendable = False
+        self._load()
+
+    @classmethod
+    def for_snapshot(cls, trips_path: str, secret_key: str) -> 'VerdictStore':
+        """Store kept next to a trips snapshot."""
+        fingerprint = key_fingerprint(secret_key)
+        return cls(f'{trips_path}.{fingerprint}{VERDICTS_SUFFIX}', fingerprint)
+
+    def _header(self) -> str:
+        return f'{_HEADER_PREFIX} v{VERDICTS_VERSION} {self.fingerprint}\n'
+
+    def _load(self):
+        try:
+            f = open(self.path, encoding='utf-8', newline='\n')
+        except FileNotFoundError:
+            return
+        with f:
+            if f.readline() != self._header():
+                return  # Other format version or key: start over on save
+            verdicts = self._verdicts
+            for line in f:
+                if not line.endswith('\n'):
+                    return  # Interrupted append: rewritten on save
+                fields = line[:-1].split('\t')
+                if len(fields) == 3:
+                    verdicts[fields[0]] = (fields[1], fields[2])
+            self._appendable = True
+
+    def get(self, trip_id: str) -> Optional[Tuple[str, str]]:
+        """(reason, expected signature or '') of a stored trip ID, else None."""
+        return self._verdicts.get(trip_id)
+
+    def add(self, trip_id: str, reason: str, expected: str = ''):
+        """Record a verdict; saved by the next save()."""
+        if not trip_id or any(c in trip_id for c in _UNSTORABLE) or trip_id in self._verdicts:
+            return
+        self._verdicts[trip_id] = (reason, expected)
+        self._new.append(f'{trip_id}\t{reason}\t{expected}\n')
+
+    def save(self) -> int:
+        """Append the verdicts added since the last save; returns how many."""
+        if not self._new:
+            return 0
+        if not self._appendable:
+            # New file, or one for another version or cut off: write it whole
+            partial = self.path + '.tmp'
+            with open(partial, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(self._header())
+                f.writelines(f'{trip_id}\t{reason}\t{expected}\n'
+                             for trip_id, (reason, expected) in self._verdicts.items())
+            os.replace(partial, self.path)
+            self._appendable = True
+        else:
+            with open(self.path, 'a', encoding='utf-8', newline='\n') as f:
+                f.writelines(self._new)
+        saved = len(self._new)
+        self._new = []
+        return saved
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+    def __contains__(self, trip_id: str) -> bool:
+        return trip_id in self._verdicts
@@ -243,6 +243,16 @@ import urllib.error
 from pathlib import Path
 from typing import Dict, List, Set
 
+# Shared Firestore REST client (same directory)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from firestore_rest import download_collection, sync_collection
+from firestore_snapshot import iter_documents
+from firestore_values import decode_value
+
+# Field projection for auto-downloads: entries are hashed whole, so every
+# field is needed (see firestore_rest.PROJECTION_PROFILES)
+FIRESTORE_PROFILE = 'full'
+
 
 # ============================================================================
 # KNOWN EXCEPTIONS
@@ -285,58 +295,13 @@ KNOWN_VALIDATION_FAILURES = {
 
 def extract_firestore_value(value):
     """
-    Recursively extract Firestore REST API values to plain Python types.
+    Extract Firestore REST API values to plain Python types.
     
     Matches verify.html extractFirestoreValue() function (lines 624-686).
-    Handles all Firestore value types recursively, including nested maps and arrays.
+    Handles all Firestore value types, including nested maps and arrays
+    (decoded iteratively by firestore_values.decode_value).
     """
-    if value is None:
-        return None
-    
-    # If not a dict, return as-is (but handle timestamp strings)
-    if not isinstance(value, dict):
-        return value
-    
-    # Keep empty objects as-is (GCS has timestamp: {}, don't convert to null)
-    if len(value) == 0:
-        return {}
-    
-    # Handle Firestore value wrappers (check these first before recursing)
-    if 'timestampValue' in value:
-        return value['timestampValue']  # Keep as-is, will normalize later
-    if 'stringValue' in value:
-        return value['stringValue']
-    if 'integerValue' in value:
-        return int(value['integerValue'])
-    if 'doubleValue' in value:
-        return float(value['doubleValue'])
-    if 'booleanValue' in value:
-        bool_val = value['booleanValue']
-        return bool_val == 'true' or bool_val is True
-    if 'nullValue' in value:
-        return None
-    if 'arrayValue' in value and 'values' in value['arrayValue']:
-        return [extract_firestore_value(v) for v in value['arrayValue']['values']]
-    if 'mapValue' in value and 'fields' in value['mapValue']:
-        # Recursively extract nested map - CRITICAL for metadata normalization
-        nested = {}
-        for k, v in value['mapValue']['fields'].items():
-            nested[k] = extract_firestore_value(v)
-        return nested
-    
-    # Handle Firestore Timestamp objects (from Admin SDK, not REST API)
-    if '_seconds' in value:
-        return value  # Keep as-is, will normalize later
-    
-    # Plain object or array - recurse on all values
-    if isinstance(value, list):
-        return [extract_firestore_value(v) for v in value]
-    
-    # Plain dict - recurse on all values
-    result = {}
-    for k, v in value.items():
-        result[k] = extract_firestore_value(v)
-    return result
+    return decode_value(value)
 
 
 def normalize_entry(entry: Dict) -> Dict:
@@ -600,52 +565,50 @@ def compute_entry_hash(entry: Dict) -> str:
 
 
 def load_firestore_entries(firestore_path: str) -> List[Dict]:
-    """Load and normalize Firestore audit entries from JSON file."""
-    print(f"Loading Firestore data from: {firestore_path}")
-    
-    with open(firestore_path, 'r') as f:
-        data = json.load(f)
+    """
+    Load and normalize Firestore audit entries from a snapshot file.
     
-    # Handle Firestore REST API response format
-    if 'documents' in data:
-        entries = data['documents']
-    else:
-        entries = data if isinstance(data, list) else [data]
+    Accepts NDJSON (optionally gzip/zstd-compressed) and {"documents": [...]}
+    snapshots; entries are normalized as they are read.
+    """
+    print(f"Loading Firestore data from: {firestore_path}")
     
     # Normalize all entries
-    normalized = [normalize_entry(entry) for entry in entries]
+    normalized = [normalize_entry(entry) for entry in iter_documents(firestore_path)]
     
     print(f"  Loaded {len(normalized)} Firestore entries")
     return normalized
 
 
-def download_firestore_entries(collection='auditLog', output_file='firestore-audit.json') -> str:
+def download_firestore_entries(collection='auditLog', output_file='firestore-audit.json', delta: bool = False,
+                               profile: str = FIRESTORE_PROFILE) -> str:
     """
     Download Firestore collection data via REST API with automatic pagination.
     Returns the path to the downloaded file.
-    """
-    print(f"Downloading {collection} from Firestore...")
     
-    base_url = f'https://firestore.googleapis.com/v1/projects/jetlagpro-research/databases/(default)/documents/{collection}?pageSize=1000'
-    all_docs = []
-    token = None
+    With delta=True and a previous download at output_file, only documents
+    created or updated since that download are fetched and merged in.
+    """
+    if delta:
+        print(f"Syncing {collection} from Firestore (changes only)...")
+        result = sync_collection(
+            collection, output_file,
+            on_page=lambda n: print(f"  Indexed {n} documents...", end='\r'),
+            profile=profile
+        )
+        print(f"\n  {result['mode'].capitalize()} sync: fetched {result['fetched']}, "
+              f"removed {result['deleted']}, saved {result['documents']} documents to {output_file}")
+        return output_file
     
-    while True:
-        url = base_url + (f'&pageToken={token}' if token else '')
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read())
-            docs = data.get('documents', [])
-            all_docs.extend(docs)
-            print(f"  Downloaded {len(all_docs)} documents...", end='\r')
-            
-            token = data.get('nextPageToken')
-            if not token:
-                break
+    print(f"Downloading {collection} from Firestore...")
     
-    with open(output_file, 'w') as f:
-        json.dump({'documents': all_docs}, f, indent=2)
+    count = download_collection(
+        collection, output_file,
+        on_page=lambda n: print(f"  Downloaded {n} documents...", end='\r'),
+        profile=profile
+    )
     
-    print(f"\n  Saved {len(all_docs)} documents to {output_file}")
+    print(f"\n  Saved {count} documents to {output_file}")
     return output_file
 
 
@@ -1074,6 +1037,11 @@ Advanced usage (manual download with gsutil):
         action='store_true',
         help='Automatically download GCS files via HTTP (default behavior, no gsutil required)'
     )
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        help='When auto-downloading, only fetch audit entries added since the last download of firestore-audit.json'
+    )
     
     args = parser.parse_args()
     
@@ -1081,7 +1049,7 @@ Advanced usage (manual download with gsutil):
     if not args.firestore:
         print("Note: Firestore file not provided, downloading automatically...")
         print()
-        args.firestore = download_firestore_entries('auditLog', 'firestore-audit.json')
+        args.firestore = download_firestore_entries('auditLog', 'firestore-audit.json', delta=args.delta)
         print()
     elif not os.path.exists(args.firestore):
         print(f"ERROR: Firestore file not found: {args.firestore}")
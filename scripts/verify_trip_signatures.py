@@ -170,6 +170,22 @@ Example workflow:
   2. Run verification (with secret key from authors):
      python verify_trip_signatures.py --trips trips.json --secret-key YOUR_SECRET_KEY
   
+  Verdicts are stored next to the trips file (<trips>.<key fingerprint>.verdicts),
+  so a rerun verifies only trip IDs it has not seen before (--no-cache
+  verifies everything again).
+  
+  For very large archives, --compact keeps only counts and example IDs per
+  category and streams invalid/error records to <trips>.failures.ndjson.
+  
+  Without --trips the trip IDs are downloaded to firestore-trip-ids.json and
+  each page is verified as soon as it arrives, with invalid signatures
+  reported as they are found (--no-pipeline downloads first, then verifies).
+  
+  Large trips files are verified in batches across worker processes
+  (--workers, default: CPU count); the keyed HMAC state is prepared once per
+  process (see SignatureVerifier). Verifying during the download stays in
+  one process.
+  
   3. Review results:
      - Check for invalid signatures (should be 0)
      - Verify legacy count matches expected (~20)
@@ -193,10 +209,48 @@ Repository: https://github.com/SBSchram/jetlagpro-website
 import json
 import hmac
 import hashlib
-import re
+import os
+import queue
+import random
 import sys
-import urllib.request
-from typing import Dict, List, Optional
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Shared Firestore REST client (same directory)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from firestore_rest import PAGE_SIZE, download_collection, sync_collection
+from firestore_snapshot import iter_documents
+from firestore_values import lazy_document
+from trip_ids import LEGACY, MISSING, SIGNED, UUID, TripId, parse_trip_id
+from trip_verdicts import VerdictStore
+
+# Field projection for auto-downloads: verification reads only the trip ID,
+# so survey fields are never transferred (see firestore_rest.PROJECTION_PROFILES)
+FIRESTORE_PROFILE = 'signatures'
+
+# Default auto-download file. It holds only the projected fields, so it is
+# kept apart from the full firestore-trips.json export the analyses read.
+DOWNLOAD_FILE = 'firestore-trip-ids.json'
+
+# Trip IDs per verification batch (one task for a worker process)
+BATCH_SIZE = 20000
+
+# Example trip IDs kept per category in compact reports
+SAMPLE_SIZE = 10
+
+# Categories whose full records a compact report writes out, and the
+# default suffix of that NDJSON file next to the trips file
+FAILED_CATEGORIES = ('invalid', 'error')
+FAILURES_SUFFIX = '.failures.ndjson'
+
+# Downloaded pages waiting to be verified in verify_while_downloading()
+PIPELINE_QUEUE_PAGES = 4
+
+_DONE = object()
 
 
 def compute_signature_from_trip_id(trip_id: str, secret_key: str) -> str:
@@ -236,19 +290,11 @@ def compute_signature_from_trip_id(trip_id: str, secret_key: str) -> str:
     # Matches verify.html line 899: const baseTripId = parts.slice(0, 4).join('-');
     base_trip_id = '-'.join(parts[:4])
     
-    # Compute HMAC-SHA256
-    # Matches verify.html line 924: const hmac = CryptoJS.HmacSHA256(baseTripId, HMAC_SECRET);
-    hmac_obj = hmac.new(
-        secret_key.encode('utf-8'),
-        base_trip_id.encode('utf-8'),
-        hashlib.sha256
-    )
-    
-    # Get hex digest and take first 8 characters (lowercase)
-    # Matches verify.html line 925: const expectedSignature = hmac.toString(CryptoJS.enc.Hex).substring(0, 8).toLowerCase();
-    signature = hmac_obj.hexdigest()[:8].lower()
-    
-    return signature
+    # HMAC-SHA256, first 8 hex characters (lowercase), from the key's cached
+    # verifier. Matches verify.html line 924-925:
+    # const hmac = CryptoJS.HmacSHA256(baseTripId, HMAC_SECRET);
+    # const expectedSignature = hmac.toString(CryptoJS.enc.Hex).substring(0, 8).toLowerCase();
+    return _verifier(secret_key).sign(base_trip_id)
 
 
 def verify_trip_signature(trip_id: str, secret_key: str) -> Dict:
@@ -290,128 +336,299 @@ def verify_trip_signature(trip_id: str, secret_key: str) -> Dict:
             'provided': str (if invalid)
         }
     """
-    if not trip_id:
-        return {
-            'valid': False,
-            'reason': 'missing_trip_id',
-            'category': 'error',
-            'tripId': ''
-        }
+    return _verifier(secret_key).verify(trip_id)
+
+
+class SignatureVerifier:
+    """
+    Trip ID verification against one secret key, with the keyed HMAC state
+    prepared once.
     
-    parts = trip_id.split('-')
+    HMAC-SHA256(K, m) = SHA256((K ^ opad) || SHA256((K ^ ipad) || m)), where
+    both padded keys fill exactly one SHA-256 block. hmac.new() redoes the
+    key padding and hashes both key blocks for every message; here the two
+    hash states after the key blocks are computed once, and each signature
+    .copy()s them and feeds in only the message. The result is the same
+    digest (checked against hmac.new() when the verifier is created).
+    """
     
-    # Check for UUID format (legacy, very old trips)
-    # Matches verify.html line 873-884
-    if len(parts) == 5 and \
-       len(parts[0]) == 8 and \
-       len(parts[1]) == 4 and \
-       len(parts[2]) == 4 and \
-       len(parts[3]) == 4 and \
-       len(parts[4]) == 12:
-        return {
-            'valid': True,
-            'reason': 'legacy_uuid_format',
-            'category': 'legacy',
-            'tripId': trip_id
-        }
+    def __init__(self, secret_key: str):
+        key = secret_key.encode('utf-8')
+        block_size = hashlib.sha256().block_size
+        if len(key) > block_size:
+            key = hashlib.sha256(key).digest()  # RFC 2104: long keys are hashed first
+        key = key.ljust(block_size, b'\0')
+        self._inner = hashlib.sha256(bytes(b ^ 0x36 for b in key))
+        self._outer = hashlib.sha256(bytes(b ^ 0x5C for b in key))
+        
+        reference = hmac.new(secret_key.encode('utf-8'), b'check', hashlib.sha256).hexdigest()[:8]
+        if self.sign('check') != reference:
+            raise RuntimeError('Precomputed HMAC state does not match hmac.new()')
     
-    # Legacy format (4 parts): Data before November 8, 2025 without signatures
-    # Matches verify.html line 887-894
-    if len(parts) == 4:
-        return {
-            'valid': True,
-            'reason': 'legacy_no_signature',
-            'category': 'legacy',
-            'tripId': trip_id
-        }
+    def sign(self, base_trip_id: str) -> str:
+        """First 8 hex characters of HMAC-SHA256(base_trip_id) (as compute_signature_from_trip_id)."""
+        inner = self._inner.copy()
+        inner.update(base_trip_id.encode('utf-8'))
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.hexdigest()[:8]
+    
+    def verify(self, trip_id: str) -> Dict:
+        """Verify one trip ID; same result as verify_trip_signature()."""
+        return self.verify_parsed(parse_trip_id(trip_id))
     
-    # November 8, 2025 and later format (5 parts): deviceID-dest-date-time-signature
-    # Matches verify.html line 897-944
-    if len(parts) == 5:
-        base_trip_id = '-'.join(parts[:4])  # First 4 parts
-        provided_signature = parts[4]  # Last part is the signature
+    def verify_parsed(self, parsed: TripId) -> Dict:
+        """verify() for a trip ID already parsed with trip_ids.parse_trip_id()."""
+        trip_id = parsed.trip_id
+        trip_format = parsed.format
         
-        # Validate signature format (8 hex characters)
-        # Matches verify.html line 903
-        if not re.match(r'^[a-fA-F0-9]{8}$', provided_signature):
+        if trip_format == MISSING:
             return {
                 'valid': False,
-                'reason': 'invalid_signature_format',
-                'category': 'invalid',
-                'tripId': trip_id,
-                'providedSignature': provided_signature
+                'reason': 'missing_trip_id',
+                'category': 'error',
+                'tripId': ''
             }
         
-        # Compute expected signature
-        expected_signature = compute_signature_from_trip_id(trip_id, secret_key)
-        
-        # Compare signatures (case-insensitive)
-        # Matches verify.html line 927
-        if provided_signature.lower() == expected_signature.lower():
+        # Check for UUID format (legacy, very old trips: 8-4-4-4-12)
+        # Matches verify.html line 873-884
+        if trip_format == UUID:
             return {
                 'valid': True,
-                'reason': 'valid_signature',
-                'category': 'authenticated',
-                'tripId': trip_id,
-                'signature': provided_signature
+                'reason': 'legacy_uuid_format',
+                'category': 'legacy',
+                'tripId': trip_id
             }
-        else:
+        
+        # Legacy format (4 parts): Data before November 8, 2025 without signatures
+        # Matches verify.html line 887-894
+        if trip_format == LEGACY:
             return {
-                'valid': False,
-                'reason': 'signature_mismatch',
-                'category': 'invalid',
-                'tripId': trip_id,
-                'expected': expected_signature,
-                'provided': provided_signature
+                'valid': True,
+                'reason': 'legacy_no_signature',
+                'category': 'legacy',
+                'tripId': trip_id
             }
+        
+        # November 8, 2025 and later format (5 parts): deviceID-dest-date-time-signature
+        # Matches verify.html line 897-944
+        if trip_format == SIGNED:
+            provided_signature = parsed.signature  # Last part is the signature
+            
+            # Validate signature format (8 hex characters)
+            # Matches verify.html line 903
+            if not parsed.has_signature_format():
+                return {
+                    'valid': False,
+                    'reason': 'invalid_signature_format',
+                    'category': 'invalid',
+                    'tripId': trip_id,
+                    'providedSignature': provided_signature
+                }
+            
+            # Compute expected signature from the first 4 parts
+            expected_signature = self.sign(parsed.base_trip_id)
+            
+            # Compare signatures (case-insensitive)
+            # Matches verify.html line 927
+            if provided_signature.lower() == expected_signature:
+                return {
+                    'valid': True,
+                    'reason': 'valid_signature',
+                    'category': 'authenticated',
+                    'tripId': trip_id,
+                    'signature': provided_signature
+                }
+            else:
+                return {
+                    'valid': False,
+                    'reason': 'signature_mismatch',
+                    'category': 'invalid',
+                    'tripId': trip_id,
+                    'expected': expected_signature,
+                    'provided': provided_signature
+                }
+        
+        # Unexpected format
+        # Matches verify.html line 947-954
+        return {
+            'valid': False,
+            'reason': 'unexpected_format',
+            'category': 'error',
+            'tripId': trip_id,
+            'parts': parsed.parts
+        }
     
-    # Unexpected format
-    # Matches verify.html line 947-954
-    return {
-        'valid': False,
-        'reason': 'unexpected_format',
-        'category': 'error',
-        'tripId': trip_id,
-        'parts': len(parts)
+    def verify_many(self, trip_ids: Iterable[str]) -> List[Dict]:
+        """verify() for each trip ID, in order."""
+        verify = self.verify
+        return [verify(trip_id) for trip_id in trip_ids]
+
+
+@lru_cache(maxsize=8)
+def _verifier(secret_key: str) -> SignatureVerifier:
+    """SignatureVerifier of a key, prepared on first use and then reused."""
+    return SignatureVerifier(secret_key)
+
+
+# Verifier of a worker process, created once by the pool initializer
+_worker_verifier = None
+
+
+def _init_worker(secret_key: str):
+    global _worker_verifier
+    _worker_verifier = _verifier(secret_key)
+
+
+def _verify_batch(trip_ids: List[str]) -> List[Dict]:
+    return _worker_verifier.verify_many(trip_ids)
+
+
+def verify_batches(batches: Iterable[List[str]], secret_key: str,
+                   workers: Optional[int] = 1) -> Iterator[Tuple[List[str], List[Dict]]]:
+    """
+    Verify batches of trip IDs, yielding (batch, results) in batch order.
+    
+    With workers > 1 and more than one batch, batches are verified in a
+    process pool (each worker prepares its SignatureVerifier once). At most
+    2 x workers batches are in flight, so batches can be produced lazily
+    while the file is still being read. A single batch is verified
+    in-process; workers=None uses the CPU count.
+    """
+    batches = iter(batches)
+    head = [batch for batch in (next(batches, None), next(batches, None)) if batch is not None]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(head) < 2:
+        verifier = _verifier(secret_key)
+        for batch in chain(head, batches):
+            yield batch, verifier.verify_many(batch)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(secret_key,)) as pool:
+        pending = deque()
+        for batch in chain(head, batches):
+            pending.append((batch, pool.submit(_verify_batch, batch)))
+            if len(pending) >= 2 * workers:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+# Category of every verification reason (the reason alone determines the result)
+REASON_CATEGORIES = {
+    'missing_trip_id': 'error',
+    'legacy_uuid_format': 'legacy',
+    'legacy_no_signature': 'legacy',
+    'invalid_signature_format': 'invalid',
+    'valid_signature': 'authenticated',
+    'signature_mismatch': 'invalid',
+    'unexpected_format': 'error',
+}
+
+
+def validation_from_verdict(trip_id: str, reason: str, expected: str = '') -> Dict:
+    """
+    Rebuild the verify_trip_signature() result for a trip ID from its stored
+    verdict (see trip_verdicts.VerdictStore), without computing the HMAC.
+    expected is the computed signature, needed only for signature_mismatch.
+    """
+    category = REASON_CATEGORIES[reason]
+    validation = {
+        'valid': category in ('authenticated', 'legacy'),
+        'reason': reason,
+        'category': category,
+        'tripId': trip_id
     }
+    if reason == 'valid_signature':
+        validation['signature'] = parse_trip_id(trip_id).signature
+    elif reason == 'invalid_signature_format':
+        validation['providedSignature'] = parse_trip_id(trip_id).signature
+    elif reason == 'signature_mismatch':
+        validation['expected'] = expected
+        validation['provided'] = parse_trip_id(trip_id).signature
+    elif reason == 'unexpected_format':
+        validation['parts'] = parse_trip_id(trip_id).parts
+    return validation
 
 
-def load_trips(trips_path: str) -> List[Dict]:
-    """Load trip records from JSON file."""
+def load_trips(trips_path: str) -> Iterator[Dict]:
+    """
+    Yield trip records from a snapshot file.
+    
+    Accepts NDJSON (optionally gzip/zstd-compressed) and {"documents": [...]}
+    snapshots from download_firestore.py, and plain JSON lists of trips.
+    The file is parsed incrementally, one trip at a time, and fields are
+    decoded only when read (signature checks read just tripId).
+    """
     print(f"Loading trips from: {trips_path}")
     
-    with open(trips_path, 'r') as f:
-        data = json.load(f)
-    
-    # Handle Firestore REST API format
-    if 'documents' in data:
-        trips = []
-        for doc in data['documents']:
-            trip = {}
-            if 'fields' in doc:
-                # Extract fields from Firestore format
-                for key, value in doc['fields'].items():
-                    if 'stringValue' in value:
-                        trip[key] = value['stringValue']
-                    elif 'integerValue' in value:
-                        trip[key] = int(value['integerValue'])
-                    elif 'doubleValue' in value:
-                        trip[key] = float(value['doubleValue'])
-                    elif 'booleanValue' in value:
-                        trip[key] = value['booleanValue']
-                    elif 'timestampValue' in value:
-                        trip[key] = value['timestampValue']
-            trips.append(trip)
-    elif isinstance(data, list):
-        trips = data
-    else:
-        trips = [data]
+    count = 0
+    for doc in iter_documents(trips_path):
+        yield lazy_document(doc)
+        count += 1
     
-    print(f"  Loaded {len(trips)} trip records")
-    return trips
+    print(f"  Loaded {count} trip records")
 
 
-def verify_all_trips(trips: List[Dict], secret_key: str) -> Dict:
+class CompactTally:
+    """
+    Counters-plus-samples view of a verification run, for archive-scale runs
+    where keeping a record per trip is wasteful.
+    
+    Per category it keeps a count and a uniform reservoir sample (Algorithm R)
+    of at most sample_size entries: trip IDs for authenticated and legacy
+    trips, full records for FAILED_CATEGORIES. Every invalid/error record is
+    also streamed to an NDJSON file as it is found. Memory stays flat however
+    many trips are verified.
+    """
+    
+    def __init__(self, records_path: Optional[str] = None, sample_size: int = SAMPLE_SIZE,
+                 seed: int = 0):
+        self.counts = {'authenticated': 0, 'legacy': 0, 'invalid': 0, 'error': 0}
+        self.samples = {category: [] for category in self.counts}
+        self.sample_size = sample_size
+        self.records_path = records_path
+        self._random = random.Random(seed)
+        self._records = open(records_path, 'w', encoding='utf-8') if records_path else None
+    
+    def add(self, trip_id: str, document_id: str, validation: Dict):
+        category = validation['category']
+        seen = self.counts[category] = self.counts[category] + 1
+        if category in FAILED_CATEGORIES:
+            entry = {'tripId': trip_id, 'documentId': document_id, 'validation': validation}
+            if self._records is not None:
+                self._records.write(json.dumps(entry) + '\n')
+        else:
+            entry = trip_id
+        sample = self.samples[category]
+        if len(sample) < self.sample_size:
+            sample.append(entry)
+        else:
+            slot = self._random.randrange(seen)
+            if slot < self.sample_size:
+                sample[slot] = entry
+    
+    def close(self):
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+    
+    def report(self, total_trips: int) -> Dict:
+        """Report dictionary for print_report() (samples instead of categories)."""
+        report = {'total_trips': total_trips}
+        report.update(self.counts)
+        report['samples'] = self.samples
+        report['records_path'] = self.records_path
+        return report
+
+
+def verify_all_trips(trips: Iterable[Dict], secret_key: str, workers: Optional[int] = 1,
+                     store: Optional[VerdictStore] = None, compact: bool = False,
+                     records_path: Optional[str] = None, batch_size: int = BATCH_SIZE,
+                     on_failure: Optional[Callable[[Dict], None]] = None) -> Dict:
     """
     Verify signatures for all trips.
     
@@ -420,6 +637,22 @@ def verify_all_trips(trips: List[Dict], secret_key: str) -> Dict:
     - Uses tripId from trip record (or documentId as fallback)
     - Calls validateTripHMAC for each trip
     
+    trips may be any iterable, including the load_trips() generator. Trip
+    IDs are verified in batches of batch_size (see verify_batches()), across
+    `workers` processes when there is more than one batch. on_failure, if
+    given, is called with each invalid/error record as soon as its batch is
+    verified.
+    
+    With a VerdictStore, trip IDs it already holds are not verified again:
+    their results are rebuilt from the stored verdicts (see
+    validation_from_verdict()), and the verdicts of the others are added to
+    it. The report is the same either way; the caller saves the store.
+    
+    With compact=True the report keeps counters and samples instead of a
+    record per trip (see CompactTally): 'samples' replaces 'categories', and
+    every invalid/error record is streamed to records_path (NDJSON) when
+    given. The counts, and print_report()'s exit code, are the same.
+    
     Returns:
         Report dictionary with verification results matching JavaScript format
     """
@@ -433,22 +666,65 @@ def verify_all_trips(trips: List[Dict], secret_key: str) -> Dict:
         'error': []          # Missing trip IDs or malformed
     }
     
-    for trip in trips:
-        # Extract tripId - matches verify.html line 983
-        trip_id = trip.get('tripId') or trip.get('documentId') or ''
-        
-        # Validate HMAC signature - matches verify.html line 984
-        validation = verify_trip_signature(trip_id, secret_key)
-        
-        # Categorize - matches verify.html line 985-989
-        categories[validation['category']].append({
-            'tripId': trip_id,
-            'documentId': trip.get('documentId') or trip.get('id') or 'unknown',
-            'validation': validation
-        })
+    # Per batch handed to verify_batches(), oldest first: all trip IDs,
+    # document IDs, and stored results (None where the ID is verified)
+    pending_batches = deque()
+    
+    def id_batches() -> Iterator[List[str]]:
+        trip_ids, document_ids, known = [], [], []
+        for trip in trips:
+            # Extract tripId - matches verify.html line 983
+            trip_id = trip.get('tripId') or trip.get('documentId') or ''
+            trip_ids.append(trip_id)
+            document_ids.append(trip.get('documentId') or trip.get('id') or 'unknown')
+            verdict = store.get(trip_id) if store is not None else None
+            known.append(validation_from_verdict(trip_id, *verdict) if verdict else None)
+            if len(trip_ids) == batch_size:
+                pending_batches.append((trip_ids, document_ids, known))
+                yield [trip_id for trip_id, result in zip(trip_ids, known) if result is None]
+                trip_ids, document_ids, known = [], [], []
+        if trip_ids:
+            pending_batches.append((trip_ids, document_ids, known))
+            yield [trip_id for trip_id, result in zip(trip_ids, known) if result is None]
+    
+    tally = CompactTally(records_path) if compact else None
+    total_trips = 0
+    try:
+        # Validate HMAC signatures - matches verify.html line 984
+        for verified_ids, verified in verify_batches(id_batches(), secret_key, workers):
+            trip_ids, document_ids, validations = pending_batches.popleft()
+            total_trips += len(trip_ids)
+            if verified:
+                verified = iter(verified)
+                for i, result in enumerate(validations):
+                    if result is None:
+                        validations[i] = result = next(verified)
+                        if store is not None:
+                            store.add(result['tripId'], result['reason'], result.get('expected', ''))
+            if on_failure is not None:
+                for trip_id, document_id, validation in zip(trip_ids, document_ids, validations):
+                    if validation['category'] in FAILED_CATEGORIES:
+                        on_failure({'tripId': trip_id, 'documentId': document_id, 'validation': validation})
+            if tally is not None:
+                for trip_id, document_id, validation in zip(trip_ids, document_ids, validations):
+                    tally.add(trip_id, document_id, validation)
+                continue
+            for trip_id, document_id, validation in zip(trip_ids, document_ids, validations):
+                # Categorize - matches verify.html line 985-989
+                categories[validation['category']].append({
+                    'tripId': trip_id,
+                    'documentId': document_id,
+                    'validation': validation
+                })
+    finally:
+        if tally is not None:
+            tally.close()
+    
+    if tally is not None:
+        return tally.report(total_trips)
     
     report = {
-        'total_trips': len(trips),
+        'total_trips': total_trips,
         'authenticated': len(categories['authenticated']),
         'legacy': len(categories['legacy']),
         'invalid': len(categories['invalid']),
@@ -479,6 +755,13 @@ def print_report(report: Dict, verbose: bool = False) -> int:
     print(f"  Error (malformed trip IDs): {report['error']}")
     print("="*60)
     
+    # Example trip IDs of a compact report (see CompactTally)
+    if verbose and 'samples' in report:
+        print("\nExample trip IDs:")
+        for category, sample in report['samples'].items():
+            for entry in sample:
+                print(f"  {category:<14} {entry['tripId'] if isinstance(entry, dict) else entry}")
+    
     # Interpretation section
     print("\nINTERPRETING RESULTS:")
     print("  All signatures valid – All trip records were submitted by legitimate iOS devices")
@@ -496,10 +779,13 @@ def print_report(report: Dict, verbose: bool = False) -> int:
         print("✗ VERIFICATION FAILED")
         print("INVALID SIGNATURES FOUND:\n")
         
+        # Compact reports (verify_all_trips(compact=True)) hold samples only
+        listed = report['categories'] if 'categories' in report else report['samples']
+        
         # Show invalid signatures - matches verify.html line 1009-1018
         if report['invalid'] > 0:
             print(f"Invalid Signatures ({report['invalid']}):")
-            for item in report['categories']['invalid']:
+            for item in listed['invalid']:
                 print(f"  - {item['tripId']}")
                 validation = item['validation']
                 if validation.get('expected') and validation.get('provided'):
@@ -510,44 +796,145 @@ def print_report(report: Dict, verbose: bool = False) -> int:
         # Show errors - matches verify.html line 1021-1026
         if report['error'] > 0:
             print(f"Malformed Trip IDs ({report['error']}):")
-            for item in report['categories']['error']:
+            for item in listed['error']:
                 trip_id = item.get('tripId') or 'missing'
                 reason = item['validation'].get('reason', 'unknown')
                 print(f"  - {trip_id} ({reason})")
         
+        if 'categories' not in report:
+            shown = len(listed['invalid']) + len(listed['error'])
+            print(f"\n(Showing a sample of {shown} of {report['invalid'] + report['error']} failures", end='')
+            if report.get('records_path'):
+                print(f"; all records in {report['records_path']})")
+            else:
+                print(")")
+        
         return 1
 
 
-def download_firestore_entries(collection='tripCompletions', output_file='firestore-trips.json') -> str:
+def download_firestore_entries(collection='tripCompletions', output_file=DOWNLOAD_FILE, delta: bool = False,
+                               profile: str = FIRESTORE_PROFILE) -> str:
     """
     Download Firestore collection data via REST API with automatic pagination.
     Returns the path to the downloaded file.
+    
+    With delta=True and a previous download at output_file, only documents
+    created or updated since that download are fetched and merged in.
+    Only the fields in the projection profile are downloaded.
     """
-    print(f"Downloading {collection} from Firestore...")
+    if delta:
+        print(f"Syncing {collection} from Firestore (changes only)...")
+        result = sync_collection(
+            collection, output_file,
+            on_page=lambda n: print(f"  Indexed {n} documents...", end='\r'),
+            profile=profile
+        )
+        print(f"\n  {result['mode'].capitalize()} sync: fetched {result['fetched']}, "
+              f"removed {result['deleted']}, saved {result['documents']} documents to {output_file}")
+        return output_file
     
-    base_url = f'https://firestore.googleapis.com/v1/projects/jetlagpro-research/databases/(default)/documents/{collection}?pageSize=1000'
-    all_docs = []
-    token = None
-    
-    while True:
-        url = base_url + (f'&pageToken={token}' if token else '')
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read())
-            docs = data.get('documents', [])
-            all_docs.extend(docs)
-            print(f"  Downloaded {len(all_docs)} documents...", end='\r')
-            
-            token = data.get('nextPageToken')
-            if not token:
-                break
+    print(f"Downloading {collection} from Firestore...")
     
-    with open(output_file, 'w') as f:
-        json.dump({'documents': all_docs}, f, indent=2)
+    count = download_collection(
+        collection, output_file,
+        on_page=lambda n: print(f"  Downloaded {n} documents...", end='\r'),
+        profile=profile
+    )
     
-    print(f"\n  Saved {len(all_docs)} documents to {output_file}")
+    print(f"\n  Saved {count} documents to {output_file}")
     return output_file
 
 
+def verify_while_downloading(secret_key: str, collection: str = 'tripCompletions',
+                             output_file: str = DOWNLOAD_FILE,
+                             profile: str = FIRESTORE_PROFILE, **options) -> Dict:
+    """
+    Download a collection and verify its trips at the same time.
+    
+    The fetch stage (a background thread running download_collection())
+    puts each page's documents on a bounded queue of PIPELINE_QUEUE_PAGES
+    pages; the verify stage takes them off and verifies them page by page
+    (batch_size = PAGE_SIZE). Total time is roughly max(fetch, verify)
+    instead of their sum, and the snapshot file is still written for later
+    runs. When verification falls behind, the full queue holds back the
+    download, so memory stays bounded.
+    
+    Invalid and error records are printed as they are found. options are
+    passed to verify_all_trips() (store, compact, records_path). Pages are
+    always verified in-process, whatever options['workers'] says: a page is
+    only PAGE_SIZE HMACs, less than a worker round trip costs, and forking a
+    pool while the fetch thread holds the connection and queue locks is
+    unsafe.
+    The download always starts over: pages of an interrupted earlier
+    download would otherwise never reach the verify stage.
+    
+    Returns:
+        The verify_all_trips() report
+    """
+    pages = queue.Queue(maxsize=PIPELINE_QUEUE_PAGES)
+    stop = threading.Event()
+    
+    class Cancelled(Exception):
+        pass
+    
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise Cancelled()
+    
+    def fetch():
+        try:
+            count = download_collection(
+                collection, output_file, profile=profile, resume=False,
+                on_page=lambda n: print(f"  Downloaded {n} documents...", end='\r'),
+                on_documents=put
+            )
+            print(f"\n  Saved {count} documents to {output_file}")
+        except Cancelled:
+            return
+        except BaseException as e:
+            try:
+                put(e)
+            except Cancelled:
+                pass
+            return
+        try:
+            put(_DONE)
+        except Cancelled:
+            pass
+    
+    def downloaded_trips() -> Iterator[Dict]:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            for doc in item:
+                yield lazy_document(doc)
+    
+    def report_failure(item: Dict):
+        reason = item['validation'].get('reason', 'unknown')
+        print(f"\n  ✗ {item['tripId'] or 'missing'} ({reason})")
+    
+    options['workers'] = 1
+    print(f"Downloading {collection} from Firestore and verifying as pages arrive...")
+    thread = threading.Thread(target=fetch, name=f'verify-fetch-{collection}', daemon=True)
+    thread.start()
+    try:
+        report = verify_all_trips(downloaded_trips(), secret_key, batch_size=PAGE_SIZE,
+                                  on_failure=report_failure, **options)
+    except BaseException:
+        stop.set()  # The fetch thread gives up at its next page
+        raise
+    thread.join()
+    return report
+
+
 def main():
     """Main verification workflow."""
     import argparse
@@ -588,19 +975,73 @@ Security Note:
         action='store_true',
         help='Show detailed signature information'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes for verifying large trip sets (default: CPU count; 1 = in-process). '
+             'Verifying during the download is always in-process'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Verify every trip instead of reusing the verdicts stored next to the trips file'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Keep counts and a sample of trip IDs per category instead of every record '
+             '(for large archives); invalid/error records go to the --failures file'
+    )
+    parser.add_argument(
+        '--failures',
+        default=None,
+        help='NDJSON file for invalid/error records with --compact (default: <trips>.failures.ndjson)'
+    )
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        help=f'When auto-downloading, only fetch trips changed since the last download to {DOWNLOAD_FILE}'
+    )
+    parser.add_argument(
+        '--no-pipeline',
+        action='store_true',
+        help='When auto-downloading, finish the download before verifying '
+             '(default: verify each page as it arrives)'
+    )
     
     args = parser.parse_args()
     
-    # Auto-download trip data if not provided
+    # Auto-download trip data if not provided. A full download is verified
+    # page by page as it arrives (see verify_while_downloading()); a delta
+    # sync, or --no-pipeline, downloads first and then reads the file.
+    pipeline = False
     if not args.trips:
         print("Note: Trips file not provided, downloading automatically...")
         print()
-        args.trips = download_firestore_entries('tripCompletions', 'firestore-trips.json')
-        print()
+        if args.delta or args.no_pipeline:
+            args.trips = download_firestore_entries('tripCompletions', DOWNLOAD_FILE, delta=args.delta)
+            print()
+        else:
+            args.trips = DOWNLOAD_FILE
+            pipeline = True
     
-    # Load trips
+    # Load and verify trips (the file is read as the trips are verified)
     try:
-        trips = load_trips(args.trips)
+        store = None if args.no_cache else VerdictStore.for_snapshot(args.trips, args.secret_key)
+        if store is not None and len(store):
+            print(f"Reusing {len(store)} stored verdicts ({store.path})")
+        records_path = (args.failures or args.trips + FAILURES_SUFFIX) if args.compact else None
+        options = {'workers': args.workers, 'store': store, 'compact': args.compact,
+                   'records_path': records_path}
+        if pipeline:
+            report = verify_while_downloading(args.secret_key, 'tripCompletions', args.trips, **options)
+        else:
+            report = verify_all_trips(load_trips(args.trips), args.secret_key, **options)
+        if store is not None:
+            saved = store.save()
+            if saved:
+                print(f"  Stored {saved} new verdicts")
     except FileNotFoundError:
         print(f"ERROR: Trips file not found: {args.trips}")
         return 1
@@ -611,9 +1052,6 @@ Security Note:
         print(f"ERROR: Failed to load trips: {e}")
         return 1
     
-    # Verify all trips
-    report = verify_all_trips(trips, args.secret_key)
-    
     # Print report and exit
     exit_code = print_report(report, verbose=args.verbose)
     return exit_code